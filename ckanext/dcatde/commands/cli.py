@@ -1,15 +1,16 @@
 # -*- coding: utf-8 -*-
 
-import json
 import sys
 
-import urllib
-
 import ckanapi
 import click
 from ckan.plugins import toolkit as tk
 import ckanext.dcatde.commands.command_util as utils
+from ckanext.dcatde.harvesters.identifier_registry import IdentifierRegistry
+from ckanext.dcatde.migration.util import load_json_mapping
+from ckanext.dcatde.package_extra_indexes import PackageExtraIndexes
 from ckanext.dcatde.triplestore.fuseki_client import FusekiTriplestoreClient
+from ckanext.dcatde.triplestore.sync_queue import TriplestoreSyncQueue
 from ckanext.dcatde.validation.shacl_validation import ShaclValidator
 
 triplestore_client = FusekiTriplestoreClient()
@@ -20,7 +21,8 @@ def get_commands():
     ''' Get available commands '''
     return [dcatde_migrate,
             dcatde_themeadder,
-            triplestore]
+            triplestore,
+            dcatde_db]
 
 
 @click.command('dcatde_migrate')
@@ -98,14 +100,9 @@ def dcatde_themeadder(args):
 
     groups_file = tk.config.get('ckanext.dcatde.urls.themes')
 
-    try:
-        groups_str = urllib.request.urlopen(groups_file).read()
-    except Exception as ex:
-        print(ex)
+    govdata_groups = load_json_mapping(groups_file, 'group config')
+    if not govdata_groups:
         print('Could not load group config file!')
-        groups_str = '{}'
-
-    govdata_groups = json.loads(groups_str)
 
     utils.create_groups(present_groups_keys, govdata_groups)
 
@@ -124,8 +121,18 @@ def triplestore():
         - Reindex all datasets edited manually in the GovData portal only and which are not imported
         automatically by a harvester.
 
-      triplestore delete_datasets [--dry-run] [--uris]
-        - Delete all datatsets from the ds-triplestore for the URIs given with the uris-option.
+      triplestore delete_datasets [--dry-run] [--uris] [--uris-file]
+        - Delete all datatsets from the triplestore datastores for the URIs given with the uris-option
+        or read from the file given with the uris-file-option (one URI per line, '-' for stdin).
+
+      triplestore worker [--batch-size] [--poll-interval] [--once]
+        - Update the datasets added to the triplestore queue by the harvester in the triplestore.
+
+      triplestore queue_status
+        - Show the number of datasets in the triplestore queue and the age of the oldest one.
+
+      triplestore benchmark_wire_formats --dataset-id [--rounds] [--dry-run]
+        - Measure the serialization and upload time of the dataset for each supported RDF wire format.
     '''
     pass
 
@@ -148,12 +155,136 @@ def reindex(dry_run):
     will be not executed. The default is True.', required=False)
 @click.option('--uris', default='', help='Use comma separated URI-values to \
     specify which datasets should be deleted when running delete_datasets')
-def delete_datasets(dry_run, uris):
+@click.option('--uris-file', type=click.File('r'), default=None, help='A file containing the URIs \
+    of the datasets to delete, one URI per line. Use - to read the URIs from stdin.', required=False)
+def delete_datasets(dry_run, uris, uris_file):
     """
     Delete all datasets for the given uris.
     """
     result = _check_options(dry_run=dry_run, uris=uris)
-    utils.clean_triplestore_from_uris(result['dry_run'], triplestore_client, result['uris'])
+    uris_to_clean = result['uris']
+    if uris_file is not None:
+        uris_to_clean.extend(line.strip() for line in uris_file if line.strip())
+    utils.clean_triplestore_from_uris(result['dry_run'], triplestore_client, uris_to_clean)
+
+
+@triplestore.command('migrate_named_graphs')
+@click.option('--dry-run', default=True, help='With dry-run True the migration \
+    will be not executed. The default is True.', required=False)
+@click.option('--clear-default', is_flag=True, default=False, help='Delete the triples left in the \
+    default graphs after migrating, e.g. catalogs or nodes not linked to a dataset.')
+def migrate_named_graphs(dry_run, clear_default):
+    """
+    Moves the data stored in the default graphs of the datastores into one named graph per dataset.
+    """
+    result = _check_options(dry_run=dry_run)
+    utils.migrate_to_named_graphs(result['dry_run'], triplestore_client, clear_default)
+
+
+@triplestore.command('worker')
+@click.option('--batch-size', type=int, default=None, help='The number of datasets updated in one \
+    request. The default is the configured triplestore batch size.', required=False)
+@click.option('--poll-interval', type=int, default=10, help='The number of seconds to wait if the \
+    queue is empty or the triplestore is not available. The default is 10.', required=False)
+@click.option('--once', is_flag=True, default=False, help='Exit as soon as the queue is empty.')
+def worker(batch_size, poll_interval, once):
+    """
+    Update the datasets added to the triplestore queue by the harvester in the triplestore.
+    """
+    # The harvester requires the optional extension ckanext-harvest
+    # pylint: disable=import-outside-toplevel
+    from ckanext.dcatde.harvesters.dcatde_rdf import DCATdeRDFHarvester
+    harvester = DCATdeRDFHarvester()
+    batch_size = batch_size or harvester.triplestore_client.batch_size
+    try:
+        utils.process_triplestore_queue(harvester, TriplestoreSyncQueue(), batch_size, poll_interval, once)
+    finally:
+        harvester.shutdown_validation_executor()
+
+
+@triplestore.command('queue_status')
+def queue_status():
+    """
+    Show the number of datasets in the triplestore queue and the age of the oldest one.
+    """
+    utils.print_triplestore_queue_status(TriplestoreSyncQueue())
+
+
+@triplestore.command('benchmark_wire_formats')
+@click.option('--dataset-id', required=True, help='The ID or name of the dataset used for the benchmark.')
+@click.option('--rounds', type=int, default=10, help='The number of repetitions per wire format. \
+    The default is 10.', required=False)
+@click.option('--dry-run', default=True, help='With dry-run True the dataset will be not uploaded to \
+    the triplestore and only the serialization is measured. The default is True.', required=False)
+def benchmark_wire_formats(dataset_id, rounds, dry_run):
+    """
+    Measure the serialization and upload time of the dataset for each supported RDF wire format.
+    """
+    result = _check_options(dry_run=dry_run)
+    utils.benchmark_wire_formats(result['dry_run'], triplestore_client, dataset_id, max(rounds, 1))
+
+
+@click.group()
+def dcatde_db():
+    '''
+    Maintains the database objects of the extension.
+
+    Usage:
+
+      dcatde_db create_indexes [--dry-run]
+        - Create the indexes on the table package_extra used to look up datasets by their extras.
+
+      dcatde_db drop_indexes [--dry-run]
+        - Drop the indexes on the table package_extra created by the extension.
+
+      dcatde_db check_indexes
+        - Show whether the indexes exist and are used by the query planner.
+
+      dcatde_db rebuild_identifier_registry [--dry-run]
+        - Fill the identifier registry used for the duplicate detection with all harvested datasets.
+    '''
+    pass
+
+
+@dcatde_db.command('create_indexes')
+@click.option('--dry-run', default=True, help='With dry-run True the indexes \
+    will be not created. The default is True.', required=False)
+def create_indexes(dry_run):
+    """
+    Create the indexes on the table package_extra used to look up datasets by their extras.
+    """
+    result = _check_options(dry_run=dry_run)
+    utils.create_package_extra_indexes(result['dry_run'], PackageExtraIndexes())
+
+
+@dcatde_db.command('drop_indexes')
+@click.option('--dry-run', default=True, help='With dry-run True the indexes \
+    will be not dropped. The default is True.', required=False)
+def drop_indexes(dry_run):
+    """
+    Drop the indexes on the table package_extra created by the extension.
+    """
+    result = _check_options(dry_run=dry_run)
+    utils.drop_package_extra_indexes(result['dry_run'], PackageExtraIndexes())
+
+
+@dcatde_db.command('check_indexes')
+def check_indexes():
+    """
+    Show whether the indexes exist and are used by the query planner.
+    """
+    utils.print_package_extra_index_status(PackageExtraIndexes())
+
+
+@dcatde_db.command('rebuild_identifier_registry')
+@click.option('--dry-run', default=True, help='With dry-run True the registry \
+    will be not changed. The default is True.', required=False)
+def rebuild_identifier_registry(dry_run):
+    """
+    Fill the identifier registry used for the duplicate detection with all harvested datasets.
+    """
+    result = _check_options(dry_run=dry_run)
+    utils.rebuild_identifier_registry(result['dry_run'], IdentifierRegistry())
 
 
 def _check_options(**kwargs):
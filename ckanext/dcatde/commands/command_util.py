@@ -3,6 +3,7 @@
 '''
 Commands util methods
 '''
+import datetime
 import json
 import socket
 import time
@@ -18,6 +19,8 @@ from ckanext.dcat.processors import RDFParserException, RDFParser
 from ckanext.dcatde import dataset_utils
 from ckanext.dcatde.migration import migration_functions, util as migration_util
 from ckanext.dcatde.profiles import DCATDE
+from ckanext.dcatde.rdf_wire_format import WIRE_FORMAT_TURTLE, WIRE_FORMATS, serialize_graph
+from ckanext.dcatde.validation.validation_cache import get_content_hash
 
 EXTRA_KEY_ADMS_IDENTIFIER = 'alternate_identifier'
 EXTRA_KEY_DCT_IDENTIFIER = 'identifier'
@@ -428,10 +431,11 @@ def reindex(dry_run, triplestore_client, shacl_validation_client):
 
 
 def clean_triplestore_from_uris(dry_run, triplestore_client, uris_to_clean):
-    '''Delete dataset-uris from args from the triplestore'''
-    if uris_to_clean == '':
-        print("INFO: Missing Arg 'uris'." \
-            "Use comma separated URI-values to specify which datasets should be deleted.")
+    '''Delete dataset-uris from args from all triplestore datastores in batches'''
+    if not uris_to_clean:
+        print("INFO: Missing Arg 'uris' or 'uris-file'." \
+            "Use comma separated URI-values or a file with one URI per line to specify which datasets " \
+            "should be deleted.")
         return
     if dry_run:
         print("INFO: DRY-RUN: Deleting datasets is disabled.")
@@ -440,14 +444,185 @@ def clean_triplestore_from_uris(dry_run, triplestore_client, uris_to_clean):
         starttime = time.time()
         for uri in uris_to_clean:
             print("Deleting dataset with URI: " + uri)
-            if not dry_run:
-                triplestore_client.delete_dataset_in_triplestore(uri)
+        if not dry_run:
+            triplestore_client.delete_datasets(uris_to_clean)
         endtime = time.time()
         print("INFO: Total time: %s." % (str(endtime - starttime)))
     else:
         print("INFO: TripleStore is not available. Skipping cleaning!")
 
 
+def migrate_to_named_graphs(dry_run, triplestore_client, clear_default=False):
+    '''Moves the data stored in the default graphs of the datastores into one named graph per dataset.'''
+    if not triplestore_client.named_graphs:
+        print("INFO: Named graph storage mode is not activated. Set 'ckanext.dcatde.fuseki.triplestore." \
+              "named_graphs = true' in the CKAN configuration before migrating the datastores.")
+        return
+    if dry_run:
+        print("INFO: DRY-RUN: Migrating the datastores is disabled.")
+
+    if triplestore_client.is_available():
+        starttime = time.time()
+        for datastore_name, triple_count, left_count in triplestore_client.migrate_to_named_graphs(
+                dry_run, clear_default):
+            print("INFO: %s triples found in the default graph of datastore %s." % \
+                  (triple_count, datastore_name))
+            if left_count > 0:
+                print("WARNING: %s triples are left in the default graph of datastore %s, see the log for " \
+                      "examples. Use --clear-default to delete them." % (left_count, datastore_name))
+        endtime = time.time()
+        print("INFO: Total time: %s." % (str(endtime - starttime)))
+    else:
+        print("INFO: TripleStore is not available. Skipping migration!")
+
+
+def benchmark_wire_formats(dry_run, triplestore_client, dataset_ref, rounds):
+    '''Measures the serialization and upload time of the dataset for each supported RDF wire format.'''
+    rdf_parser = RDFParser()
+    rdf_parser.parse(_get_rdf(dataset_ref), RDF_FORMAT_TURTLE)
+    uri = next(rdf_parser._datasets(), None)
+    if uri is None:
+        print("INFO: No dataset found in the RDF presentation of %s." % dataset_ref)
+        return
+    upload = not dry_run and triplestore_client.is_available()
+    if not upload:
+        print("INFO: DRY-RUN or TripleStore not available: Measuring the serialization only.")
+
+    print("INFO: Benchmarking dataset with URI %s, %s triples, %s rounds." % (uri, len(rdf_parser.g), rounds))
+    for name, wire_format in sorted(WIRE_FORMATS.items()):
+        serialize_time = upload_time = 0
+        for _ in range(rounds):
+            starttime = time.time()
+            rdf = serialize_graph(rdf_parser.g, wire_format)
+            serialize_time += time.time() - starttime
+            if upload:
+                triplestore_client.delete_dataset_in_triplestore(uri)
+                starttime = time.time()
+                triplestore_client.create_dataset_in_triplestore(rdf, uri, wire_format)
+                upload_time += time.time() - starttime
+        print("INFO: %s (%s): %s bytes, serialize %.2f ms, upload %s." % (
+            name, wire_format.content_type, len(rdf.encode('utf-8')), serialize_time * 1000 / rounds,
+            '%.2f ms' % (upload_time * 1000 / rounds) if upload else 'n/a'))
+
+
+def process_triplestore_queue(harvester, triplestore_queue, batch_size, poll_interval, run_once):
+    '''
+    Updates the datasets of the triplestore queue in the triple store. If run_once is set, the command exits
+    as soon as the queue is empty, otherwise the queue is polled every poll_interval seconds.
+    '''
+    processed_total = 0
+    while True:
+        if not harvester.triplestore_client.is_available():
+            if run_once:
+                print("INFO: TripleStore is not available. Skipping processing the queue!")
+                break
+            print("WARN: TripleStore is not available. Retrying in %s seconds." % poll_interval)
+            time.sleep(poll_interval)
+            continue
+
+        processed = triplestore_queue.process_next_batch(
+            batch_size, lambda rows: _update_queued_datasets(harvester, rows))
+        if processed:
+            processed_total += processed
+            depth, oldest = triplestore_queue.get_status()
+            print("INFO: Updated %s datasets in the triplestore. Queue depth: %s, lag: %s seconds." % \
+                  (processed, depth, _get_queue_lag(oldest)))
+        elif run_once:
+            break
+        else:
+            time.sleep(poll_interval)
+    print("INFO: Updated %s datasets in the triplestore in total." % processed_total)
+
+
+def print_triplestore_queue_status(triplestore_queue):
+    '''Prints the number of queued datasets and the age of the oldest one.'''
+    depth, oldest = triplestore_queue.get_status()
+    print("INFO: Queue depth: %s, lag: %s seconds." % (depth, _get_queue_lag(oldest)))
+
+
+def create_package_extra_indexes(dry_run, package_extra_indexes):
+    '''Creates the missing indexes on the table package_extra.'''
+    if dry_run:
+        print("INFO: DRY-RUN: The indexes will not be created.")
+    created = package_extra_indexes.create(dry_run=dry_run)
+    for index_name in created:
+        print("INFO: Created index %s." % index_name)
+    print("INFO: Created %s indexes, the other indexes already exist." % len(created))
+
+
+def drop_package_extra_indexes(dry_run, package_extra_indexes):
+    '''Drops the indexes on the table package_extra created by the extension.'''
+    if dry_run:
+        print("INFO: DRY-RUN: The indexes will not be dropped.")
+    dropped = package_extra_indexes.drop(dry_run=dry_run)
+    for index_name in dropped:
+        print("INFO: Dropped index %s." % index_name)
+    print("INFO: Dropped %s indexes." % len(dropped))
+
+
+def print_package_extra_index_status(package_extra_indexes):
+    '''Prints whether the indexes on the table package_extra exist and are used by the query planner.'''
+    for status in package_extra_indexes.check():
+        if not status.exists:
+            print("WARN: Index %s does not exist." % status.name)
+        elif not status.valid:
+            print("WARN: Index %s is invalid. Run the command create_indexes to create it again." % \
+                  status.name)
+        elif not status.used:
+            print("WARN: Index %s exists, but is not used by the query planner. Running ANALYZE on the " \
+                  "table package_extra may help." % status.name)
+        else:
+            print("INFO: Index %s exists and is used by the query planner." % status.name)
+
+
+def rebuild_identifier_registry(dry_run, identifier_registry):
+    '''Fills the identifier registry with the identifiers of all active harvested datasets.'''
+    # The harvest model requires the optional extension ckanext-harvest
+    # pylint: disable=import-outside-toplevel
+    from ckanext.harvest.model import HarvestObject
+
+    query = model.Session.query(HarvestObject.package_id, HarvestObject.harvest_source_id,
+                                model.PackageExtra.key, model.PackageExtra.value) \
+        .join(model.Package, model.Package.id == HarvestObject.package_id) \
+        .join(model.PackageExtra, model.PackageExtra.package_id == model.Package.id) \
+        .filter(HarvestObject.current.is_(True)) \
+        .filter(model.Package.state == model.State.ACTIVE) \
+        .filter(model.PackageExtra.state == model.State.ACTIVE) \
+        .filter(model.PackageExtra.key.in_(['identifier', 'guid', 'modified']))
+
+    rows = {}
+    for package_id, harvest_source_id, key, value in query.yield_per(10000):
+        row = rows.setdefault(package_id, {
+            'package_id': package_id, 'identifier': None, 'guid': None, 'modified': None,
+            'harvest_source_id': harvest_source_id})
+        row[key] = value
+
+    if dry_run:
+        print("INFO: DRY-RUN: Found %s harvested datasets with an identifier. The registry will not be " \
+              "changed." % len([row for row in rows.values() if row['identifier']]))
+        return
+    count = identifier_registry.replace_all(rows.values())
+    print("INFO: Added %s harvested datasets to the identifier registry." % count)
+
+
+def _update_queued_datasets(harvester, rows):
+    '''
+    Updates the datasets of the given queue rows in the triple store and prints the errors. Returns the URIs
+    of the datasets which could not be updated.
+    '''
+    failed_uris, error_messages = harvester.update_queued_datasets_in_triplestore(rows)
+    for error_message in error_messages:
+        print("ERROR: %s" % error_message)
+    return failed_uris
+
+
+def _get_queue_lag(oldest):
+    '''Returns the age of the oldest queued dataset in seconds.'''
+    if oldest is None:
+        return 0
+    return int((datetime.datetime.utcnow() - oldest).total_seconds())
+
+
 def _get_rdf(dataset_ref):
     '''Reads the RDF presentation of the dataset with the given ID.'''
     return tk.get_action('dcat_dataset_show')(_get_context(),
@@ -461,14 +636,24 @@ def _update_package_in_triplestore(triplestore_client, shacl_validation_client,
     rdf = _get_rdf(package_id)
     rdf_parser = RDFParser()
     rdf_parser.parse(rdf, RDF_FORMAT_TURTLE)
+    # The RDF is read as Turtle, serialize it only if another wire format is configured
+    wire_format = triplestore_client.wire_format
+    if wire_format != WIRE_FORMAT_TURTLE:
+        rdf = serialize_graph(rdf_parser.g, wire_format)
     # Should be only one dataset
     for uri in rdf_parser._datasets():
         triplestore_client.delete_dataset_in_triplestore(uri)
-        triplestore_client.create_dataset_in_triplestore(rdf, uri)
+        triplestore_client.create_dataset_in_triplestore(rdf, uri, wire_format)
 
         contributor_id = _get_contributor_id(uri, rdf_parser)
+        # the same hash as computed by the harvester, so the reports cached by a harvest are used
+        content_hash = None
+        if shacl_validation_client.cache is not None:
+            content_hash = get_content_hash(rdf_parser.g, package_org, contributor_id,
+                                            shacl_validation_client.validator_profile)
         # shacl-validate the graph
-        validation_rdf = shacl_validation_client.validate(rdf, uri, package_org, contributor_id)
+        validation_rdf = shacl_validation_client.validate(rdf, uri, package_org, contributor_id,
+                                                          wire_format.content_type, content_hash=content_hash)
         if validation_rdf:
             # update in mqa-triplestore
             triplestore_client.delete_dataset_in_triplestore_mqa(uri)
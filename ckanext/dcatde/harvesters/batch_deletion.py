@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Deletion of the datasets of the harvest objects flagged for deletion in one batch per harvest job
+"""
+import datetime
+import logging
+
+import requests
+from ckan import model
+from ckan.plugins import toolkit as tk
+from ckanext.dcat.utils import dataset_uri
+from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
+from sqlalchemy.exc import SQLAlchemyError
+
+from ckanext.dcatde.harvesters.harvest_utils import HarvestUtils
+from ckanext.dcatde.harvesters.identifier_registry import get_identifier_registry
+from ckanext.dcatde.service_health import ServiceUnavailableError
+from ckanext.harvest.model import HarvestObject
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_PARAM_BATCH_DELETE = 'ckanext.dcatde.harvest.batch_delete'
+# Maximum number of IDs in the IN list of the statements
+BATCH_DELETE_CHUNK_SIZE = 1000
+# Maximum number of package IDs in one delete query sent to the search index
+SEARCH_INDEX_CHUNK_SIZE = 200
+EXTRA_KEY_URI = 'uri'
+
+
+def _chunks(values, chunk_size):
+    """ Splits the given list into chunks with the given maximum size """
+    return [values[start:start + chunk_size] for start in range(0, len(values), chunk_size)]
+
+
+class BatchDeletionExecutor(object):
+    """
+    Deletes the datasets of the harvest objects with the status "delete" of a harvest job at once instead of
+    one by one in the import stage. The datasets are renamed and soft-deleted with chunked SQL statements in
+    one transaction, which is committed after the datasets were removed from the search index with one
+    commit. Then they are deleted from the triplestore with one batch request. The processed harvest objects
+    are completed with the report status "deleted".
+    """
+
+    def __init__(self, triplestore_client, chunk_size=BATCH_DELETE_CHUNK_SIZE):
+        self.triplestore_client = triplestore_client
+        self.chunk_size = chunk_size
+
+    def execute(self, object_ids):
+        """
+        Deletes the datasets of the given harvest objects. Returns the IDs of the harvest objects, which
+        aren't processed and have to be passed to the import stage, e.g. if the dataset isn't active, the
+        database update failed or the datasets couldn't be removed from the search index.
+        """
+        object_ids = list(object_ids)
+        if not object_ids:
+            return object_ids
+        try:
+            packages = self._read_active_packages(object_ids)
+        except SQLAlchemyError as ex:
+            model.Session.rollback()
+            LOGGER.error(u'Error while reading the datasets to delete: %s', ex)
+            return object_ids
+        if not packages:
+            return object_ids
+
+        package_ids = sorted({package_id for _, package_id, _ in packages})
+        try:
+            uris = self._read_dataset_uris(package_ids)
+            self._delete_packages_in_db(packages)
+        except SQLAlchemyError as ex:
+            model.Session.rollback()
+            LOGGER.error(u'Error while deleting %s datasets in one batch. Deleting them one by one: %s',
+                         len(package_ids), ex)
+            return object_ids
+        # The changes are committed only after the datasets were removed from the search index. If one of
+        # both fails, the datasets stay active and are deleted one by one in the import stage.
+        if not self._delete_packages_from_search_index(package_ids):
+            model.Session.rollback()
+            return object_ids
+        try:
+            model.Session.commit()
+        except SQLAlchemyError as ex:
+            model.Session.rollback()
+            LOGGER.error(u'Error while committing the deletion of %s datasets. Deleting them one by one: %s',
+                         len(package_ids), ex)
+            return object_ids
+        LOGGER.info(u'Deleted %s datasets of %s harvest objects in one batch.', len(package_ids),
+                    len(packages))
+
+        registry = get_identifier_registry()
+        if registry is not None:
+            try:
+                registry.unregister(package_ids)
+            except SQLAlchemyError as ex:
+                LOGGER.warning(u'Error while removing deleted datasets from the identifier registry: %s', ex)
+
+        self._delete_datasets_in_triplestore(uris)
+
+        processed_object_ids = {object_id for object_id, _, _ in packages}
+        return [object_id for object_id in object_ids if object_id not in processed_object_ids]
+
+    def _read_active_packages(self, object_ids):
+        """
+        Returns a list of tuples (harvest object ID, package ID, package name) of the given harvest objects
+        referencing an active dataset.
+        """
+        packages = []
+        for chunk in _chunks(object_ids, self.chunk_size):
+            packages.extend(
+                model.Session.query(HarvestObject.id, model.Package.id, model.Package.name)
+                .join(model.Package, model.Package.id == HarvestObject.package_id)
+                .filter(HarvestObject.id.in_(chunk))
+                .filter(model.Package.state == model.State.ACTIVE))
+        return packages
+
+    def _read_dataset_uris(self, package_ids):
+        """
+        Returns the URIs of the given datasets. If a dataset has no URI extra, the URI is built like in the
+        RDF serialization of the dataset.
+        """
+        uris = {}
+        for chunk in _chunks(package_ids, self.chunk_size):
+            uris.update(model.Session.query(model.PackageExtra.package_id, model.PackageExtra.value)
+                        .filter(model.PackageExtra.package_id.in_(chunk))
+                        .filter(model.PackageExtra.key == EXTRA_KEY_URI)
+                        .filter(model.PackageExtra.state == model.State.ACTIVE))
+        return sorted(uris.get(package_id) or dataset_uri({'id': package_id, 'extras': []})
+                      for package_id in package_ids)
+
+    def _delete_packages_in_db(self, packages):
+        """
+        Renames and soft-deletes the given datasets, deletes their memberships and completes the harvest
+        objects. The changes are not committed.
+        """
+        now = datetime.datetime.utcnow()
+        package_names = {package_id: name for _, package_id, name in packages}
+        for chunk in _chunks(sorted(package_names), self.chunk_size):
+            model.Session.bulk_update_mappings(model.Package, [
+                {'id': package_id,
+                 'name': HarvestUtils.create_new_name_for_deletion(package_names[package_id]),
+                 'state': model.State.DELETED, 'metadata_modified': now}
+                for package_id in chunk])
+            model.Session.query(model.Member) \
+                .filter(model.Member.table_id.in_(chunk)) \
+                .filter(model.Member.state == model.State.ACTIVE) \
+                .update({'state': model.State.DELETED}, False)
+            model.Session.query(model.PackageMember) \
+                .filter(model.PackageMember.package_id.in_(chunk)) \
+                .delete(False)
+            model.Session.query(HarvestObject) \
+                .filter(HarvestObject.current.is_(True)) \
+                .filter(HarvestObject.package_id.in_(chunk)) \
+                .update({'current': False}, False)
+        for chunk in _chunks([object_id for object_id, _, _ in packages], self.chunk_size):
+            model.Session.query(HarvestObject) \
+                .filter(HarvestObject.id.in_(chunk)) \
+                .update({'state': 'COMPLETE', 'report_status': 'deleted', 'import_started': now,
+                         'import_finished': now}, False)
+
+    @staticmethod
+    def _delete_packages_from_search_index(package_ids):
+        """
+        Removes the given datasets from the search index. The index is committed after the last request.
+        Returns True if the datasets were removed.
+        """
+        # pylint: disable=import-outside-toplevel
+        from ckan.lib.search.common import make_connection
+        site_id = tk.config.get('ckan.site_id')
+        chunks = _chunks(package_ids, SEARCH_INDEX_CHUNK_SIZE)
+        try:
+            connection = make_connection()
+            for index, chunk in enumerate(chunks):
+                query = u'+entity_type:package +site_id:"%s" +id:(%s)' % (
+                    site_id, u' OR '.join(u'"%s"' % package_id for package_id in chunk))
+                connection.delete(q=query, commit=index == len(chunks) - 1)
+            return True
+        except Exception as ex:
+            LOGGER.error(u'Error while removing %s datasets from the search index. Deleting them one by ' \
+                         u'one: %s', len(package_ids), ex)
+            return False
+
+    def _delete_datasets_in_triplestore(self, uris):
+        """ Deletes the datasets with the given URIs from all triplestore datastores """
+        if not uris or not self.triplestore_client.is_available():
+            return
+        try:
+            self.triplestore_client.delete_datasets(uris)
+        except (SPARQLWrapperException, ServiceUnavailableError, requests.exceptions.RequestException) as ex:
+            LOGGER.warning(u'Error while deleting %s datasets from triplestore: %s', len(uris), ex)
@@ -5,43 +5,109 @@ DCAT-AP.de RDF Harvester module.
 '''
 import json
 import logging
+import threading
 import time
-from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed, SPARQLWrapperException
+import requests
 from rdflib import Graph, Literal, URIRef
 from rdflib.namespace import FOAF
 from ckan import model
 from ckan import plugins as p
 from ckan.lib.search import SearchIndexError
 from ckan.logic import UnknownValidator
+from ckan.model.types import make_uuid
 from ckan.plugins import toolkit as tk
 from ckanext.dcat.exceptions import RDFParserException
 from ckanext.dcat.harvesters.rdf import DCATRDFHarvester
 from ckanext.dcat.interfaces import IDCATRDFHarvester
 from ckanext.dcat.processors import RDFParser
+from ckanext.dcatde import json_utils
 from ckanext.dcatde.dataset_utils import set_extras_field, EXTRA_KEY_HARVESTED_PORTAL, get_extras_field
+from ckanext.dcatde.harvesters.batch_deletion import CONFIG_PARAM_BATCH_DELETE, BatchDeletionExecutor
+from ckanext.dcatde.harvesters.harvest_source_config import CONFIG_PARAM_HARVESTED_PORTAL, \
+    get_harvest_source_config
 from ckanext.dcatde.harvesters.harvest_utils import HarvestUtils
+from ckanext.dcatde.harvesters.license_statistics import LICENSE_MISSING, LICENSE_UNKNOWN, LICENSE_UPGRADED, \
+    LicenseStatistics, harvest_jobs_run, save_license_statistics
 from ckanext.dcatde.migration.util import load_json_mapping
 from ckanext.dcatde.profiles import DCATDE, DCAT
+from ckanext.dcatde.rdf_wire_format import get_wire_format, serialize_graph
+from ckanext.dcatde.service_health import ServiceUnavailableError
 from ckanext.dcatde.triplestore.fuseki_client import FusekiTriplestoreClient
-from ckanext.dcatde.triplestore.sparql_query_templates import GET_DATASET_BY_URI_SPARQL_QUERY, \
-    GET_URIS_FROM_HARVEST_INFO_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import GET_CONTENT_HASHES_FROM_HARVEST_INFO_QUERY, \
+    GET_CONTENT_HASHES_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY, \
+    GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_QUERY, \
+    GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY, GOVDATA_HARVEST_INFO
+from ckanext.dcatde.triplestore.subgraph_extractor import DatasetSubgraphExtractor
+from ckanext.dcatde.triplestore.sync_queue import TriplestoreSyncQueue
 from ckanext.dcatde.validation.shacl_validation import ShaclValidator
+from ckanext.dcatde.validation.validation_cache import get_content_hash
 from ckanext.harvest.model import HarvestObject, HarvestObjectExtra
 
 
 LOGGER = logging.getLogger(__name__)
 
-CONFIG_PARAM_HARVESTED_PORTAL = 'harvested_portal'
-CONFIG_PARAM_RESOURCES_REQUIRED = 'resources_required'
-CONFIG_PARAM_CONTRIBUTOR_ID = 'contributorID'
 CONTRIBUTOR_ID_FIELD_NAME = 'contributorID'
 RES_EXTRA_KEY_LICENSE = 'license'
+CONFIG_PARAM_SKIP_UNCHANGED = 'ckanext.dcatde.fuseki.triplestore.skip_unchanged_datasets'
+CONFIG_PARAM_VALIDATION_WORKERS = 'ckanext.dcatde.shacl_validator.max_workers'
+# Maximum number of pending validation requests per worker before waiting for results
+VALIDATION_QUEUE_SIZE_PER_WORKER = 2
+CONFIG_PARAM_SYNC_MODE = 'ckanext.dcatde.fuseki.triplestore.sync_mode'
+SYNC_MODE_INLINE = 'inline'
+SYNC_MODE_QUEUE = 'queue'
+CONFIG_PARAM_HARVEST_INFO_CHUNK_SIZE = 'ckanext.dcatde.fuseki.harvest.info.chunk_size'
+DEFAULT_HARVEST_INFO_CHUNK_SIZE = 1000
+CONFIG_PARAM_STREAMING = 'ckanext.dcatde.harvest.streaming'
+CONFIG_PARAM_MEMORY_BUDGET = 'ckanext.dcatde.harvest.streaming.memory_budget_mb'
+DEFAULT_MEMORY_BUDGET_MB = 1024
+# Rough estimate of the ratio of the memory used by a parsed rdflib graph to the size of the serialized RDF.
+# It depends on the data, so the estimated memory usage is not an upper bound.
+PARSED_GRAPH_MEMORY_FACTOR = 10
+# Maximum number of GUIDs in the IN list of the statements marking datasets for deletion
+DELETION_CHUNK_SIZE = 1000
+# Number of rows fetched at once from the server-side cursor reading the GUIDs of a portal
+GUID_MAP_YIELD_PER = 10000
+
+# A dataset to update in the triplestore. If graph is None, the dataset is only deleted.
+TriplestoreDataset = namedtuple('TriplestoreDataset',
+                                ['uri', 'graph', 'rdf_graph', 'contributor_id', 'content_hash'])
+
+# A downloaded page of a harvest source with the gather errors which occurred while downloading
+HarvestPage = namedtuple('HarvestPage', ['content', 'rdf_format', 'errors'])
+
+
+def _compact_package_id(package_id):
+    '''
+    Returns the package ID as integer if it is a UUID in canonical form, which needs less memory than the
+    string. Other IDs are returned unchanged.
+    '''
+    try:
+        package_uuid = uuid.UUID(package_id)
+    except (TypeError, ValueError):
+        return package_id
+    return package_uuid.int if str(package_uuid) == package_id else package_id
+
+
+def _expand_package_id(package_id):
+    '''Returns the package ID compacted by _compact_package_id() as string'''
+    return str(uuid.UUID(int=package_id)) if isinstance(package_id, int) else package_id
 
 
 class DCATdeRDFHarvester(DCATRDFHarvester):
     """ DCAT-AP.de RDF Harvester """
 
     p.implements(IDCATRDFHarvester)
+    p.implements(p.IActions)
+
+    # -- begin IActions implementation --
+    def get_actions(self):
+        '''Chains the action harvest_jobs_run to log the license statistics of the finished harvest jobs'''
+        return {'harvest_jobs_run': harvest_jobs_run}
+    # -- end IActions implementation --
 
     # -- begin IDCATRDFHarvester implementation --
     # pylint: disable=missing-function-docstring,unused-argument
@@ -55,9 +121,17 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
         return content, []
 
     def after_parsing(self, rdf_parser, harvest_job):
-        """ Insert harvested data into triplestore and validate the data """
+        """
+        Insert harvested data into triplestore and validate the data. In the sync mode 'queue' the
+        datasets are only added to the triplestore queue, which is processed by the command
+        'triplestore worker'. The worker skips the unchanged datasets then, so the triplestore isn't
+        requested here at all.
+        """
         error_messages = []
-        if rdf_parser and self.triplestore_client.is_available():
+        if rdf_parser and self._prefetch_executor is not None:
+            self._prefetch_next_page(rdf_parser, harvest_job)
+        queue_mode = self.sync_mode == SYNC_MODE_QUEUE
+        if rdf_parser and (queue_mode or self.triplestore_client.is_available()):
             LOGGER.debug(u'Start updating triplestore...')
 
             source_dataset = model.Package.get(harvest_job.source.id)
@@ -68,48 +142,30 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
             else:
                 owner_org = source_dataset.owner_org
 
+            subgraph_extractor = DatasetSubgraphExtractor(rdf_parser.g)
+            existing_hashes = {} if queue_mode else self._get_existing_content_hashes(harvest_job)
+            skipped_count = 0
+            batch = []
+            harvest_info = OrderedDict()
             for uri in rdf_parser._datasets():
                 LOGGER.debug(u'Process URI: %s', uri)
-                try:
-                    self._delete_dataset_in_triplestore_by_uri(uri)
-
-                    triples = rdf_parser.g.query(GET_DATASET_BY_URI_SPARQL_QUERY % {'uri': uri})
-
-                    if triples:
-                        graph = Graph()
-                        for triple in triples:
-                            graph.add(triple)
-
-                        # Skip the dataset if it does't contain a distribution when it's required
-                        if self._skip_dataset_in_triplestore(harvest_job.source.config, uri, graph):
-                            continue
-
-                        # Add contributor id from harvester config
-                        contributor_id = self._add_contributor_id_from_harvest_source_config(
-                            harvest_job, uri, graph)
-
-                        rdf_graph = graph.serialize(format="turtle")
-
-                        # Save dataset graph in the triple store
-                        self.triplestore_client.create_dataset_in_triplestore(rdf_graph, uri)
-
-                        # save harvesting info
-                        self._save_harvest_info(harvest_job, owner_org, uri)
-
-                        # SHACL Validation
-                        if owner_org or contributor_id:
-                            self._validate_dataset_rdf_graph(uri, rdf_graph, owner_org, contributor_id)
-                    else:
-                        LOGGER.warning(u'Could not find triples to URI %s. Updating is not possible.', uri)
-                except SPARQLWrapperException as exception:
-                    LOGGER.error(u'Unexpected error while deleting dataset with URI %s from TripleStore: %s',
-                                 uri, exception)
-                    error_messages.append(u'Error while deleting dataset from TripleStore: %s' % exception)
-                except Exception as exception:
-                    LOGGER.warning(u'Unexpected error or error while graph serialization: %s. Skipping ' \
-                                   u'dataset with URI %s.', exception, uri)
-                    error_messages.append(u'Unexpected error or error while graph serialization: %s' \
-                                          % exception)
+                dataset = self._prepare_dataset_for_triplestore(subgraph_extractor, harvest_job, owner_org,
+                                                                uri, error_messages)
+                if dataset.content_hash and existing_hashes.get(str(uri)) == dataset.content_hash:
+                    LOGGER.debug(u'Dataset with URI %s is unchanged. Skip updating triplestore.', uri)
+                    skipped_count += 1
+                    continue
+                batch.append(dataset)
+                if len(batch) >= self.triplestore_client.batch_size:
+                    self._sync_datasets_with_triplestore(batch, harvest_job, owner_org, harvest_info,
+                                                         error_messages)
+                    self._flush_harvest_info(harvest_info, error_messages, full_chunks_only=True)
+                    batch = []
+            self._sync_datasets_with_triplestore(batch, harvest_job, owner_org, harvest_info, error_messages)
+            self._flush_harvest_info(harvest_info, error_messages)
+            if skipped_count:
+                LOGGER.info(u'Skipped updating %s unchanged datasets of harvest source %s in the ' \
+                            u'triplestore.', skipped_count, harvest_job.source.id)
             LOGGER.debug(u'Finished updating triplestore.')
 
         return rdf_parser, error_messages
@@ -152,6 +208,35 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
 
         self.triplestore_client = FusekiTriplestoreClient()
         self.shacl_validator_client = ShaclValidator()
+        self.skip_unchanged_datasets = tk.asbool(tk.config.get(CONFIG_PARAM_SKIP_UNCHANGED, False))
+        self._content_hashes_cache = (None, {})
+        self.validation_workers = max(tk.asint(tk.config.get(CONFIG_PARAM_VALIDATION_WORKERS, 1)), 1)
+        local_engine = self.shacl_validator_client.local_engine
+        if local_engine is not None and self.validation_workers < local_engine.workers:
+            # Each validation thread waits for one worker process, so fewer threads leave processes idle
+            LOGGER.warning(u'The number of validation workers (%s) is less than the number of local SHACL ' \
+                           u'validation workers (%s). Using %s validation workers.', self.validation_workers,
+                           local_engine.workers, local_engine.workers)
+            self.validation_workers = local_engine.workers
+        self._validation_executor = None
+        self.sync_mode = tk.config.get(CONFIG_PARAM_SYNC_MODE, SYNC_MODE_INLINE)
+        if self.sync_mode not in (SYNC_MODE_INLINE, SYNC_MODE_QUEUE):
+            LOGGER.warning(u'Unknown triplestore sync mode "%s". Using the sync mode "%s".', self.sync_mode,
+                           SYNC_MODE_INLINE)
+            self.sync_mode = SYNC_MODE_INLINE
+        self.triplestore_queue = TriplestoreSyncQueue()
+        self.wire_format = get_wire_format()
+        self.harvest_info_chunk_size = max(tk.asint(tk.config.get(CONFIG_PARAM_HARVEST_INFO_CHUNK_SIZE,
+                                                                  DEFAULT_HARVEST_INFO_CHUNK_SIZE)), 1)
+        self.streaming = tk.asbool(tk.config.get(CONFIG_PARAM_STREAMING, False))
+        memory_budget_mb = tk.asint(tk.config.get(CONFIG_PARAM_MEMORY_BUDGET, DEFAULT_MEMORY_BUDGET_MB))
+        self.memory_budget = max(memory_budget_mb, 1) * 1024 * 1024
+        self._page_download = threading.local()
+        self._prefetch_executor = None
+        self._prefetched_page = None
+        self._page_number = 0
+        self._last_page = (0, None)
+        self.batch_delete = tk.asbool(tk.config.get(CONFIG_PARAM_BATCH_DELETE, False))
 
         self.licenses_upgrade = {}
         license_file = tk.config.get('ckanext.dcatde.urls.dcat_licenses_upgrade_mapping')
@@ -170,44 +255,120 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
         }
 
     @staticmethod
-    def _get_portal_from_config(source_config):
+    def _get_portal_from_config(source):
         ''' Get portal from source '''
-        if source_config:
-            return json.loads(source_config).get(CONFIG_PARAM_HARVESTED_PORTAL)
-
-        return ''
+        return get_harvest_source_config(source).harvested_portal
 
     @staticmethod
-    def _get_resources_required_config(source_config):
+    def _get_resources_required_config(source):
         ''' Check if resources are required in source '''
-        if source_config:
-            return json.loads(source_config).get(CONFIG_PARAM_RESOURCES_REQUIRED, False)
-
-        return False
+        return get_harvest_source_config(source).resources_required
 
     @staticmethod
-    def _get_contributor_from_config(source_config):
+    def _get_contributor_from_config(source):
         ''' Get contributor ID from source '''
-        if source_config:
-            return json.loads(source_config).get(CONFIG_PARAM_CONTRIBUTOR_ID)
+        return get_harvest_source_config(source).contributor_id
 
-        return ''
-
-    @staticmethod
-    def _get_fallback_license():
-        ''' Get fallback licence from config '''
-        fallback = tk.config.get('ckanext.dcatde.harvest.default_license',
-                                     'http://dcat-ap.de/def/licenses/other-closed')
-        return fallback
-
-    def _skip_dataset_in_triplestore(self, harvester_config, uri, graph):
+    def _skip_dataset_in_triplestore(self, source, uri, graph):
         ''' Returns True if resources_required is active and dataset does not contain a distribution'''
-        if self._get_resources_required_config(harvester_config) \
+        if self._get_resources_required_config(source) \
                 and (uri, DCAT.distribution, None) not in graph:
             LOGGER.debug(u'%s does not contain a valid resource! Skip saving dataset in triple store.', uri)
             return True
         return False
 
+    def gather_stage(self, harvest_job):
+        '''
+        Gathers the datasets of the harvest source with DCATRDFHarvester.gather_stage(). In the streaming
+        mode the next page of the harvest source is downloaded while the current page is processed, see
+        _prefetch_next_page() and _get_content_and_type(). The validation threads are shut down at the end of
+        the gather stage.
+        '''
+        try:
+            if not self.streaming:
+                return super().gather_stage(harvest_job)
+
+            self._page_number = 0
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=1,
+                                                         thread_name_prefix='harvest-page-download')
+            try:
+                return super().gather_stage(harvest_job)
+            finally:
+                self._prefetch_executor.shutdown(wait=True)
+                self._prefetch_executor = None
+                self._prefetched_page = None
+        finally:
+            self.shutdown_validation_executor()
+
+    def _get_content_and_type(self, url, harvest_job, page=1, content_type=None):
+        '''
+        Returns the content and type of the page with the given URL. In the streaming mode the page
+        prefetched by _prefetch_next_page() is used if it has the requested URL, and the size of the page is
+        recorded for the estimate of the memory usage.
+        '''
+        prefetched_page, self._prefetched_page = self._prefetched_page, None
+        # the before_download() hooks may have changed the URL of the next page after it was prefetched
+        if prefetched_page is not None and prefetched_page[0] == url:
+            harvest_page = prefetched_page[1].result()
+            for error_msg in harvest_page.errors:
+                self._save_gather_error(error_msg, harvest_job)
+            content, content_type = harvest_page.content, harvest_page.rdf_format
+        else:
+            content, content_type = super()._get_content_and_type(url, harvest_job, page,
+                                                                  content_type=content_type)
+        if self._prefetch_executor is not None:
+            self._page_number += 1
+            self._last_page = (len(content) if content else 0, content_type)
+        return content, content_type
+
+    def _prefetch_next_page(self, rdf_parser, harvest_job):
+        '''
+        Starts downloading the next page of the harvest source while the current page is processed, if the
+        estimated memory usage fits into the memory budget. Called by after_parsing() in the streaming mode.
+        '''
+        next_page_url = rdf_parser.next_page()
+        content_size, rdf_format = self._last_page
+        if next_page_url and self._is_prefetch_in_memory_budget(content_size, self._page_number):
+            self._prefetched_page = (next_page_url, self._prefetch_executor.submit(
+                self._download_page, next_page_url, harvest_job, rdf_format))
+
+    def _download_page(self, url, harvest_job, rdf_format):
+        '''
+        Downloads the page with the given URL. The gather errors are returned with the page instead of
+        being saved, so the page can be downloaded in another thread.
+        '''
+        errors = []
+        self._page_download.errors = errors
+        try:
+            content, rdf_format = super()._get_content_and_type(url, harvest_job, 1, content_type=rdf_format)
+        finally:
+            self._page_download.errors = None
+        return HarvestPage(content, rdf_format, errors)
+
+    def _save_gather_error(self, message, job):
+        # pylint: disable=arguments-differ
+        errors = getattr(self._page_download, 'errors', None)
+        if errors is not None:
+            errors.append(message)
+        else:
+            super()._save_gather_error(message, job)
+
+    def _is_prefetch_in_memory_budget(self, content_size, page_number):
+        '''
+        Checks if the next page can be downloaded while the current page with the given size is processed.
+        The next page is expected to have the same size as the current one. The memory usage is only a rough
+        estimate based on the page size, so the budget doesn't limit the actual peak memory of the process.
+        '''
+        page_memory = content_size * PARSED_GRAPH_MEMORY_FACTOR
+        if page_memory > self.memory_budget:
+            LOGGER.warning(u'The estimated memory usage of page %s (%s MB) exceeds the memory budget of ' \
+                           u'the harvester.', page_number, page_memory // (1024 * 1024))
+        if page_memory + content_size > self.memory_budget:
+            LOGGER.debug(u'Skip prefetching the page after page %s to stay within the memory budget.',
+                         page_number)
+            return False
+        return True
+
     def _mark_datasets_for_deletion(self, guids_in_source, harvest_job):
         # If a harvested portal is configured in the harvest source, we call the superclass method to mark
         # datasets for deletion. Otherwise, we use a different query to mark datasets for deletion.
@@ -216,7 +377,7 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
         guids_to_delete = []
         guids_in_source_unique = set(guids_in_source)
 
-        portal = self._get_portal_from_config(harvest_job.source.config)
+        portal = self._get_portal_from_config(harvest_job.source)
         if not portal:
             LOGGER.debug('No harvested portal configured. Using superclass method to mark datasets for ' \
                          'deletion.')
@@ -252,93 +413,127 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
                 .filter(model.PackageExtra.key == EXTRA_KEY_HARVESTED_PORTAL) \
                 .filter(model.PackageExtra.value == portal)
 
+            # Stream the rows with a server-side cursor and store the package IDs compactly, so the memory
+            # usage stays low for portals with many datasets
             checkpoint_start = time.time()
             guid_to_package_id = {}
-            for package_id, guid in query:
-                if guid:
-                    guid_to_package_id[guid] = package_id
+            rows_in_db = 0
+            for package_id, guid in query.yield_per(GUID_MAP_YIELD_PER):
+                rows_in_db += 1
                 # Also remove all packages without a GUID, use ID as GUID to share logic below
-                else:
-                    guid_to_package_id[package_id] = package_id
+                guid_to_package_id[guid or package_id] = _compact_package_id(package_id)
             checkpoint_end = time.time()
             LOGGER.debug('Time for query harvest source related datasets : %s',
                          str(checkpoint_end - checkpoint_start))
 
-            guids_in_db = list(guid_to_package_id.keys())
-
             # Get objects/datasets to delete (ie in the DB but not in the source)
-            guids_in_db_unique = set(guids_in_db)
             LOGGER.debug('guids in source: %s, unique guids in source: %s, ' \
                          'guids in db: %s, unique guids in db: %s', len(guids_in_source),
-                         len(guids_in_source_unique), len(guids_in_db), len(guids_in_db_unique))
-            guids_to_delete = guids_in_db_unique - guids_in_source_unique
+                         len(guids_in_source_unique), rows_in_db, len(guid_to_package_id))
+            guids_to_delete = guid_to_package_id.keys() - guids_in_source_unique
+            guid_to_package_id = {guid: _expand_package_id(guid_to_package_id[guid])
+                                  for guid in guids_to_delete}
+            LOGGER.debug('Time for computing the datasets to delete : %s', str(time.time() - checkpoint_end))
 
             # Create a harvest object for each of them, flagged for deletion
-            for guid in guids_to_delete:
-                obj = HarvestObject(guid=guid, job=harvest_job,
-                                    package_id=guid_to_package_id[guid],
-                                    extras=[HarvestObjectExtra(key='status',
-                                                               value='delete')])
-
-                # Mark the rest of objects for this guid as not current
-                model.Session.query(HarvestObject) \
-                    .filter_by(guid=guid) \
-                    .update({'current': False}, False)
-                obj.save()
-                object_ids.append(obj.id)
+            object_ids = self._create_deletion_harvest_objects(guids_to_delete, guid_to_package_id,
+                                                               harvest_job)
 
             endtime = time.time()
             LOGGER.debug('Found %s packages for deletion. Time total: %s', len(guids_to_delete),
                          str(endtime - starttime))
 
+        if self.batch_delete and object_ids:
+            # Only the harvest objects not deleted in the batch are passed to the import stage
+            object_ids = BatchDeletionExecutor(self.triplestore_client).execute(object_ids)
+
         self._delete_deprecated_datasets_from_triplestore(
             guids_in_source_unique, guids_to_delete, harvest_job)
 
         return object_ids
 
-    def _amend_package(self, harvest_object):
+    @staticmethod
+    def _create_deletion_harvest_objects(guids_to_delete, guid_to_package_id, harvest_job):
         '''
-        Amend package information.
+        Creates a harvest object flagged for deletion for each of the given GUIDs and marks the other
+        objects of these GUIDs as not current. The rows are written with set-based statements in chunks
+        and committed once. Returns the IDs of the created harvest objects.
+        '''
+        object_ids = []
+        guids_to_delete = list(guids_to_delete)
+        # The before_insert listener of HarvestObject isn't called for bulk inserts
+        harvest_source_id = harvest_job.source.id
+        for chunk_start in range(0, len(guids_to_delete), DELETION_CHUNK_SIZE):
+            guids_chunk = guids_to_delete[chunk_start:chunk_start + DELETION_CHUNK_SIZE]
+            harvest_objects = []
+            harvest_object_extras = []
+            for guid in guids_chunk:
+                object_id = make_uuid()
+                harvest_objects.append({'id': object_id, 'guid': guid, 'harvest_job_id': harvest_job.id,
+                                        'harvest_source_id': harvest_source_id,
+                                        'package_id': guid_to_package_id[guid]})
+                harvest_object_extras.append({'id': make_uuid(), 'harvest_object_id': object_id,
+                                              'key': 'status', 'value': 'delete'})
+                object_ids.append(object_id)
+
+            # Mark the rest of objects for these guids as not current
+            model.Session.query(HarvestObject) \
+                .filter(HarvestObject.guid.in_(guids_chunk)) \
+                .update({'current': False}, False)
+            model.Session.bulk_insert_mappings(HarvestObject, harvest_objects)
+            model.Session.bulk_insert_mappings(HarvestObjectExtra, harvest_object_extras)
+        model.Session.commit()
+        return object_ids
+
+    def _amend_package(self, harvest_object, package):
+        '''
+        Amend package information. The given parsed package is changed in place.
         '''
-        package = json.loads(harvest_object.content)
         if 'extras' not in package:
             package['extras'] = []
 
         # add contributor_id if missing
         self._set_contributor_id_for_dataset(harvest_object, package)
 
-        portal = self._get_portal_from_config(harvest_object.source.config)
-        if portal:
-            set_extras_field(package, EXTRA_KEY_HARVESTED_PORTAL, portal)
+        source_config = get_harvest_source_config(harvest_object.source)
+        if source_config.harvested_portal:
+            set_extras_field(package, EXTRA_KEY_HARVESTED_PORTAL, source_config.harvested_portal)
 
-        # ensure all resources have a (recent) license
+        # ensure all resources have a (recent) license. The changes are counted per harvest object to
+        # summarize them per harvest job and logged in detail on the debug level only.
+        license_statistics = LicenseStatistics()
         for resource in package.get('resources', []):
-            log_prefix = u'{0}: Resource {1} of package {2} (GUID {3})'.format(
-                harvest_object.source.title, resource.get('uri', ''), package.get('name', ''),
-                harvest_object.guid
-            )
-
+            resource_uri = resource.get('uri', '')
             if resource.get(RES_EXTRA_KEY_LICENSE, '') == '':
-                LOGGER.info(log_prefix + u' has no license. Adding default value.')
-                resource[RES_EXTRA_KEY_LICENSE] = self._get_fallback_license()
+                LOGGER.debug(u'%s: Resource %s of package %s (GUID %s) has no license. Adding default value.',
+                             harvest_object.source.title, resource_uri, package.get('name', ''),
+                             harvest_object.guid)
+                resource[RES_EXTRA_KEY_LICENSE] = source_config.fallback_license
+                license_statistics.add(LICENSE_MISSING, harvest_object.guid, resource_uri,
+                                       source_config.fallback_license)
             elif self.licenses_upgrade:
                 current_license = resource.get(RES_EXTRA_KEY_LICENSE)
                 new_license = self.licenses_upgrade.get(current_license, '')
                 if new_license == '':
-                    LOGGER.info(log_prefix + u' has a deprecated or unknown license {0}. '\
-                                u'Keeping old value.'.format(current_license))
+                    LOGGER.debug(u'%s: Resource %s of package %s (GUID %s) has a deprecated or unknown ' \
+                                 u'license %s. Keeping old value.', harvest_object.source.title, resource_uri,
+                                 package.get('name', ''), harvest_object.guid, current_license)
+                    license_statistics.add(LICENSE_UNKNOWN, harvest_object.guid, resource_uri,
+                                           current_license)
                 elif current_license != new_license:
-                    LOGGER.info(log_prefix + u' had old license {0}. '\
-                                u'Updated value to recent DCAT list.'.format(current_license))
+                    LOGGER.debug(u'%s: Resource %s of package %s (GUID %s) had old license %s. ' \
+                                 u'Updated value to recent DCAT list.', harvest_object.source.title,
+                                 resource_uri, package.get('name', ''), harvest_object.guid, current_license)
                     resource[RES_EXTRA_KEY_LICENSE] = new_license
-        # write changes back to harvest object content
-        harvest_object.content = json.dumps(package)
+                    license_statistics.add(LICENSE_UPGRADED, harvest_object.guid, resource_uri,
+                                           current_license, new_license)
+        save_license_statistics(harvest_object, license_statistics)
 
     def _set_contributor_id_for_dataset(self, harvest_object, package):
         '''
         Add contributor_id if not yet available in ckan dataset.
         '''
-        source_contributor_id = self._get_contributor_from_config(harvest_object.source.config)
+        source_contributor_id = self._get_contributor_from_config(harvest_object.source)
 
         contributor_id_field = get_extras_field(package, CONTRIBUTOR_ID_FIELD_NAME)
         if contributor_id_field:
@@ -354,12 +549,11 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
             LOGGER.debug(u'No contributorId field. Added contributorId from Harvester source to dataset'\
                          u' with GUID %s', harvest_object.guid)
 
-    def _skip_datasets_without_resource(self, harvest_object):
+    def _skip_datasets_without_resource(self, harvest_object, package):
         '''
-        Checks if resources are present when configured.
+        Checks if resources are present in the parsed package when configured.
         '''
-        package = json.loads(harvest_object.content)
-        if (self._get_resources_required_config(harvest_object.source.config)\
+        if (self._get_resources_required_config(harvest_object.source)\
              and not package.get('resources')):
             # write details to log
             LOGGER.info(u'%s: Resources are required, but dataset %s (GUID %s) has none. Skipping dataset.',
@@ -386,8 +580,11 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
             LOGGER.info(u'Deleted package %s with guid %s', harvest_object.package_id, harvest_object.guid)
             return True
 
+        # parse the content once for all checks and changes of the DCAT-AP.de harvester
+        package = json_utils.loads(harvest_object.content)
+
         # skip if resources are not present when configured
-        if self._skip_datasets_without_resource(harvest_object):
+        if self._skip_datasets_without_resource(harvest_object, package):
             info_deleted_local_dataset = ''
             datasets_from_db = self._read_datasets_from_db(harvest_object.guid)
             if datasets_from_db:
@@ -411,9 +608,11 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
             return False
 
         # set custom field and perform other fixes on the data
-        self._amend_package(harvest_object)
+        self._amend_package(harvest_object, package)
+        # write changes back to harvest object content, which is parsed again by the base implementation
+        harvest_object.content = json_utils.dumps(package)
 
-        import_dataset = HarvestUtils.handle_duplicates(harvest_object)
+        import_dataset = HarvestUtils.handle_duplicates(harvest_object, package)
         if import_dataset:
             try:
                 return super().import_stage(harvest_object)
@@ -477,14 +676,25 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
             else:
                 LOGGER.debug(u'URI could not determined. Skip deleting.')
 
-    def _validate_dataset_rdf_graph(self, uri, rdf_graph, owner_org, contributor_id,):
+    def _validate_dataset_rdf_graph(self, uri, rdf_graph, owner_org, contributor_id, content_hash=None):
         '''
         Validates the package rdf graph with the given URI and saves the validation report in the
-        triple store.
+        triple store. Returns True if a validation report was saved.
+        '''
+        result = self.shacl_validator_client.validate(rdf_graph, uri, owner_org, contributor_id,
+                                                      self.wire_format.content_type,
+                                                      content_hash=content_hash)
+        return self._save_validation_report(result, uri)
+
+    def _save_validation_report(self, result, uri):
+        '''
+        Saves the validation report of the dataset with the given URI in the triple store. Returns True if
+        a validation report was saved.
         '''
-        result = self.shacl_validator_client.validate(rdf_graph, uri, owner_org, contributor_id)
         if result:
             self.triplestore_client.create_dataset_in_triplestore_mqa(result, uri)
+            return True
+        return False
 
     def _delete_deprecated_datasets_from_triplestore(self, harvested_uris, uris_db_marked_deleted,
                                                      harvest_job):
@@ -498,50 +708,48 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
         source_dataset = model.Package.get(harvest_job.source.id)
         if source_dataset and hasattr(source_dataset, 'owner_org'):
             owner_org = source_dataset.owner_org
-        # Read URIs from harvest_info datastore
-        existing_uris = self._get_existing_dataset_uris_from_triplestore(harvest_job.source.id)
-
-        # compare existing with harvested URIs to see which URIs were not updated
-        existing_uris_unique = set(existing_uris)
-        harvested_uris_unique = set(harvested_uris)
-        uris_to_be_deleted = (existing_uris_unique - harvested_uris_unique) - set(uris_db_marked_deleted)
+        # compare the URIs streamed from the harvest_info datastore with the harvested URIs to see which
+        # URIs were not updated
+        uris_to_keep = set(harvested_uris)
+        uris_to_keep.update(uris_db_marked_deleted)
+        uris_to_be_deleted = set(
+            uri for uri in self._iter_existing_dataset_uris_from_triplestore(harvest_job.source.id)
+            if uri not in uris_to_keep)
         LOGGER.info(u'Found %s harvesting URIs in the triplestore belonging to organization %s ' \
                     u'and harvest source id %s that are no longer provided.',
                     len(uris_to_be_deleted), owner_org, harvest_job.source.id)
 
         # delete deprecated datasets from triplestore
-        for dataset_uri in uris_to_be_deleted:
-            LOGGER.debug(u'Delete <%s> from all triplestore datastores.', dataset_uri)
+        if uris_to_be_deleted and self.triplestore_client.is_available():
+            LOGGER.debug(u'Delete %s from all triplestore datastores.', uris_to_be_deleted)
             try:
-                self._delete_dataset_in_triplestore_by_uri(dataset_uri)
-            except SPARQLWrapperException as ex:
-                LOGGER.warning(u'Error while deleting dataset with URI %s from triplestore: %s',
-                               dataset_uri, ex)
+                self.triplestore_client.delete_datasets(sorted(uris_to_be_deleted))
+            except (SPARQLWrapperException, ServiceUnavailableError, requests.exceptions.RequestException) \
+                    as ex:
+                LOGGER.warning(u'Error while deleting %s datasets from triplestore: %s',
+                               len(uris_to_be_deleted), ex)
 
-    def _get_existing_dataset_uris_from_triplestore(self, owner_org_or_source_id):
+    def _iter_existing_dataset_uris_from_triplestore(self, owner_org_or_source_id):
         '''
-        Requests all URIs from the harvest_info datastore and returns them as a list.
+        Yields the URIs from the harvest_info datastore page by page. If an error occurs, the iteration
+        stops after the URIs received so far.
         '''
-        existing_uris = []
+        count = 0
         try:
-            query = GET_URIS_FROM_HARVEST_INFO_QUERY % {'owner_org_or_source_id': owner_org_or_source_id}
-            raw_response = self.triplestore_client.select_datasets_in_triplestore_harvest_info(query)
-            if raw_response:
-                response = raw_response.convert()
-                for res in response["results"]["bindings"]:
-                    if "s" in res:
-                        existing_uris.append(res["s"]["value"])
-            else:
-                LOGGER.info(u'Get no dataset IDs from harvest info: %s', owner_org_or_source_id)
-        except SPARQLWrapperException as exception:
+            for uri in self.triplestore_client.iter_dataset_uris_in_triplestore_harvest_info(
+                    owner_org_or_source_id):
+                count += 1
+                yield uri
+        except Exception as exception:
             LOGGER.error(u'Unexpected error while querying harvest info from triplestore: %s', exception)
-        return existing_uris
+        if count == 0:
+            LOGGER.info(u'Get no dataset IDs from harvest info: %s', owner_org_or_source_id)
 
     def _add_contributor_id_from_harvest_source_config(self, harvest_job, uri, graph):
         """
         Adds the contributor id from the harvester config if the contributor id is missing in the graph.
         """
-        contributor_id = self._get_contributor_from_config(harvest_job.source.config)
+        contributor_id = self._get_contributor_from_config(harvest_job.source)
         if contributor_id:
             contributor_triple = URIRef(uri), URIRef(DCATDE.contributorID), URIRef(contributor_id)
             if contributor_triple not in graph:
@@ -551,15 +759,303 @@ class DCATdeRDFHarvester(DCATRDFHarvester):
             LOGGER.debug(u'%s: ContributorID is missing in harvester config!', harvest_job.source.id)
         return contributor_id
 
-    def _save_harvest_info(self, harvest_job, owner_org, uri):
+    def _get_harvest_info_graph(self, harvest_source_id, owner_org, uri, content_hash=None):
         """
-        Saves the info about the harvested and in the triple store stored datasets in the 'harvest_info'
+        Builds the info about the harvested and in the triple store stored dataset for the 'harvest_info'
         graph.
         """
         harvest_graph = Graph()
         harvest_graph.bind("foaf", FOAF)
         if owner_org:
             harvest_graph.add((URIRef(uri), FOAF.knows, Literal(owner_org)))
-        harvest_graph.add((URIRef(uri), FOAF.knows, Literal(harvest_job.source.id)))
-        rdf_harvest_graph = harvest_graph.serialize(format="xml")
-        self.triplestore_client.create_dataset_in_triplestore_harvest_info(rdf_harvest_graph, uri)
+        harvest_graph.add((URIRef(uri), FOAF.knows, Literal(harvest_source_id)))
+        if content_hash:
+            harvest_graph.add((URIRef(uri), GOVDATA_HARVEST_INFO.contentHash, Literal(content_hash)))
+        return harvest_graph
+
+    def _get_existing_content_hashes(self, harvest_job):
+        """
+        Requests the content hashes of the datasets stored in the triple store for the harvest source of the
+        job and returns them as dict (URI -> hash). The result is cached for the job, because it's needed
+        for every page of the harvested catalog.
+        """
+        if not self.skip_unchanged_datasets:
+            return {}
+        job_id, content_hashes = self._content_hashes_cache
+        if job_id == harvest_job.id:
+            return content_hashes
+        query_template = GET_CONTENT_HASHES_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY \
+            if self.triplestore_client.named_graphs else GET_CONTENT_HASHES_FROM_HARVEST_INFO_QUERY
+        content_hashes = self._select_content_hashes(
+            query_template % {'owner_org_or_source_id': harvest_job.source.id})
+        self._content_hashes_cache = (harvest_job.id, content_hashes)
+        return content_hashes
+
+    def _skip_unchanged_queued_datasets(self, harvest_source_id, datasets):
+        """
+        Returns the given queued datasets without the unchanged ones, whose content hash matches the hash
+        stored in the harvest info. Only the hashes of the given datasets are requested from the triple store.
+        """
+        uris = [dataset.uri for dataset in datasets if dataset.content_hash]
+        if not self.skip_unchanged_datasets or not uris:
+            return datasets
+        query_template = GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_QUERY
+        if self.triplestore_client.named_graphs:
+            query_template = GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY
+        existing_hashes = self._select_content_hashes(query_template % {
+            'owner_org_or_source_id': harvest_source_id,
+            'uris': u' '.join(u'<{0}>'.format(uri) for uri in uris)})
+        changed_datasets = [dataset for dataset in datasets if not dataset.content_hash
+                            or existing_hashes.get(str(dataset.uri)) != dataset.content_hash]
+        if len(changed_datasets) < len(datasets):
+            LOGGER.info(u'Skipped updating %s unchanged datasets of harvest source %s in the triplestore.',
+                        len(datasets) - len(changed_datasets), harvest_source_id)
+        return changed_datasets
+
+    def _select_content_hashes(self, query):
+        """ Executes the query on the harvest info and returns the content hashes as dict (URI -> hash) """
+        content_hashes = {}
+        try:
+            raw_response = self.triplestore_client.select_datasets_in_triplestore_harvest_info(query)
+            if raw_response:
+                for res in raw_response.convert()["results"]["bindings"]:
+                    if "s" in res and "hash" in res:
+                        content_hashes[res["s"]["value"]] = res["hash"]["value"]
+        except Exception as exception:
+            LOGGER.error(u'Unexpected error while querying content hashes from triplestore: %s', exception)
+        return content_hashes
+
+    def _prepare_dataset_for_triplestore(self, subgraph_extractor, harvest_job, owner_org, uri,
+                                         error_messages):
+        """
+        Extracts the graph of the dataset with the given URI from the parsed graph. Returns a
+        TriplestoreDataset without a graph if the dataset should only be deleted in the triple store.
+        """
+        try:
+            graph = subgraph_extractor.get_subgraph(uri)
+
+            if len(graph) > 0:
+                # Skip the dataset if it does't contain a distribution when it's required
+                if self._skip_dataset_in_triplestore(harvest_job.source, uri, graph):
+                    return TriplestoreDataset(uri, None, None, None, None)
+
+                # Add contributor id from harvester config
+                contributor_id = self._add_contributor_id_from_harvest_source_config(harvest_job, uri, graph)
+
+                rdf_graph = serialize_graph(graph, self.wire_format)
+                content_hash = None
+                # the canonicalization of the graph is expensive, the hash is only needed for skipping
+                # unchanged datasets and for the validation cache
+                if self.skip_unchanged_datasets or self.shacl_validator_client.cache is not None:
+                    content_hash = get_content_hash(graph, owner_org, contributor_id,
+                                                    self.shacl_validator_client.validator_profile)
+                return TriplestoreDataset(uri, graph, rdf_graph, contributor_id, content_hash)
+
+            LOGGER.warning(u'Could not find triples to URI %s. Updating is not possible.', uri)
+        except Exception as exception:
+            LOGGER.warning(u'Unexpected error or error while graph serialization: %s. Skipping ' \
+                           u'dataset with URI %s.', exception, uri)
+            error_messages.append(u'Unexpected error or error while graph serialization: %s' % exception)
+        return TriplestoreDataset(uri, None, None, None, None)
+
+    def _sync_datasets_with_triplestore(self, datasets, harvest_job, owner_org, harvest_info, error_messages):
+        """
+        Updates the given datasets in the triple store or adds them to the triplestore queue, depending on
+        the configured sync mode. The harvest info of the updated datasets is collected in the given dict.
+        """
+        if not datasets:
+            return
+        if self.sync_mode != SYNC_MODE_QUEUE:
+            self._update_datasets_in_triplestore(datasets, harvest_job.source.id, owner_org, harvest_info,
+                                                 error_messages)
+            return
+        try:
+            self.triplestore_queue.enqueue([{
+                'uri': str(dataset.uri),
+                'rdf_graph': dataset.rdf_graph if dataset.graph is not None else None,
+                'owner_org': owner_org,
+                'contributor_id': dataset.contributor_id,
+                'harvest_source_id': harvest_job.source.id,
+                'content_hash': dataset.content_hash
+            } for dataset in datasets])
+        except Exception as exception:
+            LOGGER.error(u'Unexpected error while adding datasets with URIs %s to the triplestore queue: %s',
+                         [str(dataset.uri) for dataset in datasets], exception)
+            error_messages.append(u'Error while adding datasets to the triplestore queue: %s' % exception)
+
+    def update_queued_datasets_in_triplestore(self, rows):
+        """
+        Updates the datasets of the given triplestore queue rows in the triple store. Unchanged datasets are
+        skipped, if activated. Returns the URIs of the datasets which could not be updated because of an
+        error of the triple store, so they can be processed again later, and the error messages.
+        """
+        error_messages = []
+        failed_uris = set()
+        harvest_info = OrderedDict()
+        groups = OrderedDict()
+        for row in rows:
+            datasets = groups.setdefault((row.harvest_source_id, row.owner_org), [])
+            graph = None
+            if row.rdf_graph is not None:
+                graph = Graph()
+                # N-Triples is a subset of Turtle, so both wire formats can be parsed as Turtle
+                graph.parse(data=row.rdf_graph, format='turtle')
+            datasets.append(TriplestoreDataset(URIRef(row.uri), graph, row.rdf_graph, row.contributor_id,
+                                               row.content_hash))
+        for (harvest_source_id, owner_org), datasets in groups.items():
+            datasets = self._skip_unchanged_queued_datasets(harvest_source_id, datasets)
+            self._update_datasets_in_triplestore(datasets, harvest_source_id, owner_org, harvest_info,
+                                                 error_messages, failed_uris)
+        self._flush_harvest_info(harvest_info, error_messages, failed_uris=failed_uris)
+        return failed_uris, error_messages
+
+    def _update_datasets_in_triplestore(self, datasets, harvest_source_id, owner_org, harvest_info,
+                                        error_messages, failed_uris=None):
+        """
+        Replaces the given datasets in the triple store and validates them. If the triple store rejects the
+        combined request, the datasets are updated one by one, so that a single broken dataset does not
+        prevent updating the others. The harvest info of the datasets is added to the given dict (URI ->
+        graph) and written later with _flush_harvest_info(). It contains the content hash only if the
+        dataset was validated successfully, so an incompletely updated dataset is not skipped in the next
+        harvest run. The URIs of the datasets which could not be updated because of an error of the triple
+        store are added to the given set failed_uris.
+        """
+        if not datasets:
+            return
+        try:
+            self.triplestore_client.upsert_datasets_in_triplestore(
+                [(dataset.uri, dataset.graph) for dataset in datasets])
+            self.triplestore_client.delete_datasets_in_triplestore_mqa([dataset.uri for dataset in datasets])
+
+            validated_uris = self._validate_datasets(datasets, owner_org, error_messages)
+            for dataset in datasets:
+                harvest_info_graph = None
+                if dataset.graph is not None:
+                    content_hash = dataset.content_hash if dataset.uri in validated_uris else None
+                    harvest_info_graph = self._get_harvest_info_graph(harvest_source_id, owner_org,
+                                                                      dataset.uri, content_hash)
+                harvest_info[dataset.uri] = harvest_info_graph
+        except Exception as exception:
+            # A malformed request is most likely caused by a single dataset, e.g. by an invalid URI.
+            # Retry the datasets one by one to isolate it.
+            if len(datasets) > 1 and (isinstance(exception, QueryBadFormed) or not isinstance(
+                    exception, (SPARQLWrapperException, ServiceUnavailableError))):
+                LOGGER.info(u'Error while updating %s datasets in TripleStore: %s. Updating the ' \
+                            u'datasets one by one.', len(datasets), exception)
+                for dataset in datasets:
+                    self._update_datasets_in_triplestore([dataset], harvest_source_id, owner_org,
+                                                         harvest_info, error_messages, failed_uris)
+            elif isinstance(exception, (SPARQLWrapperException, ServiceUnavailableError)):
+                LOGGER.error(u'Unexpected error while updating datasets with URIs %s in TripleStore: %s',
+                             [str(dataset.uri) for dataset in datasets], exception)
+                error_messages.append(u'Error while updating datasets in TripleStore: %s' % exception)
+                if failed_uris is not None:
+                    failed_uris.update(str(dataset.uri) for dataset in datasets)
+            else:
+                LOGGER.warning(u'Unexpected error while updating datasets in TripleStore: %s. Skipping ' \
+                               u'datasets with URIs %s.', exception,
+                               [str(dataset.uri) for dataset in datasets])
+                error_messages.append(u'Unexpected error while updating datasets in TripleStore: %s' \
+                                      % exception)
+
+    def _flush_harvest_info(self, harvest_info, error_messages, full_chunks_only=False, failed_uris=None):
+        """
+        Writes the collected harvest info to the triple store in chunks of the configured size. Each chunk
+        is replaced with one single update request. The written entries are removed from the given dict. If
+        full_chunks_only is True, a remainder smaller than the chunk size is kept for the next call. The URIs
+        of a chunk which could not be written are added to the given set failed_uris.
+        """
+        while harvest_info and (not full_chunks_only or len(harvest_info) >= self.harvest_info_chunk_size):
+            chunk = []
+            while harvest_info and len(chunk) < self.harvest_info_chunk_size:
+                chunk.append(harvest_info.popitem(last=False))
+            try:
+                self.triplestore_client.upsert_datasets_in_triplestore_harvest_info(chunk)
+            except Exception as exception:
+                LOGGER.error(u'Unexpected error while updating the harvest info of datasets with URIs %s ' \
+                             u'in TripleStore: %s', [str(uri) for uri, _ in chunk], exception)
+                error_messages.append(u'Error while updating harvest info in TripleStore: %s' % exception)
+                if failed_uris is not None:
+                    failed_uris.update(str(uri) for uri, _ in chunk)
+
+    def _validate_datasets(self, datasets, owner_org, error_messages):
+        """
+        Validates the given datasets with the SHACL validator and saves the validation reports in the triple
+        store. If more than one validation worker is configured, the validation requests are sent
+        concurrently. The number of pending requests is bounded, and the reports are saved as soon as they
+        arrive. Returns the URIs of the datasets which were validated successfully or don't need to be
+        validated.
+        """
+        validated_uris = set()
+        datasets_to_validate = []
+        for dataset in datasets:
+            if dataset.graph is None:
+                continue
+            if owner_org or dataset.contributor_id:
+                datasets_to_validate.append(dataset)
+            else:
+                validated_uris.add(dataset.uri)
+
+        if self.validation_workers <= 1 or len(datasets_to_validate) <= 1:
+            for dataset in datasets_to_validate:
+                if self._validate_dataset(dataset, owner_org, error_messages):
+                    validated_uris.add(dataset.uri)
+            return validated_uris
+
+        executor = self._get_validation_executor()
+        max_pending = self.validation_workers * VALIDATION_QUEUE_SIZE_PER_WORKER
+        pending = {}
+        for dataset in datasets_to_validate:
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                self._collect_validation_results(done, pending, owner_org, validated_uris, error_messages)
+            future = executor.submit(self.shacl_validator_client.validate, dataset.rdf_graph, dataset.uri,
+                                     owner_org, dataset.contributor_id, self.wire_format.content_type,
+                                     content_hash=dataset.content_hash)
+            pending[future] = dataset
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            self._collect_validation_results(done, pending, owner_org, validated_uris, error_messages)
+        return validated_uris
+
+    def _collect_validation_results(self, futures, pending, owner_org, validated_uris, error_messages):
+        """ Saves the validation reports of the given finished validation requests """
+        for future in futures:
+            dataset = pending.pop(future)
+            if self._validate_dataset(dataset, owner_org, error_messages, future):
+                validated_uris.add(dataset.uri)
+
+    def _get_validation_executor(self):
+        """
+        Returns the thread pool for the validation requests. It's created on first use and kept until
+        shutdown_validation_executor() is called.
+        """
+        if self._validation_executor is None:
+            self._validation_executor = ThreadPoolExecutor(max_workers=self.validation_workers,
+                                                           thread_name_prefix='shacl-validation')
+        return self._validation_executor
+
+    def shutdown_validation_executor(self):
+        """ Shuts down the thread pool for the validation requests, e.g. at the end of the gather stage """
+        executor, self._validation_executor = self._validation_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _validate_dataset(self, dataset, owner_org, error_messages, validation_future=None):
+        """
+        Validates the dataset with the SHACL validator, or saves the result of the given finished validation
+        request. Returns False if a validation report was expected, but could not be saved.
+        """
+        validation_expected = self.shacl_validator_client.is_enabled()
+        try:
+            if validation_future is None:
+                saved = self._validate_dataset_rdf_graph(dataset.uri, dataset.rdf_graph, owner_org,
+                                                         dataset.contributor_id, dataset.content_hash)
+            else:
+                saved = self._save_validation_report(validation_future.result(), dataset.uri)
+            return saved or not validation_expected
+        except Exception as exception:
+            LOGGER.warning(u'Unexpected error while validating dataset with URI %s: %s',
+                           dataset.uri, exception)
+            error_messages.append(u'Unexpected error while validating dataset: %s' % exception)
+        return False
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Parsed configuration of a harvest source
+"""
+import functools
+import json
+import logging
+from collections import namedtuple
+
+from ckan.plugins import toolkit as tk
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_PARAM_HARVESTED_PORTAL = 'harvested_portal'
+CONFIG_PARAM_RESOURCES_REQUIRED = 'resources_required'
+CONFIG_PARAM_CONTRIBUTOR_ID = 'contributorID'
+CONFIG_PARAM_PRIORITY = 'priority'
+CONFIG_PARAM_RDF_FORMAT = 'rdf_format'
+CONFIG_PARAM_DEFAULT_LICENSE = 'ckanext.dcatde.harvest.default_license'
+DEFAULT_LICENSE = 'http://dcat-ap.de/def/licenses/other-closed'
+DEFAULT_PRIORITY = 0
+# Number of parsed harvest source configurations kept in memory
+MAX_CACHED_CONFIGS = 256
+
+HarvestSourceConfig = namedtuple('HarvestSourceConfig', ['harvested_portal', 'resources_required',
+                                                         'contributor_id', 'priority', 'rdf_format',
+                                                         'fallback_license'])
+
+
+def parse_priority(value):
+    '''
+    Parse the value to int. Return Default value if not possible.
+    '''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        method_prefix = "parsePriority: "
+        LOGGER.warning(u'[%s] Parsing an invalid priority: " %s ". Use default priority.', method_prefix,
+                       value)
+        return DEFAULT_PRIORITY
+
+
+def parse_harvest_source_config(source_config, fallback_license=None):
+    '''
+    Parses the JSON configuration of a harvest source. The fallback license is read from the CKAN
+    configuration if not given.
+    '''
+    config = json.loads(source_config) if source_config else {}
+    if fallback_license is None:
+        fallback_license = tk.config.get(CONFIG_PARAM_DEFAULT_LICENSE, DEFAULT_LICENSE)
+    priority = DEFAULT_PRIORITY
+    if CONFIG_PARAM_PRIORITY in config:
+        priority = parse_priority(config[CONFIG_PARAM_PRIORITY])
+    return HarvestSourceConfig(
+        harvested_portal=config.get(CONFIG_PARAM_HARVESTED_PORTAL),
+        resources_required=bool(config.get(CONFIG_PARAM_RESOURCES_REQUIRED, False)),
+        contributor_id=config.get(CONFIG_PARAM_CONTRIBUTOR_ID),
+        priority=priority,
+        rdf_format=config.get(CONFIG_PARAM_RDF_FORMAT),
+        fallback_license=fallback_license)
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_CONFIGS)
+def _get_cached_harvest_source_config(source_id, source_config, fallback_license):
+    '''Parses the configuration once per harvest source and configuration value'''
+    LOGGER.debug(u'Parsing the configuration of harvest source %s.', source_id)
+    return parse_harvest_source_config(source_config, fallback_license)
+
+
+def get_harvest_source_config(source):
+    '''
+    Returns the parsed HarvestSourceConfig of the given harvest source. The result is cached by the source
+    ID and the configuration value, so a changed configuration is parsed again.
+    '''
+    return _get_cached_harvest_source_config(getattr(source, 'id', None), source.config,
+                                             tk.config.get(CONFIG_PARAM_DEFAULT_LICENSE, DEFAULT_LICENSE))
@@ -5,7 +5,7 @@ Various utilities for harvesters.
 
 For instance, they provide functions to rename datasets before they get deleted.
 """
-import json
+import datetime
 import logging
 import uuid
 
@@ -14,14 +14,18 @@ import pytz
 from ckan import model
 from ckan.model import Session, PACKAGE_NAME_MAX_LENGTH
 import ckan.plugins as p
+from sqlalchemy.exc import SQLAlchemyError
+from ckanext.dcatde import json_utils
 from ckanext.dcatde.extras import Extras
+from ckanext.dcatde.harvesters.harvest_source_config import DEFAULT_PRIORITY, get_harvest_source_config, \
+    parse_priority
+from ckanext.dcatde.harvesters.identifier_registry import get_identifier_registry, normalize_modified
 from ckanext.harvest.model import HarvestObject, HarvestSource
 
 LOGGER = logging.getLogger(__name__)
 
 # TODO: class methods from ckanext-govdatade. Refactor such that they only occur here
 
-DEFAULT_PRIORITY = 0
 NAME_RANDOM_STRING_LENGTH = 5
 NAME_DELETED_SUFFIX = "-deleted"
 NAME_MAX_LENGTH = PACKAGE_NAME_MAX_LENGTH - NAME_RANDOM_STRING_LENGTH - len(NAME_DELETED_SUFFIX)
@@ -56,24 +60,6 @@ class HarvestUtils(object):
         new_name = name[:NAME_MAX_LENGTH]
         return new_name + NAME_DELETED_SUFFIX + random_suffix
 
-    @staticmethod
-    def rename_datasets_before_delete(deprecated_package_dicts):
-        """
-        Renames the given packages to avoid name conflicts with
-        deleted packages.
-        """
-
-        package_update = p.toolkit.get_action('package_update')
-        for package_dict in deprecated_package_dicts:
-            context = HarvestUtils.build_context()
-            package_id = package_dict['id']
-            package_dict['name'] = HarvestUtils.create_new_name_for_deletion(package_dict.get('name', ''))
-            # Update package
-            try:
-                package_update(context, package_dict)
-            except Exception as exception:
-                LOGGER.error(u'Unable updating package %s: %s', package_id, exception)
-
     @staticmethod
     def delete_packages(package_ids):
         """
@@ -96,19 +82,30 @@ class HarvestUtils(object):
                 )
         return deleted_package_ids
 
+    @staticmethod
+    def rename_package_before_delete(package):
+        """
+        Renames the given package object to avoid name conflicts with deleted packages. The change is
+        committed with the deletion of the package, so no separate update and reindexing is needed.
+        """
+        package.name = HarvestUtils.create_new_name_for_deletion(package.name or '')
+        package.metadata_modified = datetime.datetime.utcnow()
+
     @staticmethod
     def rename_delete_dataset_with_id(package_id):
         """
-        Deletes the package with package_id. Before deletion, the package is renamed to avoid
-        conflicts when adding new packages. If the renaming isn't successful the dataset will be
-        deleted anyway.
+        Deletes the package with package_id. Before deletion, the package is renamed in the same
+        transaction to avoid conflicts when adding new packages. If the deletion isn't successful the
+        package keeps its name.
         """
-        context = HarvestUtils.build_context()
-        package_dict = p.toolkit.get_action('package_show')(context, {'id': package_id})
+        package = model.Package.get(package_id)
+        if package is None:
+            raise p.toolkit.ObjectNotFound(u'Package {0} not found'.format(package_id))
         # rename and delete the package
-        HarvestUtils.rename_datasets_before_delete([package_dict])
+        HarvestUtils.rename_package_before_delete(package)
         _mark_harvest_objects_as_not_current([package_id])
-        HarvestUtils.delete_packages([package_id])
+        if not HarvestUtils.delete_packages([package_id]):
+            model.Session.rollback()
 
     @staticmethod
     def compare_harvester_priorities(local_harvester_config, remote_harvester_config):
@@ -119,25 +116,26 @@ class HarvestUtils(object):
         local_priority = DEFAULT_PRIORITY
         remote_priority = DEFAULT_PRIORITY
         if "priority" in local_harvester_config:
-            local_priority = _parse_priority(local_harvester_config["priority"])
+            local_priority = parse_priority(local_harvester_config["priority"])
         if "priority" in remote_harvester_config:
-            remote_priority = _parse_priority(remote_harvester_config["priority"])
+            remote_priority = parse_priority(remote_harvester_config["priority"])
 
         if remote_priority > local_priority:
             return True
         return False # skip import
 
     @staticmethod
-    def handle_duplicates(harvest_object):
+    def handle_duplicates(harvest_object, remote_dataset=None):
         '''
         Checks if the dataset of a harvest_object already exists. If so then check which dataset to keep.
+        The content of the harvest object is parsed, if the parsed remote dataset isn't given.
         Returns True if the remote dataset should be imported, otherwise False.
         '''
-        harvest_object_content = harvest_object.content
         harvester_title = harvest_object.source.title
         method_prefix = 'handle_duplicates: '
 
-        remote_dataset = json.loads(harvest_object_content)
+        if remote_dataset is None:
+            remote_dataset = json_utils.loads(harvest_object.content)
         remote_dataset_extras = Extras(remote_dataset['extras'])
         remote_dataset_name = remote_dataset.get('name', '')
 
@@ -147,6 +145,13 @@ class HarvestUtils(object):
             # remote dataset contains identifier
             if orig_id:
                 try:
+                    registry = get_identifier_registry()
+                    # The registry is used only if it was filled with all harvested datasets, otherwise
+                    # the datasets harvested before its activation would not be found.
+                    if registry is not None and registry.is_populated():
+                        return HarvestUtils.handle_duplicates_with_registry(
+                            registry, harvest_object, orig_id, remote_dataset_name, remote_dataset_extras)
+
                     # Search for other datasets with the same identifier
                     query = model.Session.query(model.Package.id, model.Package.metadata_modified,
                                                 model.PackageExtra.value, HarvestObject.harvest_source_id) \
@@ -192,7 +197,7 @@ class HarvestUtils(object):
                     # The dataset already exists. Check if the remote dataset should be imported.
                     return HarvestUtils.handle_datasets_with_same_id(harvester_title, orig_id,
                             remote_dataset_name, remote_dataset_extras, local_search_result,
-                        harvest_object.source.config)
+                        harvest_object.source)
                 except Exception as exception:
                     LOGGER.error(exception)
             else:
@@ -205,9 +210,63 @@ class HarvestUtils(object):
             return True
         return False
 
+    @staticmethod
+    def handle_duplicates_with_registry(registry, harvest_object, orig_id, remote_dataset_name,
+                                        remote_dataset_extras):
+        '''
+        Checks with the identifier registry if the dataset of a harvest_object already exists. If so then
+        check which dataset to keep by the normalized modified dates stored in the registry and the current
+        priorities of the harvest sources. Delete the other dataset(s).
+        Returns True if the remote dataset should be imported, otherwise False.
+        '''
+        harvester_title = harvest_object.source.title
+        method_prefix = 'handle_duplicates_with_registry: '
+
+        exclude_guid = remote_dataset_extras.value('guid') if remote_dataset_extras.key('guid') else None
+        local_datasets = _filter_active_datasets(registry, registry.find_duplicates(orig_id, exclude_guid))
+        if not local_datasets:
+            # no other dataset with the same identifier was found, import accepted
+            LOGGER.debug(u'[%s] %sDid not find any existing dataset in the identifier registry with ' \
+                         u'Identifier %s. Import accepted for dataset %s.',
+                         harvester_title, method_prefix, orig_id, remote_dataset_name)
+            return True
+
+        LOGGER.debug(u'[%s] %sFound duplicate entries with Identifier %s for dataset %s.',
+                     harvester_title, method_prefix, orig_id, remote_dataset_name)
+        remote_modified = normalize_modified(remote_dataset_extras.value(EXTRAS_KEY_DCT_MODIFIED, ''))
+        remote_is_latest = remote_modified is not None
+        if remote_is_latest:
+            for local_dataset in local_datasets:
+                # the remote dataset must be newer or have a higher priority at the same timestamp
+                if remote_modified < local_dataset.modified or (
+                        remote_modified == local_dataset.modified and
+                        not _has_higher_priority(harvest_object.source, local_dataset.harvest_source_id)):
+                    remote_is_latest = False
+                    break
+
+        local_dataset_list = [{'id': local_dataset.package_id} for local_dataset in local_datasets]
+        if remote_is_latest:
+            # Import accepted. Delete all local datasets with the same identifier.
+            LOGGER.debug(u'[%s] %sRemote dataset with Identifier %s is the latest. Import accepted for ' \
+                         u'dataset %s.', harvester_title, method_prefix, orig_id, remote_dataset_name)
+            packages_deleted = _delete_packages_keep(local_dataset_list)
+        else:
+            # Skip import. Delete local datasets, but keep the dataset with latest date in the field
+            # "modified".
+            latest_local_dataset = max(local_datasets, key=lambda local_dataset: local_dataset.modified)
+            LOGGER.info(u'[%s] %sRemote dataset with Identifier %s is NOT the latest. Keep local dataset ' \
+                        u'%s with latest date in field "modified". Skipping import for dataset %s!',
+                        harvester_title, method_prefix, orig_id, latest_local_dataset.package_id,
+                        remote_dataset_name)
+            packages_deleted = _delete_packages_keep(local_dataset_list,
+                                                     {'id': latest_local_dataset.package_id})
+        LOGGER.debug(u'[%s] %sDeleted packages: %s', harvester_title, method_prefix,
+                     ','.join(packages_deleted))
+        return remote_is_latest
+
     @staticmethod
     def compare_duplicates(remote_is_latest, harvester_title, local_search_result, latest_local_dataset,
-                            remote_dataset_extras, harvest_source_config):
+                            remote_dataset_extras, harvest_source):
         '''
         Compares local dataset(s) and the remote dataset to see which one should be kept.
         Checks for modified dates and if they are the same checks for priority.
@@ -247,9 +306,8 @@ class HarvestUtils(object):
                         # continue if for some reason harvester-source is not available
                         if harvest_source_object:
                             priority_checked = True
-                            remote_is_latest = HarvestUtils.compare_harvester_priorities(
-                                json.loads(harvest_source_object.config),
-                                json.loads(harvest_source_config))
+                            remote_is_latest = get_harvest_source_config(harvest_source).priority > \
+                                get_harvest_source_config(harvest_source_object).priority
                     if not remote_is_latest:
                         # remote dataset should not be imported
                         break
@@ -257,7 +315,7 @@ class HarvestUtils(object):
 
     @staticmethod
     def handle_datasets_with_same_id(harvester_title, orig_id, remote_dataset_name,
-                                    remote_dataset_extras, local_search_result, harvest_source_config):
+                                    remote_dataset_extras, local_search_result, harvest_source):
         '''
         Checks if the remote or the local dataset should be kept. Delete the other dataset(s).
         Returns True if remote is the latest one and should be imported, otherwise False.
@@ -274,7 +332,7 @@ class HarvestUtils(object):
 
             remote_is_latest, local_dataset_has_modified, priority_checked = HarvestUtils.compare_duplicates(
                 remote_is_latest, harvester_title, local_search_result, latest_local_dataset,
-                remote_dataset_extras, harvest_source_config)
+                remote_dataset_extras, harvest_source)
 
             if remote_is_latest:
                 # Import accepted. Delete all local datasets with the same identifier.
@@ -332,6 +390,35 @@ def _get_harvester_config_from_db(harvester_source_id):
     return model.Session.query(HarvestSource).filter(HarvestSource.id == harvester_source_id).first()
 
 
+def _has_higher_priority(harvest_source, local_harvest_source_id):
+    '''
+    Returns True if the given harvest source has a higher priority than the harvest source with the given ID.
+    Like in compare_duplicates(), the priority isn't compared if the other harvest source doesn't exist.
+    '''
+    local_harvest_source = _get_harvester_config_from_db(local_harvest_source_id)
+    if local_harvest_source is None:
+        return True
+    return get_harvest_source_config(harvest_source).priority > \
+        get_harvest_source_config(local_harvest_source).priority
+
+
+def _filter_active_datasets(registry, local_datasets):
+    '''
+    Returns the datasets of the identifier registry, which are still active. Datasets deleted in another way
+    are removed from the registry.
+    '''
+    if not local_datasets:
+        return local_datasets
+    package_ids = [local_dataset.package_id for local_dataset in local_datasets]
+    active_ids = {package_id for package_id, in model.Session.query(model.Package.id)
+                  .filter(model.Package.id.in_(package_ids))
+                  .filter(model.Package.state == 'active')}
+    inactive_ids = [package_id for package_id in package_ids if package_id not in active_ids]
+    if inactive_ids:
+        registry.unregister(inactive_ids)
+    return [local_dataset for local_dataset in local_datasets if local_dataset.package_id in active_ids]
+
+
 def _mark_harvest_objects_as_not_current(package_ids_to_delete):
     '''
     Marks harvest objects with the given package ids as not current.
@@ -384,15 +471,3 @@ def _parse_date(date_string):
     if date_obj.tzinfo is None:
         date_obj = date_obj.replace(tzinfo=pytz.UTC)
     return date_obj
-
-
-def _parse_priority(value):
-    '''
-    Parse the value to int. Return Default value if not possible.
-    '''
-    try:
-        return int(value)
-    except ValueError:
-        method_prefix = "parsePriority: "
-        LOGGER.warning(u'[%s] Parsing an invalid priority: " %s ". Use default priority.', method_prefix, value)
-        return DEFAULT_PRIORITY
@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Registry of the identifiers of the harvested datasets used to detect duplicates
+"""
+import datetime
+import logging
+
+from dateutil.parser import parse as parse_date
+import pytz
+from ckan import model
+from ckan.plugins import toolkit as tk
+from sqlalchemy import Column, Index, MetaData, Table, select, types
+from sqlalchemy.exc import SQLAlchemyError
+from ckanext.dcatde.extras import Extras
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_PARAM_IDENTIFIER_REGISTRY = 'ckanext.dcatde.harvest.identifier_registry'
+REGISTRY_TABLE_NAME = 'dcatde_identifier_registry'
+REGISTRY_STATE_TABLE_NAME = 'dcatde_identifier_registry_state'
+# Key of the state entry which marks the registry as filled with all harvested datasets
+STATE_KEY_POPULATED = 'populated'
+
+metadata = MetaData()
+
+registry_table = Table(
+    REGISTRY_TABLE_NAME, metadata,
+    Column('package_id', types.UnicodeText, primary_key=True),
+    # The value of the field dct:identifier
+    Column('identifier', types.UnicodeText, nullable=False),
+    Column('guid', types.UnicodeText),
+    # The value of the field dct:modified in UTC without time zone. None if it is missing or invalid.
+    Column('modified', types.DateTime),
+    # The priority of the harvest source is read from its current configuration when comparing duplicates
+    Column('harvest_source_id', types.UnicodeText),
+    Index('idx_%s_identifier' % REGISTRY_TABLE_NAME, 'identifier'),
+)
+
+registry_state_table = Table(
+    REGISTRY_STATE_TABLE_NAME, metadata,
+    Column('key', types.UnicodeText, primary_key=True),
+    Column('value', types.UnicodeText),
+)
+
+_registry = None
+
+
+def get_identifier_registry():
+    """ Returns the identifier registry, or None if it isn't activated """
+    global _registry  # pylint: disable=global-statement
+    if not tk.asbool(tk.config.get(CONFIG_PARAM_IDENTIFIER_REGISTRY, False)):
+        return None
+    if _registry is None:
+        _registry = IdentifierRegistry()
+    return _registry
+
+
+def normalize_modified(modified):
+    """
+    Parses the value of the field dct:modified and converts it to UTC without time zone. Dates without time
+    zone are interpreted as UTC. Returns None if the value is empty or can't be parsed.
+    """
+    if not modified:
+        return None
+    try:
+        modified_date = parse_date(modified)
+    except (ValueError, OverflowError) as ex:
+        LOGGER.debug(u'Ignoring invalid modified date "%s": %s', modified, ex)
+        return None
+    if modified_date.tzinfo is not None:
+        modified_date = modified_date.astimezone(pytz.UTC).replace(tzinfo=None)
+    return modified_date
+
+
+def register_dataset(dataset_dict):
+    """
+    Adds the dataset to the identifier registry, if the registry is activated. Called by the plugin for each
+    created or updated dataset, e.g. by any harvester or via the API. Only active harvested datasets are
+    registered like in the duplicate detection without registry. Errors are logged only, so they don't
+    break the update of the dataset.
+    """
+    registry = get_identifier_registry()
+    if registry is None:
+        return
+    package_id = dataset_dict['id']
+    try:
+        harvest_object = _get_harvest_object(package_id)
+        if harvest_object is None or dataset_dict.get('state', 'active') != 'active':
+            registry.unregister([package_id])
+            return
+        harvest_source_id, harvest_object_guid = harvest_object
+        extras = Extras(dataset_dict.get('extras', []))
+        registry.register(package_id, extras.value('identifier', ''),
+                          extras.value('guid', '') or harvest_object_guid, extras.value('modified', ''),
+                          harvest_source_id)
+    except SQLAlchemyError as ex:
+        LOGGER.error(u'Unable to add dataset %s to the identifier registry: %s', package_id, ex)
+
+
+def unregister_dataset(dataset_dict):
+    """ Removes the deleted dataset from the identifier registry, if the registry is activated """
+    registry = get_identifier_registry()
+    if registry is None:
+        return
+    # The dataset can be deleted by its name
+    package = model.Package.get(dataset_dict['id'])
+    package_id = package.id if package is not None else dataset_dict['id']
+    try:
+        registry.unregister([package_id])
+    except SQLAlchemyError as ex:
+        LOGGER.error(u'Unable to remove dataset %s from the identifier registry: %s', package_id, ex)
+
+
+def _get_harvest_object(package_id):
+    """
+    Returns a tuple (harvest source ID, GUID) of the harvest object of the given dataset, preferably of the
+    current one. Returns None if the dataset wasn't harvested.
+    """
+    # The harvest model requires the optional extension ckanext-harvest
+    # pylint: disable=import-outside-toplevel
+    from ckanext.harvest.model import HarvestObject
+    return model.Session.query(HarvestObject.harvest_source_id, HarvestObject.guid) \
+        .filter(HarvestObject.package_id == package_id) \
+        .order_by(HarvestObject.current.desc()).first()
+
+
+class IdentifierRegistry(object):
+    """
+    Stores the identifier, the GUID, the modified date and the harvest source of the harvested datasets in a
+    database table. The plugin keeps the table up to date whenever a dataset is created, updated or deleted,
+    so duplicates of a remote dataset are found with one indexed lookup. The registry is marked as populated
+    as soon as it was filled with all harvested datasets with replace_all().
+    """
+
+    def __init__(self, engine=None):
+        self._engine = engine
+        self._table_created = False
+        self._populated = False
+
+    @property
+    def engine(self):
+        """ The database engine. Defaults to the engine of the CKAN database. """
+        return self._engine if self._engine is not None else model.meta.engine
+
+    def setup(self):
+        """ Creates the registry tables if they don't exist yet """
+        if not self._table_created:
+            metadata.create_all(bind=self.engine, checkfirst=True)
+            self._table_created = True
+
+    def is_populated(self):
+        """
+        Returns True if the registry was filled with all harvested datasets. Until then, the registry must not
+        be used to find duplicates, because it doesn't contain the datasets harvested before.
+        """
+        if not self._populated:
+            self.setup()
+            with self.engine.connect() as connection:
+                self._populated = connection.execute(
+                    select(registry_state_table.c.value)
+                    .where(registry_state_table.c.key == STATE_KEY_POPULATED)).first() is not None
+        return self._populated
+
+    def register(self, package_id, identifier, guid, modified, harvest_source_id):
+        """
+        Registers the dataset with the given values. The modified date is normalized with
+        normalize_modified(). If the dataset has no identifier, it is removed from the registry.
+        """
+        self.setup()
+        with self.engine.begin() as connection:
+            connection.execute(registry_table.delete().where(registry_table.c.package_id == package_id))
+            if identifier:
+                connection.execute(registry_table.insert(), {
+                    'package_id': package_id, 'identifier': identifier, 'guid': guid,
+                    'modified': normalize_modified(modified), 'harvest_source_id': harvest_source_id})
+
+    def unregister(self, package_ids):
+        """ Removes the datasets with the given package IDs from the registry """
+        package_ids = list(package_ids)
+        if not package_ids:
+            return
+        self.setup()
+        with self.engine.begin() as connection:
+            connection.execute(registry_table.delete().where(registry_table.c.package_id.in_(package_ids)))
+
+    def replace_all(self, rows):
+        """
+        Replaces the content of the registry with the given rows within one transaction and marks the
+        registry as populated. Each row is a dict with the keys of register(). Returns the number of
+        registered datasets.
+        """
+        self.setup()
+        entries = [dict(row, modified=normalize_modified(row['modified']))
+                   for row in rows if row['identifier']]
+        with self.engine.begin() as connection:
+            connection.execute(registry_table.delete())
+            if entries:
+                connection.execute(registry_table.insert(), entries)
+            connection.execute(registry_state_table.delete()
+                               .where(registry_state_table.c.key == STATE_KEY_POPULATED))
+            connection.execute(registry_state_table.insert(), {
+                'key': STATE_KEY_POPULATED, 'value': datetime.datetime.utcnow().isoformat()})
+        self._populated = True
+        return len(entries)
+
+    def find_duplicates(self, identifier, exclude_guid=None):
+        """
+        Returns the registered datasets with the given identifier and a modified date. If exclude_guid is
+        given, only datasets with another GUID are returned.
+        """
+        self.setup()
+        query = select(registry_table).where(registry_table.c.identifier == identifier) \
+            .where(registry_table.c.modified.isnot(None))
+        if exclude_guid is not None:
+            query = query.where(registry_table.c.guid != exclude_guid)
+        with self.engine.connect() as connection:
+            return connection.execute(query.order_by(registry_table.c.package_id)).fetchall()
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Statistics of the licenses added or changed by the harvester, summarized per harvest job
+"""
+import logging
+from collections import Counter, OrderedDict
+
+from ckan import model
+from ckan.plugins import toolkit as tk
+from ckanext.dcatde import json_utils
+from ckanext.harvest.model import HarvestJob, HarvestObject, HarvestObjectExtra
+
+LOGGER = logging.getLogger(__name__)
+
+# The resource had no license, the default license was added
+LICENSE_MISSING = 'missing'
+# The license of the resource is deprecated or unknown and was kept
+LICENSE_UNKNOWN = 'unknown'
+# The license of the resource was upgraded to the recent DCAT list
+LICENSE_UPGRADED = 'upgraded'
+
+LICENSE_EVENT_DESCRIPTIONS = OrderedDict([
+    (LICENSE_MISSING, u'resources without license (default license added)'),
+    (LICENSE_UNKNOWN, u'resources with a deprecated or unknown license (kept)'),
+    (LICENSE_UPGRADED, u'resources with an upgraded license'),
+])
+# Number of examples per event stored per harvest object and logged in the summary of a harvest job
+MAX_SAMPLES_PER_EVENT = 3
+# Key of the harvest object extra storing the license statistics of the dataset
+HARVEST_OBJECT_EXTRA_KEY = 'dcatde_license_statistics'
+
+
+class LicenseStatistics(object):
+    """
+    Counts the licenses added or changed while importing datasets and keeps some examples for the summary.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES_PER_EVENT):
+        self.max_samples = max_samples
+        self.counts = Counter()
+        self.samples = {}
+
+    def add(self, event, guid, resource_uri, license_id, new_license=None):
+        """ Counts the license event of a resource of the dataset with the given GUID """
+        self.counts[event] += 1
+        self._add_sample(event, (guid, resource_uri, license_id, new_license))
+
+    def add_statistics(self, guid, statistics):
+        """ Adds the counts and examples of the dataset with the given GUID returned by to_dict() """
+        for event, count in statistics.get('counts', {}).items():
+            self.counts[event] += count
+            for resource_uri, license_id, new_license in statistics.get('samples', {}).get(event, []):
+                self._add_sample(event, (guid, resource_uri, license_id, new_license))
+
+    def _add_sample(self, event, sample):
+        """ Keeps the example if the maximum number of examples of the event isn't reached """
+        samples = self.samples.setdefault(event, [])
+        if len(samples) < self.max_samples:
+            samples.append(sample)
+
+    def to_dict(self):
+        """ Returns the counts and the examples without GUID as dict """
+        return {'counts': dict(self.counts),
+                'samples': {event: [sample[1:] for sample in samples]
+                            for event, samples in self.samples.items()}}
+
+    def log_summary(self, source_title, job_id):
+        """ Logs the summary of the given harvest job if a license event was counted """
+        counts = []
+        examples = []
+        for event, description in LICENSE_EVENT_DESCRIPTIONS.items():
+            if not self.counts[event]:
+                continue
+            counts.append(u'{0} {1}'.format(self.counts[event], description))
+            for guid, resource_uri, license_id, new_license in self.samples.get(event, []):
+                license_info = license_id if new_license is None else u'{0} -> {1}'.format(license_id,
+                                                                                          new_license)
+                examples.append(u'{0}: resource {1} of GUID {2} ({3})'.format(event, resource_uri, guid,
+                                                                              license_info))
+        if counts:
+            LOGGER.info(u'%s: License statistics of harvest job %s: %s. Examples: %s', source_title, job_id,
+                        u', '.join(counts), u'; '.join(examples))
+
+
+def save_license_statistics(harvest_object, statistics):
+    """
+    Stores the counts and examples of the license events of the dataset of the given harvest object as
+    harvest object extra, so they can be summarized per harvest job independently of the process importing
+    the dataset. The extra is saved together with the harvest object.
+    """
+    if statistics.counts:
+        harvest_object.extras.append(HarvestObjectExtra(key=HARVEST_OBJECT_EXTRA_KEY,
+                                                        value=json_utils.dumps(statistics.to_dict())))
+
+
+def log_license_statistics(harvest_job):
+    """ Logs the summary of the license statistics stored for the datasets of the given harvest job """
+    statistics = LicenseStatistics()
+    statistics_per_object = model.Session.query(HarvestObject.guid, HarvestObjectExtra.value) \
+        .join(HarvestObjectExtra, HarvestObjectExtra.harvest_object_id == HarvestObject.id) \
+        .filter(HarvestObject.harvest_job_id == harvest_job.id) \
+        .filter(HarvestObjectExtra.key == HARVEST_OBJECT_EXTRA_KEY)
+    for guid, value in statistics_per_object:
+        statistics.add_statistics(guid, json_utils.loads(value))
+    statistics.log_summary(harvest_job.source.title, harvest_job.id)
+
+
+@tk.chained_action
+def harvest_jobs_run(original_action, context, data_dict):
+    """
+    Logs the license statistics of the harvest jobs, which are marked as finished by the action
+    harvest_jobs_run of ckanext-harvest.
+    """
+    source_id = data_dict.get('source_id')
+    running_jobs = model.Session.query(HarvestJob.id).filter(HarvestJob.status == u'Running')
+    if source_id:
+        running_jobs = running_jobs.filter(HarvestJob.source_id == source_id)
+    running_job_ids = [job_id for job_id, in running_jobs]
+
+    result = original_action(context, data_dict)
+
+    if running_job_ids:
+        try:
+            finished_jobs = model.Session.query(HarvestJob) \
+                .filter(HarvestJob.id.in_(running_job_ids)) \
+                .filter(HarvestJob.status == u'Finished')
+            for harvest_job in finished_jobs:
+                log_license_statistics(harvest_job)
+        except Exception as ex:
+            LOGGER.warning(u'Could not log the license statistics of the finished harvest jobs: %s', ex)
+    return result
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Pooled HTTP session shared by the clients of the triplestore and the SHACL validator
+"""
+import gzip
+import threading
+
+from ckan.plugins import toolkit as tk
+import requests
+from requests.adapters import HTTPAdapter
+
+CONFIG_PARAM_POOL_SIZE = 'ckanext.dcatde.http.pool_size'
+CONFIG_PARAM_CONNECT_TIMEOUT = 'ckanext.dcatde.http.connect_timeout'
+CONFIG_PARAM_READ_TIMEOUT = 'ckanext.dcatde.http.read_timeout'
+CONFIG_PARAM_GZIP_REQUESTS = 'ckanext.dcatde.http.gzip_requests'
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 10
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the HTTP session of the process. The connections are kept alive and reused for all requests
+    to the same host. The session is created on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = max(tk.asint(tk.config.get(CONFIG_PARAM_POOL_SIZE, DEFAULT_POOL_SIZE)), 1)
+                # retries are handled by the ServiceHealthMonitor
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_timeout(read_timeout=None):
+    """
+    Returns the tuple (connect timeout, read timeout) in seconds for the requests
+    :param read_timeout: overrides the configured read timeout, e.g. for long running requests
+    """
+    connect_timeout = float(tk.config.get(CONFIG_PARAM_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT))
+    if read_timeout is None:
+        read_timeout = float(tk.config.get(CONFIG_PARAM_READ_TIMEOUT, DEFAULT_READ_TIMEOUT))
+    return connect_timeout, read_timeout
+
+
+def prepare_body(data, headers):
+    """
+    Returns the tuple (body, headers) for a request. Strings are encoded as UTF-8, bytes are passed
+    unchanged. If activated, the body is compressed with gzip and the header Content-Encoding is added.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if isinstance(data, bytes) and tk.asbool(tk.config.get(CONFIG_PARAM_GZIP_REQUESTS, False)):
+        data = gzip.compress(data)
+        headers = dict(headers, **{'Content-Encoding': 'gzip'})
+    return data, headers
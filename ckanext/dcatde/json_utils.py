@@ -0,0 +1,34 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+JSON serialization of the harvested datasets. The faster package orjson is used if it is installed.
+"""
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+def loads(content):
+    """ Parses the given JSON string or bytes """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(obj):
+    """
+    Serializes the given object to a JSON string. Objects which are not supported by orjson, e.g. dicts
+    with keys which are no strings, are serialized with the json module.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError as ex:
+            LOGGER.debug(u'Serializing with the json module, because orjson failed: %s', ex)
+    return json.dumps(obj)
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Process-wide registry of the JSON mappings, e.g. the license, category and theme mappings
+"""
+import logging
+import os
+import threading
+import urllib.request
+from urllib.error import HTTPError
+from urllib.parse import urlparse
+
+from ckanext.dcatde import json_utils
+
+LOGGER = logging.getLogger(__name__)
+
+# Timeout in seconds of the requests loading a mapping
+REQUEST_TIMEOUT = 30
+
+
+class _MappingEntry(object):
+    """ A parsed mapping with the information to revalidate it and the indexed variants of the mapping """
+
+    def __init__(self, content, file_stat=None, etag=None, last_modified=None):
+        self.content = content
+        self.file_stat = file_stat
+        self.etag = etag
+        self.last_modified = last_modified
+        self.indexed = {}
+
+
+class MappingRegistry(object):
+    """
+    Caches the parsed JSON mappings by their URL. Before a cached mapping is returned, it is revalidated:
+    file URLs by the modification time and the size of the file, other URLs with a conditional request
+    using the ETag or the Last-Modified header of the previous response. The returned mappings are shared
+    and must not be changed.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, errorhint, indexer=None, logger=None):
+        """
+        Returns the mapping with the given URL. If an indexer function is given, the result of the indexer
+        for the parsed mapping is returned, which is cached as well. If the mapping can't be loaded, the
+        cached mapping or an empty dict is returned.
+        """
+        if logger is None:
+            logger = LOGGER
+        if not url:
+            logger.error(u'Could not load %s mapping, no URL given.', errorhint)
+            return {}
+        with self._lock:
+            try:
+                entry = self._revalidate(url, logger)
+            except Exception as ex:
+                entry = self._entries.get(url)
+                if entry is None:
+                    logger.error(u'Could not load %s mapping: %s', errorhint, ex)
+                    return {}
+                logger.warning(u'Could not revalidate %s mapping. Using the cached mapping: %s', errorhint,
+                               ex)
+            if indexer is None:
+                return entry.content
+            if indexer not in entry.indexed:
+                entry.indexed[indexer] = indexer(entry.content)
+            return entry.indexed[indexer]
+
+    def clear(self):
+        """ Removes all cached mappings """
+        with self._lock:
+            self._entries.clear()
+
+    def _revalidate(self, url, logger):
+        """ Returns the cached entry of the URL if it is still valid, otherwise the mapping is loaded """
+        cached = self._entries.get(url)
+        parsed_url = urlparse(url)
+        if parsed_url.scheme == 'file':
+            path = urllib.request.url2pathname(parsed_url.path)
+            stat_result = os.stat(path)
+            file_stat = (stat_result.st_mtime_ns, stat_result.st_size)
+            if cached is not None and cached.file_stat == file_stat:
+                return cached
+            logger.debug(u'Loading mapping from file %s', path)
+            with open(path, 'rb') as mapping_file:
+                entry = _MappingEntry(json_utils.loads(mapping_file.read()), file_stat=file_stat)
+        else:
+            request = urllib.request.Request(url)
+            if cached is not None:
+                if cached.etag:
+                    request.add_header('If-None-Match', cached.etag)
+                if cached.last_modified:
+                    request.add_header('If-Modified-Since', cached.last_modified)
+            try:
+                logger.debug(u'Loading mapping from %s', url)
+                with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                    entry = _MappingEntry(json_utils.loads(response.read()),
+                                          etag=response.headers.get('ETag'),
+                                          last_modified=response.headers.get('Last-Modified'))
+            except HTTPError as ex:
+                if ex.code == 304 and cached is not None:
+                    logger.debug(u'Mapping %s not modified.', url)
+                    return cached
+                raise
+        self._entries[url] = entry
+        return entry
+
+
+_registry = MappingRegistry()
+
+
+def get_mapping_registry():
+    """ Returns the mapping registry of the process """
+    return _registry
@@ -8,6 +8,17 @@ import ckanext.dcatde.dataset_utils as ds_utils
 from ckanext.dcatde.dataset_utils import EXTRA_KEY_HARVESTED_PORTAL
 
 
+def _index_license_mapping(file_content):
+    '''Returns a dict with the OGD license code (key) and the DCAT license URI (value)'''
+    result = {}
+
+    if 'list' in file_content:
+        for item in file_content['list']:
+            result[item['OGDLizenzcode']] = item['URI']
+
+    return result
+
+
 class MigrationFunctionExecutor(object):
     '''Use an instance of this class to easily apply all migration functions
     to a dataset.
@@ -22,14 +33,7 @@ class MigrationFunctionExecutor(object):
 
     def _get_license_mapping(self, license_mapping_url):
         '''Loads the license mapping from the given file URl'''
-        file_content = util.load_json_mapping(license_mapping_url, "license")
-        result = {}
-
-        if 'list' in file_content:
-            for item in file_content['list']:
-                result[item['OGDLizenzcode']] = item['URI']
-
-        return result
+        return util.load_json_mapping(license_mapping_url, "license", indexer=_index_license_mapping)
 
     def _get_category_mapping(self, category_mapping_url):
         '''Loads the category mapping from the given file URL'''
@@ -5,9 +5,9 @@ import json
 import logging
 import re
 
-import urllib
 import pycountry
 import ckanext.dcatde.dataset_utils as ds_utils
+from ckanext.dcatde.mapping_registry import get_mapping_registry
 
 
 def log_dataset_prefix(dataset):
@@ -28,16 +28,12 @@ def log_error(dataset, message):
     get_migrator_log().error(log_dataset_prefix(dataset) + message)
 
 
-def load_json_mapping(url, errorhint, logger=None):
-    '''Loads the Mapping from the given file URL'''
+def load_json_mapping(url, errorhint, logger=None, indexer=None):
+    '''Loads the Mapping from the given file URL. The mapping is cached in the mapping registry and
+    must not be changed. If an indexer function is given, its cached result for the mapping is returned.'''
     if logger is None:
         logger = get_migrator_log()
-    try:
-        logger.debug("Trying to open: " + url)
-        return json.loads(urllib.request.urlopen(url).read())
-    except Exception:
-        logger.error('Could not load ' + errorhint + ' mapping')
-        return {}
+    return get_mapping_registry().get(url, errorhint, indexer, logger)
 
 
 def rename_extras_field_migration(dataset, name_old, name_new, as_list, do_log=False):
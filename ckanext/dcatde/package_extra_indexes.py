@@ -0,0 +1,163 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Database indexes for the lookups of datasets by their extras, which are not indexed by CKAN core
+"""
+import logging
+from collections import namedtuple
+
+from ckan import model
+from sqlalchemy import Column, Index, MetaData, Table, inspect, select, text, types
+
+from ckanext.dcatde.dataset_utils import EXTRA_KEY_HARVESTED_PORTAL
+
+LOGGER = logging.getLogger(__name__)
+
+# The value used in the queries of the index check
+EXPLAIN_SAMPLE_VALUE = u'dcatde-index-check'
+
+metadata = MetaData()
+
+# The columns of the CKAN table package_extra used by the indexes
+package_extra_table = Table(
+    'package_extra', metadata,
+    Column('id', types.UnicodeText, primary_key=True),
+    Column('package_id', types.UnicodeText),
+    Column('key', types.UnicodeText),
+    Column('value', types.UnicodeText),
+    Column('state', types.UnicodeText),
+)
+
+
+def _partial_index(name, key, lookup_column, *columns, postgresql_using='btree'):
+    """
+    Returns an index over the given columns of the extras with the given key. The lookup column is the
+    column compared with a given value in the queries using the index.
+    """
+    where = package_extra_table.c.key == key
+    # The indexes are created concurrently, so the harvesters are not blocked while the table is indexed
+    return Index(name, lookup_column, *columns, postgresql_using=postgresql_using, postgresql_where=where,
+                 postgresql_concurrently=True, sqlite_where=where,
+                 info={'extra_key': key, 'lookup_column': lookup_column})
+
+
+PACKAGE_EXTRA_INDEXES = [
+    # Lookups of the datasets with a given value of the extra, e.g. in _mark_datasets_for_deletion() and
+    # HarvestUtils.handle_duplicates(). The values are unbounded text, which may exceed the maximum size of
+    # a btree index entry. Hash indexes store only the hash of the value and support the equality lookups.
+    _partial_index('idx_dcatde_package_extra_guid', 'guid', package_extra_table.c.value,
+                   postgresql_using='hash'),
+    _partial_index('idx_dcatde_package_extra_identifier', 'identifier', package_extra_table.c.value,
+                   postgresql_using='hash'),
+    _partial_index('idx_dcatde_package_extra_harvested_portal', EXTRA_KEY_HARVESTED_PORTAL,
+                   package_extra_table.c.value, postgresql_using='hash'),
+    # Lookup of the modified date of a given dataset
+    _partial_index('idx_dcatde_package_extra_modified', 'modified', package_extra_table.c.package_id,
+                   package_extra_table.c.state),
+]
+
+IndexStatus = namedtuple('IndexStatus', ['name', 'exists', 'valid', 'used'])
+
+
+def _get_check_query(index):
+    """ Returns a query, which is expected to be answered with the given index """
+    lookup_column = index.info['lookup_column']
+    result_column = package_extra_table.c.package_id \
+        if lookup_column is package_extra_table.c.value else package_extra_table.c.value
+    return select(result_column) \
+        .where(package_extra_table.c.key == index.info['extra_key']) \
+        .where(lookup_column == EXPLAIN_SAMPLE_VALUE) \
+        .where(package_extra_table.c.state == u'active')
+
+
+class PackageExtraIndexes(object):
+    """
+    Creates the partial indexes on the table package_extra for the extras which are used to look up
+    datasets, and checks if the query planner uses them.
+    """
+
+    def __init__(self, engine=None):
+        self._engine = engine
+
+    @property
+    def engine(self):
+        """ The database engine. Defaults to the engine of the CKAN database. """
+        return self._engine if self._engine is not None else model.meta.engine
+
+    def get_existing_index_names(self):
+        """ Returns the names of the existing indexes on the table package_extra """
+        return {index['name'] for index in inspect(self.engine).get_indexes(package_extra_table.name)}
+
+    def get_invalid_index_names(self):
+        """
+        Returns the names of the invalid indexes on the table package_extra. PostgreSQL keeps an invalid
+        index if creating it concurrently failed. Other databases don't have invalid indexes.
+        """
+        if self.engine.dialect.name != 'postgresql':
+            return set()
+        query = text(u'SELECT index_class.relname FROM pg_index '
+                     u'JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid '
+                     u'JOIN pg_class table_class ON table_class.oid = pg_index.indrelid '
+                     u'WHERE table_class.relname = :table_name AND NOT pg_index.indisvalid')
+        with self.engine.connect() as connection:
+            return {row[0] for row in connection.execute(query, {'table_name': package_extra_table.name})}
+
+    def _connect(self):
+        """ Returns a connection in autocommit mode, which is required to create indexes concurrently """
+        return self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+
+    def create(self, dry_run=False):
+        """
+        Creates the missing indexes and recreates the invalid indexes. Returns the names of the created
+        indexes.
+        """
+        existing = self.get_existing_index_names()
+        invalid = self.get_invalid_index_names()
+        created = []
+        for index in PACKAGE_EXTRA_INDEXES:
+            if index.name in existing and index.name not in invalid:
+                LOGGER.debug(u'Index %s already exists.', index.name)
+                continue
+            if not dry_run:
+                with self._connect() as connection:
+                    if index.name in invalid:
+                        LOGGER.warning(u'Index %s is invalid. Dropping it before creating it again.',
+                                       index.name)
+                        index.drop(bind=connection, checkfirst=True)
+                    LOGGER.info(u'Creating index %s ...', index.name)
+                    index.create(bind=connection, checkfirst=True)
+            created.append(index.name)
+        return created
+
+    def drop(self, dry_run=False):
+        """ Drops the existing indexes. Returns the names of the dropped indexes. """
+        existing = self.get_existing_index_names()
+        dropped = []
+        for index in PACKAGE_EXTRA_INDEXES:
+            if index.name not in existing:
+                continue
+            if not dry_run:
+                with self._connect() as connection:
+                    index.drop(bind=connection, checkfirst=True)
+            dropped.append(index.name)
+        return dropped
+
+    def check(self):
+        """
+        Explains a typical query for each index and returns a list of IndexStatus with the information
+        whether the index exists, is valid and the query planner uses it.
+        """
+        existing = self.get_existing_index_names()
+        invalid = self.get_invalid_index_names()
+        explain = u'EXPLAIN QUERY PLAN' if self.engine.dialect.name == 'sqlite' else u'EXPLAIN'
+        result = []
+        with self.engine.connect() as connection:
+            for index in PACKAGE_EXTRA_INDEXES:
+                query = _get_check_query(index).compile(dialect=self.engine.dialect,
+                                                        compile_kwargs={'literal_binds': True})
+                plan = u'\n'.join(u' '.join(str(value) for value in row)
+                                  for row in connection.execute(text(u'%s %s' % (explain, query))))
+                LOGGER.debug(u'Query plan for index %s:\n%s', index.name, plan)
+                result.append(IndexStatus(index.name, index.name in existing, index.name not in invalid,
+                                          index.name in plan))
+        return result
@@ -2,12 +2,36 @@
 import ckan.plugins.toolkit as tk
 from ckan import plugins as p
 import ckanext.dcatde.commands.cli as cli
+from ckanext.dcatde.harvesters.identifier_registry import register_dataset, unregister_dataset
 
 
 class DCATdePlugin(p.SingletonPlugin):
     """ Init Plugin """
 
     p.implements(p.IClick)
+    p.implements(p.IPackageController, inherit=True)
     # IClick
     def get_commands(self):
         return cli.get_commands()
+
+    # IPackageController
+    # Keeps the identifier registry up to date for the datasets changed by any harvester or via the API
+    # pylint: disable=unused-argument
+    def after_dataset_create(self, context, pkg_dict):
+        register_dataset(pkg_dict)
+
+    def after_dataset_update(self, context, pkg_dict):
+        register_dataset(pkg_dict)
+
+    def after_dataset_delete(self, context, pkg_dict):
+        unregister_dataset(pkg_dict)
+
+    # The method names of IPackageController prior CKAN 2.10
+    def after_create(self, context, pkg_dict):
+        register_dataset(pkg_dict)
+
+    def after_update(self, context, pkg_dict):
+        register_dataset(pkg_dict)
+
+    def after_delete(self, context, pkg_dict):
+        unregister_dataset(pkg_dict)
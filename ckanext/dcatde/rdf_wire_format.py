@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+RDF serialization formats used to transfer datasets to the triplestore and the SHACL validator
+"""
+import logging
+from collections import namedtuple
+
+from ckan.plugins import toolkit as tk
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_PARAM_WIRE_FORMAT = 'ckanext.dcatde.rdf.wire_format'
+
+WireFormat = namedtuple('WireFormat', ['name', 'rdflib_format', 'content_type'])
+
+WIRE_FORMAT_TURTLE = WireFormat('turtle', 'turtle', 'text/turtle')
+# N-Triples is a subset of Turtle, so payloads can always be parsed as Turtle, too
+WIRE_FORMAT_NTRIPLES = WireFormat('ntriples', 'nt', 'application/n-triples')
+
+WIRE_FORMATS = {
+    WIRE_FORMAT_TURTLE.name: WIRE_FORMAT_TURTLE,
+    WIRE_FORMAT_NTRIPLES.name: WIRE_FORMAT_NTRIPLES
+}
+DEFAULT_WIRE_FORMAT = WIRE_FORMAT_TURTLE.name
+
+
+def get_wire_format(name=None):
+    """
+    Returns the WireFormat with the given name or the configured one. Falls back to Turtle if the
+    format is unknown.
+    """
+    if name is None:
+        name = tk.config.get(CONFIG_PARAM_WIRE_FORMAT, DEFAULT_WIRE_FORMAT)
+    wire_format = WIRE_FORMATS.get(str(name).strip().lower())
+    if wire_format is None:
+        LOGGER.warning(u'Unknown RDF wire format "%s", using "%s". Supported formats: %s', name,
+                       DEFAULT_WIRE_FORMAT, u', '.join(sorted(WIRE_FORMATS)))
+        wire_format = WIRE_FORMATS[DEFAULT_WIRE_FORMAT]
+    return wire_format
+
+
+def serialize_graph(graph, wire_format):
+    """Serializes the given rdflib graph in the given WireFormat and returns it as string"""
+    data = graph.serialize(format=wire_format.rdflib_format)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return data
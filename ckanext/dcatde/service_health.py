@@ -0,0 +1,169 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Health state, circuit breaker and retries for the external services, i.e. the triplestore and the SHACL
+validator
+"""
+import logging
+import socket
+import threading
+import time
+from urllib.error import HTTPError, URLError
+
+from ckan.plugins import toolkit as tk
+import requests
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_PARAM_FAILURE_THRESHOLD = 'ckanext.dcatde.circuit_breaker.failure_threshold'
+CONFIG_PARAM_RESET_TIMEOUT = 'ckanext.dcatde.circuit_breaker.reset_timeout'
+CONFIG_PARAM_HEALTH_CHECK_TTL = 'ckanext.dcatde.circuit_breaker.health_check_ttl'
+CONFIG_PARAM_MAX_RETRIES = 'ckanext.dcatde.retry.max_retries'
+CONFIG_PARAM_RETRY_BACKOFF = 'ckanext.dcatde.retry.backoff'
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half-open'
+
+
+class ServiceUnavailableError(Exception):
+    """ Raised if a request is rejected, because the circuit of the service is open """
+
+
+def is_transient_error(exception):
+    """ Returns True if the exception is caused by a connection problem or a timeout """
+    if isinstance(exception, HTTPError):
+        return False
+    return isinstance(exception, (URLError, socket.timeout, ConnectionError,
+                                  requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def is_connection_error(exception):
+    """
+    Returns True if the connection to the service could not be established, i.e. the request hasn't been
+    received by the service. A read timeout doesn't count, because the service may have applied the request.
+    """
+    if isinstance(exception, HTTPError):
+        return False
+    # requests.exceptions.ConnectTimeout is a requests.exceptions.ConnectionError
+    return isinstance(exception, (URLError, ConnectionError, requests.exceptions.ConnectionError))
+
+
+class ServiceHealthMonitor(object):
+    """
+    Keeps track of the health of an external service.
+
+    After failure_threshold consecutive connection failures the circuit is opened and all requests are
+    rejected immediately. After reset_timeout seconds one probe request is let through (half-open). If it
+    succeeds, the circuit is closed again, otherwise it is opened for another reset_timeout seconds. The
+    result of the last availability check is cached for health_check_ttl seconds.
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, name, failure_threshold=3, reset_timeout=30, health_check_ttl=10, max_retries=2,
+                 retry_backoff=0.5):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.health_check_ttl = health_check_ttl
+        self.max_retries = max(max_retries, 0)
+        self.retry_backoff = retry_backoff
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_progress = False
+        self._available = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, name):
+        """ Creates a health monitor with the settings from the CKAN config """
+        return cls(name,
+                   failure_threshold=tk.asint(tk.config.get(CONFIG_PARAM_FAILURE_THRESHOLD, 3)),
+                   reset_timeout=float(tk.config.get(CONFIG_PARAM_RESET_TIMEOUT, 30)),
+                   health_check_ttl=float(tk.config.get(CONFIG_PARAM_HEALTH_CHECK_TTL, 10)),
+                   max_retries=tk.asint(tk.config.get(CONFIG_PARAM_MAX_RETRIES, 2)),
+                   retry_backoff=float(tk.config.get(CONFIG_PARAM_RETRY_BACKOFF, 0.5)))
+
+    def allow_request(self):
+        """
+        Returns True if a request to the service may be sent. In the half-open state only one probe
+        request is allowed.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                LOGGER.info(u'Circuit of %s is half-open. Probing the service.', self.name)
+                self.state = STATE_HALF_OPEN
+                self._probe_in_progress = False
+            if self.state == STATE_HALF_OPEN and not self._probe_in_progress:
+                self._probe_in_progress = True
+                return True
+            return False
+
+    def get_cached_availability(self):
+        """ Returns the cached result of the last availability check or None if it has expired """
+        with self._lock:
+            if self.state != STATE_CLOSED or self._checked_at is None:
+                return None
+            if time.monotonic() - self._checked_at >= self.health_check_ttl:
+                return None
+            return self._available
+
+    def record_success(self):
+        """ Records a successful request and closes the circuit """
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                LOGGER.info(u'%s is available again. Closing the circuit.', self.name)
+            self.state = STATE_CLOSED
+            self._failures = 0
+            self._probe_in_progress = False
+            self._available = True
+            self._checked_at = time.monotonic()
+
+    def record_failure(self):
+        """ Records a failed request and opens the circuit if the failure threshold is reached """
+        with self._lock:
+            self._failures += 1
+            self._probe_in_progress = False
+            self._available = False
+            self._checked_at = time.monotonic()
+            if self.state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != STATE_OPEN:
+                    LOGGER.warning(u'%s is not available. Opening the circuit for %s seconds.', self.name,
+                                   self.reset_timeout)
+                self.state = STATE_OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, func, *args, idempotent=True, **kwargs):
+        """
+        Calls the function, which sends a request to the service. Connection errors and timeouts are
+        retried with exponential backoff. If the request is not idempotent, e.g. a POST appending data,
+        only connection errors are retried, because a repeated request would be applied twice if the
+        first one timed out after it was applied. Raises ServiceUnavailableError if the circuit is open.
+        """
+        attempt = 0
+        while True:
+            if not self.allow_request():
+                raise ServiceUnavailableError(u'%s is not available. The circuit is open.' % self.name)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exception:
+                if not is_transient_error(exception):
+                    with self._lock:
+                        self._probe_in_progress = False
+                    raise
+                self.record_failure()
+                if attempt >= self.max_retries or self.state == STATE_OPEN or \
+                        not (idempotent or is_connection_error(exception)):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                LOGGER.debug(u'Request to %s failed: %s. Retrying in %s seconds.', self.name, exception,
+                             delay)
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.record_success()
+                return result
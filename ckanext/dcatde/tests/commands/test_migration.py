@@ -17,19 +17,20 @@ CONTRIBUTOR_ID_DEPRECATED = "http://dcat-ap.de/def/contributors/bundesamtFuerMat
 CONTRIBUTOR_ID_NEW = "http://dcat-ap.de/def/contributors/bundesanstaltFuerMaterialforschungUndPruefung"
 
 
-def mock_load_json_mapping(filename, _):
+def mock_load_json_mapping(filename, _, indexer=None):
     '''mock for util.load_json_mapping which returns dummy data'''
     if filename == 'licenses.json':
-        return {
+        mapping = {
             'list': [{
                 'URI': 'new-id',
                 'OGDLizenzcode': 'id1'
             }]
         }
     elif filename == 'categories.json':
-        return {'needed': 'new'}
+        mapping = {'needed': 'new'}
     else:
         return None
+    return indexer(mapping) if indexer else mapping
 
 
 class GetActionHelperMigration(helpers.GetActionHelper):
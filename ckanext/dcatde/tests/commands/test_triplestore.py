@@ -6,10 +6,13 @@ import unittest
 
 import ckanext.dcatde.commands.command_util as utils
 import ckanext.dcatde.tests.commands.common_helpers as helpers
+from ckanext.dcatde.rdf_wire_format import WIRE_FORMAT_TURTLE
 from ckanext.dcatde.triplestore.fuseki_client import FusekiTriplestoreClient
 from ckanext.dcatde.validation.shacl_validation import ShaclValidator
-from mock import patch, call, Mock, MagicMock
+from ckanext.dcatde.triplestore.sync_queue import TriplestoreSyncQueue
+from mock import patch, call, ANY, Mock, MagicMock
 from rdflib import URIRef
+from sqlalchemy import create_engine
 
 
 class DummyClass:
@@ -126,10 +129,12 @@ class TestTripleStoreCommand(unittest.TestCase):
         #verify
         mock_triplestore_is_available.assert_called_once_with()
         mock_triplestore_delete.assert_has_calls([call(URIRef(uri_d1)), call(URIRef(uri_d2))])
-        mock_triplestore_create.assert_has_calls([call(d1['rdf'], URIRef(uri_d1)),
-                                                  call(d2['rdf'], URIRef(uri_d2))])
-        mock_shacl_validate.assert_has_calls([call(d1['rdf'], URIRef(uri_d1), d1['org'], None),
-                                              call(d2['rdf'], URIRef(uri_d2), d2['org'], contributor_id_d2)])
+        mock_triplestore_create.assert_has_calls([call(d1['rdf'], URIRef(uri_d1), WIRE_FORMAT_TURTLE),
+                                                  call(d2['rdf'], URIRef(uri_d2), WIRE_FORMAT_TURTLE)])
+        mock_shacl_validate.assert_has_calls([call(d1['rdf'], URIRef(uri_d1), d1['org'], None, 'text/turtle',
+                                                   content_hash=None),
+                                              call(d2['rdf'], URIRef(uri_d2), d2['org'], contributor_id_d2,
+                                                   'text/turtle', content_hash=None)])
         mock_triplestore_delete_mqa.assert_has_calls([call(URIRef(uri_d1)), call(URIRef(uri_d2))])
         mock_triplestore_create_mqa.assert_has_calls([call(d1['shacl_result'], URIRef(uri_d1)),
                                                       call(d2['shacl_result'], URIRef(uri_d2))])
@@ -165,7 +170,8 @@ class TestTripleStoreCommand(unittest.TestCase):
         mock_gather_ids.assert_called_once_with(include_private=False)
 
 
-    def test_delete_datasets_dry_run(self, mock_get_action,
+    @patch("ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets")
+    def test_delete_datasets_dry_run(self, mock_triplestore_delete_datasets, mock_get_action,
                                     mock_triplestore_is_available, mock_triplestore_delete,
                                     mock_triplestore_create, mock_triplestore_delete_mqa,
                                     mock_triplestore_create_mqa, mock_shacl_validate, mock_gather_ids):
@@ -182,11 +188,12 @@ class TestTripleStoreCommand(unittest.TestCase):
 
         #verify
         mock_triplestore_is_available.assert_called_once_with()
-        mock_triplestore_delete.assert_not_called()
+        mock_triplestore_delete_datasets.assert_not_called()
         mock_triplestore_create.assert_not_called()
 
 
-    def test_delete_datasets_no_uris(self, mock_get_action,
+    @patch("ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets")
+    def test_delete_datasets_no_uris(self, mock_triplestore_delete_datasets, mock_get_action,
                                     mock_triplestore_is_available, mock_triplestore_delete,
                                     mock_triplestore_create, mock_triplestore_delete_mqa,
                                     mock_triplestore_create_mqa, mock_shacl_validate, mock_gather_ids):
@@ -203,11 +210,12 @@ class TestTripleStoreCommand(unittest.TestCase):
 
         #verify
         mock_triplestore_is_available.assert_not_called()
-        mock_triplestore_delete.assert_not_called()
+        mock_triplestore_delete_datasets.assert_not_called()
         mock_triplestore_create.assert_not_called()
 
-    def test_delete_datasets_triplestore_not_available(self, mock_get_action,
-                                    mock_triplestore_is_available, mock_triplestore_delete,
+    @patch("ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets")
+    def test_delete_datasets_triplestore_not_available(self, mock_triplestore_delete_datasets,
+                                    mock_get_action, mock_triplestore_is_available, mock_triplestore_delete,
                                     mock_triplestore_create, mock_triplestore_delete_mqa,
                                     mock_triplestore_create_mqa, mock_shacl_validate, mock_gather_ids):
         ''' Call delete datasets when triplestore is not available'''
@@ -223,10 +231,11 @@ class TestTripleStoreCommand(unittest.TestCase):
 
         #verify
         mock_triplestore_is_available.assert_called_once_with()
-        mock_triplestore_delete.assert_not_called()
+        mock_triplestore_delete_datasets.assert_not_called()
         mock_triplestore_create.assert_not_called()
 
-    def test_delete_datasets_success(self, mock_get_action,
+    @patch("ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets")
+    def test_delete_datasets_success(self, mock_triplestore_delete_datasets, mock_get_action,
                                     mock_triplestore_is_available, mock_triplestore_delete,
                                     mock_triplestore_create, mock_triplestore_delete_mqa,
                                     mock_triplestore_create_mqa, mock_shacl_validate, mock_gather_ids):
@@ -243,5 +252,162 @@ class TestTripleStoreCommand(unittest.TestCase):
 
         #verify
         mock_triplestore_is_available.assert_called_once_with()
-        mock_triplestore_delete.assert_has_calls([call('123'), call('234')])
+        mock_triplestore_delete_datasets.assert_called_once_with(['123', '234'])
+        mock_triplestore_delete.assert_not_called()
+        mock_triplestore_create.assert_not_called()
+
+    @patch("ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.migrate_to_named_graphs")
+    def test_migrate_named_graphs_not_activated(self, mock_triplestore_migrate, mock_get_action,
+                                                mock_triplestore_is_available, mock_triplestore_delete,
+                                                mock_triplestore_create, mock_triplestore_delete_mqa,
+                                                mock_triplestore_create_mqa, mock_shacl_validate,
+                                                mock_gather_ids):
+        ''' Call migrate named graphs when the named graph storage mode is not activated'''
+
+        #prepare
+        mock_triplestore_is_available.return_value = True
+        triplestore_client = FusekiTriplestoreClient()
+        triplestore_client.named_graphs = False
+
+        #execute
+        utils.migrate_to_named_graphs(False, triplestore_client)
+
+        #verify
+        mock_triplestore_is_available.assert_not_called()
+        mock_triplestore_migrate.assert_not_called()
+
+    @patch("ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.migrate_to_named_graphs")
+    def test_migrate_named_graphs_success(self, mock_triplestore_migrate, mock_get_action,
+                                          mock_triplestore_is_available, mock_triplestore_delete,
+                                          mock_triplestore_create, mock_triplestore_delete_mqa,
+                                          mock_triplestore_create_mqa, mock_shacl_validate, mock_gather_ids):
+        ''' Call migrate named graphs'''
+
+        #prepare
+        mock_triplestore_is_available.return_value = True
+        mock_triplestore_migrate.return_value = [('foo', 10, 2), ('bar', 0, 0)]
+        triplestore_client = FusekiTriplestoreClient()
+        triplestore_client.named_graphs = True
+
+        #execute
+        utils.migrate_to_named_graphs(False, triplestore_client)
+
+        #verify
+        mock_triplestore_is_available.assert_called_once_with()
+        mock_triplestore_migrate.assert_called_once_with(False, False)
+
+    def test_process_triplestore_queue_once(self, mock_get_action, mock_triplestore_is_available,
+                                            mock_triplestore_delete, mock_triplestore_create,
+                                            mock_triplestore_delete_mqa, mock_triplestore_create_mqa,
+                                            mock_shacl_validate, mock_gather_ids):
+        ''' Process the triplestore queue until it is empty'''
+
+        #prepare
+        mock_triplestore_is_available.return_value = True
+        rows = [Mock(uri='http://example.org/datasets/1'), Mock(uri='http://example.org/datasets/2')]
+        harvester = Mock(triplestore_client=FusekiTriplestoreClient())
+        harvester.update_queued_datasets_in_triplestore.return_value = (set(), [])
+        batches = [rows, []]
+
+        def process_next_batch(batch_size, callback):
+            batch = batches.pop(0)
+            if batch:
+                self.assertEqual(callback(batch), set())
+            return len(batch)
+        triplestore_queue = Mock()
+        triplestore_queue.process_next_batch.side_effect = process_next_batch
+        triplestore_queue.get_status.return_value = (0, None)
+
+        #execute
+        utils.process_triplestore_queue(harvester, triplestore_queue, 50, 10, True)
+
+        #verify
+        self.assertEqual(triplestore_queue.process_next_batch.call_count, 2)
+        harvester.update_queued_datasets_in_triplestore.assert_called_once_with(rows)
+
+    def test_process_triplestore_queue_update_error(self, mock_get_action, mock_triplestore_is_available,
+                                                    mock_triplestore_delete, mock_triplestore_create,
+                                                    mock_triplestore_delete_mqa, mock_triplestore_create_mqa,
+                                                    mock_shacl_validate, mock_gather_ids):
+        ''' The datasets which could not be updated in the triplestore stay in the queue'''
+
+        #prepare
+        mock_triplestore_is_available.return_value = True
+        uris = ['http://example.org/datasets/1', 'http://example.org/datasets/2']
+        harvester = Mock(triplestore_client=FusekiTriplestoreClient())
+        harvester.update_queued_datasets_in_triplestore.return_value = (
+            {uris[1]}, ['Error while updating datasets in TripleStore: 500 Internal server error!'])
+        triplestore_queue = TriplestoreSyncQueue(create_engine('sqlite://'))
+        triplestore_queue.enqueue([{'uri': uri, 'rdf_graph': None, 'owner_org': 'org-1',
+                                    'contributor_id': None, 'harvest_source_id': 'source-1',
+                                    'content_hash': None} for uri in uris])
+
+        #execute
+        utils.process_triplestore_queue(harvester, triplestore_queue, 50, 10, True)
+
+        #verify
+        harvester.update_queued_datasets_in_triplestore.assert_called_once_with(ANY)
+        self.assertEqual(triplestore_queue.get_status()[0], 1)
+
+    def test_process_triplestore_queue_not_available(self, mock_get_action, mock_triplestore_is_available,
+                                                     mock_triplestore_delete, mock_triplestore_create,
+                                                     mock_triplestore_delete_mqa, mock_triplestore_create_mqa,
+                                                     mock_shacl_validate, mock_gather_ids):
+        ''' Do not process the triplestore queue if the triplestore is not available'''
+
+        #prepare
+        mock_triplestore_is_available.return_value = False
+        harvester = Mock(triplestore_client=FusekiTriplestoreClient())
+        triplestore_queue = Mock()
+
+        #execute
+        utils.process_triplestore_queue(harvester, triplestore_queue, 50, 10, True)
+
+        #verify
+        mock_triplestore_is_available.assert_called_once_with()
+        triplestore_queue.process_next_batch.assert_not_called()
+
+    def test_benchmark_wire_formats(self, mock_get_action, mock_triplestore_is_available,
+                                    mock_triplestore_delete, mock_triplestore_create,
+                                    mock_triplestore_delete_mqa, mock_triplestore_create_mqa,
+                                    mock_shacl_validate, mock_gather_ids):
+        ''' Uploads the dataset in each wire format for each round'''
+
+        #prepare
+        mock_triplestore_is_available.return_value = True
+        uri = 'http://ckan.govdata.de/dataset/d1'
+        action_hlp = helpers.GetActionHelper()
+        action_hlp.return_val_actions['get_site_user'] = dict(name='admin')
+        action_hlp.return_val_actions['dcat_dataset_show'] = self._get_serialized_rdf(uri)
+        action_hlp.build_mocks()
+        mock_get_action.side_effect = action_hlp.mock_get_action
+
+        #execute
+        utils.benchmark_wire_formats(False, FusekiTriplestoreClient(), 'd1', 2)
+
+        #verify
+        self.assertEqual(mock_triplestore_delete.call_count, 4)
+        self.assertEqual([args[0][2].name for args in mock_triplestore_create.call_args_list],
+                         ['ntriples', 'ntriples', 'turtle', 'turtle'])
+
+    def test_benchmark_wire_formats_dry_run(self, mock_get_action, mock_triplestore_is_available,
+                                            mock_triplestore_delete, mock_triplestore_create,
+                                            mock_triplestore_delete_mqa, mock_triplestore_create_mqa,
+                                            mock_shacl_validate, mock_gather_ids):
+        ''' Measures the serialization only with dry-run'''
+
+        #prepare
+        action_hlp = helpers.GetActionHelper()
+        action_hlp.return_val_actions['get_site_user'] = dict(name='admin')
+        action_hlp.return_val_actions['dcat_dataset_show'] = self._get_serialized_rdf(
+            'http://ckan.govdata.de/dataset/d1')
+        action_hlp.build_mocks()
+        mock_get_action.side_effect = action_hlp.mock_get_action
+
+        #execute
+        utils.benchmark_wire_formats(True, FusekiTriplestoreClient(), 'd1', 2)
+
+        #verify
+        mock_triplestore_is_available.assert_not_called()
+        mock_triplestore_delete.assert_not_called()
         mock_triplestore_create.assert_not_called()
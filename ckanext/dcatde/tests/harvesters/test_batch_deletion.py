@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import unittest
+
+from ckanext.dcatde.harvesters.batch_deletion import BatchDeletionExecutor
+from mock import patch, Mock, ANY
+from sqlalchemy.exc import SQLAlchemyError
+
+
+@patch('ckan.lib.search.common.make_connection')
+@patch('ckanext.dcatde.harvesters.batch_deletion.get_identifier_registry')
+@patch('ckanext.dcatde.harvesters.batch_deletion.dataset_uri')
+@patch('ckanext.dcatde.harvesters.batch_deletion.HarvestObject')
+@patch('ckanext.dcatde.harvesters.batch_deletion.model')
+class TestBatchDeletionExecutor(unittest.TestCase):
+    """
+    Test class for the BatchDeletionExecutor
+    """
+
+    def setUp(self):
+        self.triplestore_client = Mock()
+        self.triplestore_client.is_available.return_value = True
+        self.executor = BatchDeletionExecutor(self.triplestore_client, chunk_size=2)
+
+    @staticmethod
+    def _mock_queries(mock_model, package_chunks, uris):
+        """ Mocks the queries reading the active packages per chunk and the URI extras """
+        queries = []
+        for packages in package_chunks:
+            package_query = Mock()
+            package_query.join.return_value.filter.return_value.filter.return_value = packages
+            queries.append(package_query)
+        uri_query = Mock()
+        uri_query.filter.return_value.filter.return_value.filter.return_value = uris
+        mock_model.Session.query.side_effect = queries + [uri_query] + [Mock() for _ in range(20)]
+
+    def test_execute_deletes_datasets_in_batch(self, mock_model, mock_harvest_object,
+                                               mock_dataset_uri, mock_get_registry, mock_make_connection):
+        """ Tests if the active datasets are deleted at once and the other objects are returned """
+        self._mock_queries(mock_model, [[('obj-1', 'pkg-1', 'name-1'), ('obj-2', 'pkg-2', 'name-2')], []],
+                           [('pkg-1', 'http://example.org/1')])
+        mock_dataset_uri.return_value = 'http://ckan.example.org/dataset/pkg-2'
+
+        result = self.executor.execute(['obj-1', 'obj-2', 'obj-3'])
+
+        self.assertEqual(result, ['obj-3'])
+        mock_model.Session.bulk_update_mappings.assert_called_once_with(mock_model.Package, [
+            {'id': 'pkg-1', 'name': ANY, 'state': mock_model.State.DELETED, 'metadata_modified': ANY},
+            {'id': 'pkg-2', 'name': ANY, 'state': mock_model.State.DELETED, 'metadata_modified': ANY}])
+        for mapping in mock_model.Session.bulk_update_mappings.call_args[0][1]:
+            self.assertTrue(mapping['name'].startswith('name-'))
+            self.assertIn('-deleted', mapping['name'])
+        mock_model.Session.commit.assert_called_once_with()
+        mock_dataset_uri.assert_called_once_with({'id': 'pkg-2', 'extras': []})
+        mock_get_registry.return_value.unregister.assert_called_once_with(['pkg-1', 'pkg-2'])
+        mock_make_connection.return_value.delete.assert_called_once_with(q=ANY, commit=True)
+        query = mock_make_connection.return_value.delete.call_args[1]['q']
+        self.assertIn('+id:("pkg-1" OR "pkg-2")', query)
+        self.triplestore_client.delete_datasets.assert_called_once_with(
+            ['http://ckan.example.org/dataset/pkg-2', 'http://example.org/1'])
+        mock_model.Session.bulk_insert_mappings.assert_not_called()
+
+    def test_execute_without_active_datasets(self, mock_model, mock_harvest_object,
+                                             mock_dataset_uri, mock_get_registry, mock_make_connection):
+        """ Tests if all objects are returned for the import stage if no dataset is active """
+        self._mock_queries(mock_model, [[]], [])
+
+        result = self.executor.execute(['obj-1'])
+
+        self.assertEqual(result, ['obj-1'])
+        mock_model.Session.bulk_update_mappings.assert_not_called()
+        mock_model.Session.commit.assert_not_called()
+        mock_make_connection.assert_not_called()
+        self.triplestore_client.delete_datasets.assert_not_called()
+
+    def test_execute_database_error(self, mock_model, mock_harvest_object,
+                                    mock_dataset_uri, mock_get_registry, mock_make_connection):
+        """ Tests if all objects are returned for the import stage if the database update fails """
+        self._mock_queries(mock_model, [[('obj-1', 'pkg-1', 'name-1')]], [('pkg-1', 'http://example.org/1')])
+        mock_model.Session.bulk_update_mappings.side_effect = SQLAlchemyError('error')
+
+        result = self.executor.execute(['obj-1'])
+
+        self.assertEqual(result, ['obj-1'])
+        mock_model.Session.rollback.assert_called_once_with()
+        mock_make_connection.assert_not_called()
+        self.triplestore_client.delete_datasets.assert_not_called()
+
+    def test_execute_search_index_error(self, mock_model, mock_harvest_object,
+                                        mock_dataset_uri, mock_get_registry, mock_make_connection):
+        """ Tests if the deletion is rolled back and all objects are returned if the search index fails """
+        self._mock_queries(mock_model, [[('obj-1', 'pkg-1', 'name-1'), ('obj-2', 'pkg-2', 'name-2')]],
+                           [('pkg-1', 'http://example.org/1'), ('pkg-2', 'http://example.org/2')])
+        mock_make_connection.return_value.delete.side_effect = Exception('Solr not reachable')
+
+        result = self.executor.execute(['obj-1', 'obj-2'])
+
+        self.assertEqual(result, ['obj-1', 'obj-2'])
+        mock_model.Session.bulk_update_mappings.assert_called_once()
+        mock_model.Session.rollback.assert_called_once_with()
+        mock_model.Session.commit.assert_not_called()
+        mock_get_registry.return_value.unregister.assert_not_called()
+        self.triplestore_client.delete_datasets.assert_not_called()
+
+    def test_execute_commit_error(self, mock_model, mock_harvest_object,
+                                  mock_dataset_uri, mock_get_registry, mock_make_connection):
+        """ Tests if all objects are returned for the import stage if the commit fails """
+        self._mock_queries(mock_model, [[('obj-1', 'pkg-1', 'name-1')]], [('pkg-1', 'http://example.org/1')])
+        mock_model.Session.commit.side_effect = SQLAlchemyError('error')
+
+        result = self.executor.execute(['obj-1'])
+
+        self.assertEqual(result, ['obj-1'])
+        mock_make_connection.return_value.delete.assert_called_once_with(q=ANY, commit=True)
+        mock_model.Session.rollback.assert_called_once_with()
+        self.triplestore_client.delete_datasets.assert_not_called()
@@ -5,14 +5,17 @@ import unittest
 
 from parameterized import parameterized
 import pkg_resources
-from SPARQLWrapper.SPARQLExceptions import SPARQLWrapperException
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed, SPARQLWrapperException
 from SPARQLWrapper.Wrapper import QueryResult
 from rdflib import Graph, Literal, URIRef
 from rdflib.namespace import RDF, Namespace, FOAF
 from ckanext.dcat.processors import RDFParser
 from ckanext.dcatde.dataset_utils import EXTRA_KEY_HARVESTED_PORTAL
-from ckanext.dcatde.harvesters.dcatde_rdf import DCATdeRDFHarvester
-from ckanext.dcatde.triplestore.sparql_query_templates import GET_URIS_FROM_HARVEST_INFO_QUERY
+from ckanext.dcatde.harvesters.dcatde_rdf import DCATdeRDFHarvester, _compact_package_id, _expand_package_id
+from ckanext.dcatde.harvesters.license_statistics import HARVEST_OBJECT_EXTRA_KEY, LICENSE_MISSING
+from ckanext.dcatde.profiles import DCATDE
+from ckanext.dcatde.triplestore.sparql_query_templates import GET_CONTENT_HASHES_FROM_HARVEST_INFO_QUERY, \
+    GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_QUERY, GOVDATA_HARVEST_INFO
 from ckantoolkit.tests import helpers
 from mock import call, patch, Mock, ANY, DEFAULT
 
@@ -107,13 +110,19 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
 
     def _assert_rdf_harvest_info(self, mock_call_args_list, uris, owner_org, harvest_source_id):
         assert len(uris) > 0
-        assert len(mock_call_args_list) == len(uris)
+        harvest_info = {}
         for calls in mock_call_args_list:
             args, kwargs = calls
-            graph_from_mock_args = Graph().parse(data=args[0], format='application/rdf+xml')
+            for uri, graph in args[0]:
+                if graph is not None:
+                    harvest_info[uri] = graph
+        self.assertCountEqual(list(harvest_info.keys()), [URIRef(uri) for uri in uris])
+        for uri, graph in harvest_info.items():
             object_list = []
-            for s, p, o in graph_from_mock_args.triples((None, None, None)):
-                self.assertIn(s, [URIRef(uri) for uri in uris])
+            for s, p, o in graph.triples((None, None, None)):
+                self.assertEqual(s, uri)
+                if p == GOVDATA_HARVEST_INFO.contentHash:
+                    continue
                 self.assertEqual(p, FOAF.knows)
                 object_list.append(o)
             self.assertCountEqual(object_list, [Literal(owner_org), Literal(harvest_source_id)])
@@ -158,6 +167,12 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
 
         # check
         self._assert_resource_licenses(harvest_obj, u'http://dcat-ap.de/def/licenses/other-closed', u'foo')
+        license_statistics = [json.loads(extra.value) for extra in harvest_obj.extras
+                              if extra.key == HARVEST_OBJECT_EXTRA_KEY]
+        self.assertEqual(license_statistics, [{
+            'counts': {LICENSE_MISSING: 1},
+            'samples': {LICENSE_MISSING: [['http://example.com/no-license',
+                                           u'http://dcat-ap.de/def/licenses/other-closed', None]]}}])
 
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATRDFHarvester.import_stage')
     def test_add_contributor_id_field_in_ckan_dataset_if_missing(self, mock_super_import):
@@ -407,7 +422,7 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         mock_harvest_get_username.assert_not_called()
         mock_triplestore_is_available.assert_not_called()
         mock_fuseki_delete_data.assert_not_called()
-        mock_handle_duplicates.assert_called_with(harvest_obj)
+        mock_handle_duplicates.assert_called_with(harvest_obj, json.loads(harvest_obj.content))
         mock_super_import.assert_called_with(harvest_obj)
 
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATRDFHarvester._save_object_error')
@@ -434,7 +449,7 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         self.assertFalse(result)
         # no call to the custom delete logic was made
         mock_deletion.assert_not_called()
-        mock_handle_duplicates.assert_called_with(harvest_obj)
+        mock_handle_duplicates.assert_called_with(harvest_obj, json.loads(harvest_obj.content))
         mock_save_object_error.assert_called_with(
             'Skipping importing dataset, because of duplicate detection!', harvest_obj, 'Import')
         mock_super_import.assert_not_called()
@@ -594,18 +609,15 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
 
         mock_super_import.assert_called_once_with(harvest_obj)
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_harvesting_one_dataset_after_parse(self, mock_model_get, mock_shacl_validate,
                                                 mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-                                                mock_fuseki_create_data, mock_fuseki_delete_data,
-                                                mock_fuseki_create_hi, mock_fuseki_delete_hi):
+                                                mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
         Test valid content in after_parsing() and check if correct methods are being called.
         """
@@ -634,40 +646,32 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         # check if no errors are returned
         self.assertEqual(len(error_msgs), 0)
         uri = next(rdf_parser._datasets())
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # check if delete dataset was called. Testdata has only one dataset
-        mock_fuseki_delete_data.assert_called_once_with(uri)
-        # check if create dataset was called
-        mock_fuseki_create_data.assert_called_once_with(ANY, uri)
+        mock_triplestore_is_available.assert_called_once_with()
+        # check if the dataset was replaced in one request. Testdata has only one dataset
+        mock_fuseki_upsert_data.assert_called_once_with([(uri, ANY)])
+        self.assertTrue(len(mock_fuseki_upsert_data.call_args[0][0][0][1]) > 0)
         # check if shacle validator was called
-        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, config['contributorID'])
-        # check if delete dataset was called.
-        mock_fuseki_delete_data_mqa.assert_called_once_with(uri)
-        # check if create dataset was called
+        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, config['contributorID'], 'text/turtle',
+                                                    content_hash=ANY)
+        # check if delete validation report was called.
+        mock_fuseki_delete_data_mqa.assert_called_once_with([uri])
+        # check if create validation report was called
         mock_fuseki_create_data_mqa.assert_called_once_with(mock_validate_result, uri)
-        # check if delete harvest_info was called.
-        mock_fuseki_delete_hi.assert_called_once_with(uri)
-        # check if create harvest_info was called.
-        mock_fuseki_create_hi.assert_called_once_with(ANY, uri)
-        # check if harvest_info was called with the correct parameters
-        # the order of the graph is random, so we to check values individually
-        self._assert_rdf_harvest_info(mock_fuseki_create_hi.call_args_list, [uri], org_id,
+        # check if harvest_info was replaced with the correct parameters
+        mock_fuseki_upsert_hi.assert_called_once_with([(uri, ANY)])
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, [uri], org_id,
                                       harvest_obj.source.id)
 
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._get_contributor_from_config')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_harvesting_one_dataset_after_parse_contributor_id_from_config(self, mock_model_get, mock_shacl_validate,
                                                                            mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-                                                                           mock_fuseki_create_data, mock_fuseki_delete_data,
-                                                                           mock_fuseki_create_hi, mock_fuseki_delete_hi,
+                                                                           mock_fuseki_upsert_data, mock_fuseki_upsert_hi,
                                                                            mock_get_contrib_from_config):
         """
         Test valid content in after_parsing() and check if correct contributor id is beeing used.
@@ -698,42 +702,33 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         # check if no errors are returned
         self.assertEqual(len(error_msgs), 0)
         uri = next(rdf_parser._datasets())
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # check if delete dataset was called. Testdata has only one dataset
-        mock_fuseki_delete_data.assert_called_once_with(uri)
-        # check if create dataset was called
-        mock_fuseki_create_data.assert_called_once_with(ANY, uri)
+        mock_triplestore_is_available.assert_called_once_with()
+        # check if the dataset was replaced. Testdata has only one dataset
+        mock_fuseki_upsert_data.assert_called_once_with([(uri, ANY)])
         # check if get contributor id from config was called
         mock_get_contrib_from_config.assert_called_once_with(harvest_obj.source.config)
+        # check if the contributor id was added to the graph
+        graph = mock_fuseki_upsert_data.call_args[0][0][0][1]
+        self.assertIn((uri, URIRef(DCATDE.contributorID), URIRef(contributor_id)), graph)
         # check if shacle validator was called
-        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, contributor_id)
-        # check if delete dataset was called.
-        mock_fuseki_delete_data_mqa.assert_called_once_with(uri)
-        # check if create dataset was called
+        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, contributor_id, 'text/turtle',
+                                                    content_hash=ANY)
+        mock_fuseki_delete_data_mqa.assert_called_once_with([uri])
         mock_fuseki_create_data_mqa.assert_called_once_with(mock_validate_result, uri)
-        # check if delete harvest_info was called.
-        mock_fuseki_delete_hi.assert_called_once_with(uri)
-        # check if create harvest_info was called.
-        mock_fuseki_create_hi.assert_called_once_with(ANY, uri)
-        # check if harvest_info was called with the correct parameters
-        # the order of the graph is random, so we to check values individually
-        self._assert_rdf_harvest_info(mock_fuseki_create_hi.call_args_list, [uri], org_id,
+        mock_fuseki_upsert_hi.assert_called_once_with([(uri, ANY)])
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, [uri], org_id,
                                       harvest_obj.source.id)
 
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._get_contributor_from_config')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_harvesting_one_dataset_after_parse_no_contributor_id(self, mock_model_get, mock_shacl_validate,
                                                                   mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-                                                                  mock_fuseki_create_data, mock_fuseki_delete_data,
-                                                                  mock_fuseki_create_hi, mock_fuseki_delete_hi,
+                                                                  mock_fuseki_upsert_data, mock_fuseki_upsert_hi,
                                                                   mock_get_contrib_from_config):
         """
         Test valid content in after_parsing() and check if owner_org is used as fallback for missing contributor id.
@@ -763,41 +758,68 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         # check if no errors are returned
         self.assertEqual(len(error_msgs), 0)
         uri = next(rdf_parser._datasets())
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # check if delete dataset was called. Testdata has only one dataset
-        mock_fuseki_delete_data.assert_called_once_with(uri)
-        # check if create dataset was called
-        mock_fuseki_create_data.assert_called_once_with(ANY, uri)
+        mock_triplestore_is_available.assert_called_once_with()
+        # check if the dataset was replaced. Testdata has only one dataset
+        mock_fuseki_upsert_data.assert_called_once_with([(uri, ANY)])
         # check if read contrib id was called
         mock_get_contrib_from_config.assert_called_once_with(harvest_obj.source.config)
         # check if shacle validator was called
-        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, None)
-        # check if delete dataset was called.
-        mock_fuseki_delete_data_mqa.assert_called_once_with(uri)
-        # check if create dataset was called
+        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, None, 'text/turtle', content_hash=ANY)
+        mock_fuseki_delete_data_mqa.assert_called_once_with([uri])
         mock_fuseki_create_data_mqa.assert_called_once_with(mock_validate_result, uri)
-        # check if delete harvest_info was called.
-        mock_fuseki_delete_hi.assert_called_once_with(uri)
-        # check if create harvest_info was called.
-        mock_fuseki_create_hi.assert_called_once_with(ANY, uri)
-        # check if harvest_info was called with the correct parameters
-        # the order of the graph is random, so we to check values individually
-        self._assert_rdf_harvest_info(mock_fuseki_create_hi.call_args_list, [uri], org_id,
+        mock_fuseki_upsert_hi.assert_called_once_with([(uri, ANY)])
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, [uri], org_id,
                                       harvest_obj.source.id)
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @helpers.change_config('ckanext.dcatde.rdf.wire_format', 'ntriples')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._get_contributor_from_config')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_one_dataset_after_parse_wire_format_ntriples(self, mock_model_get, mock_shacl_validate,
+                                                                     mock_fuseki_create_data_mqa,
+                                                                     mock_fuseki_delete_data_mqa,
+                                                                     mock_fuseki_upsert_data, mock_fuseki_upsert_hi,
+                                                                     mock_get_contrib_from_config):
+        """
+        Test if the dataset is sent as N-Triples to the SHACL validator if the wire format is configured.
+        """
+        # prepare
+        harvester = DCATdeRDFHarvester()
+        maxrdf = self._get_max_rdf('metadata_max_only_valid_uris')
+        rdf_parser = RDFParser()
+        rdf_parser.parse(maxrdf, 'application/rdf+xml')
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+        harvester.triplestore_client.is_available = Mock(return_value=True)
+        org_id = "test-org-id"
+        mock_model_get.return_value = Mock(owner_org=org_id)
+        mock_get_contrib_from_config.return_value = None
+        mock_shacl_validate.return_value = Mock(name='validate-result')
+
+        # run
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(len(error_msgs), 0)
+        uri = next(rdf_parser._datasets())
+        mock_shacl_validate.assert_called_once_with(ANY, uri, org_id, None, 'application/n-triples',
+                                                    content_hash=ANY)
+        validated_graph = Graph()
+        validated_graph.parse(data=mock_shacl_validate.call_args[0][0], format='nt')
+        self.assertEqual(len(validated_graph), len(mock_fuseki_upsert_data.call_args[0][0][0][1]))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_harvesting_invalid_uriref_after_parse(self, mock_model_get, mock_shacl_validate,
                                                    mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-                                                   mock_fuseki_create_data, mock_fuseki_delete_data,
-                                                   mock_fuseki_create_hi, mock_fuseki_delete_hi):
+                                                   mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
         Check if datasets containing invalid URIRefs are skipped.
         """
@@ -822,31 +844,25 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         # error should be returned
         self.assertEqual(len(error_msgs), 1)
         uri = next(rdf_parser._datasets())
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
+        mock_triplestore_is_available.assert_called_once_with()
         # Dataset should be removed, but not created again
-        mock_fuseki_delete_data.assert_called_once_with(uri)
-        mock_fuseki_create_data.assert_not_called()
+        mock_fuseki_upsert_data.assert_called_once_with([(uri, None)])
         # validation should also be skipped
         mock_shacl_validate.assert_not_called()
         # and no validation results should be written, but existing should be removed
-        mock_fuseki_delete_data_mqa.assert_called_once_with(uri)
+        mock_fuseki_delete_data_mqa.assert_called_once_with([uri])
         mock_fuseki_create_data_mqa.assert_not_called()
-        # harvest_info should be removed
-        mock_fuseki_delete_hi.assert_called_once_with(uri)
-        # create harvest_info skipped
-        mock_fuseki_create_hi.assert_not_called()
+        # harvest_info should be removed, but not created again
+        mock_fuseki_upsert_hi.assert_called_once_with([(uri, None)])
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     def test_harvesting_after_parse_triplestore_not_available(
             self, mock_shacl_validate, mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-            mock_fuseki_create_data, mock_fuseki_delete_data, mock_fuseki_create_hi, mock_fuseki_delete_hi):
+            mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
         Test behaviour if triplestore is not available
         """
@@ -867,26 +883,21 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         # check if no errors are returned
         self.assertEqual(len(error_msgs), 0)
         mock_triplestore_is_available.assert_called_once_with()
-        # create dataset should not be called
-        mock_fuseki_create_data.assert_not_called()
-        # delete dataset should not be called
-        mock_fuseki_delete_data.assert_not_called()
+        # triplestore should not be updated
+        mock_fuseki_upsert_data.assert_not_called()
         mock_shacl_validate.assert_not_called()
         mock_fuseki_delete_data_mqa.assert_not_called()
         mock_fuseki_create_data_mqa.assert_not_called()
-        mock_fuseki_delete_hi.assert_not_called()
-        mock_fuseki_create_hi.assert_not_called()
+        mock_fuseki_upsert_hi.assert_not_called()
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     def test_harvesting_after_parse_rdf_parser_not_available(
             self, mock_shacl_validate, mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-            mock_fuseki_create_data, mock_fuseki_delete_data, mock_fuseki_create_hi, mock_fuseki_delete_hi):
+            mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
         Test behaviour if RDF-Parser is not available
         """
@@ -906,30 +917,24 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         # check if no errors are returned
         self.assertEqual(len(error_msgs), 0)
         mock_triplestore_is_available.assert_not_called()
-        # create dataset should not be called
-        mock_fuseki_create_data.assert_not_called()
-        # delete dataset should not be called
-        mock_fuseki_delete_data.assert_not_called()
+        # triplestore should not be updated
+        mock_fuseki_upsert_data.assert_not_called()
         mock_shacl_validate.assert_not_called()
         mock_fuseki_delete_data_mqa.assert_not_called()
         mock_fuseki_create_data_mqa.assert_not_called()
-        mock_fuseki_delete_hi.assert_not_called()
-        mock_fuseki_create_hi.assert_not_called()
+        mock_fuseki_upsert_hi.assert_not_called()
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_harvesting_multiple_datasets_after_parse(
             self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
-            mock_fuseki_delete_data_mqa, mock_fuseki_create_data, mock_fuseki_delete_data,
-            mock_fuseki_create_hi, mock_fuseki_delete_hi):
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
-        Test valid content in after_parsing() and check if correct methods are being called.
+        Test valid content in after_parsing() and check if the datasets are updated in one request.
         """
         # prepare
         uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
@@ -954,35 +959,483 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         self.assertEqual(rdf_parser_return, rdf_parser)
         # check if no errors are returned
         self.assertEqual(len(error_msgs), 0)
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # check if delete dataset was called twice
-        self.assertEqual(mock_fuseki_delete_data.call_count, len(uris))
-        # check if create dataset was called twice
-        self.assertEqual(mock_fuseki_create_data.call_count, len(uris))
-        # check if shacl validator was called twice
+        mock_triplestore_is_available.assert_called_once_with()
+        # check if both datasets were replaced in one request
+        mock_fuseki_upsert_data.assert_called_once_with(ANY)
+        self.assertCountEqual([uri for uri, _ in mock_fuseki_upsert_data.call_args[0][0]], uris)
+        mock_fuseki_delete_data_mqa.assert_called_once_with(ANY)
+        self.assertCountEqual(mock_fuseki_delete_data_mqa.call_args[0][0], uris)
+        mock_fuseki_upsert_hi.assert_called_once_with(ANY)
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, uris, "test-org-id",
+                                      harvest_obj.source.id)
+        # check if shacl validator was called for every dataset
         self.assertEqual(mock_shacl_validate.call_count, len(uris))
-        # check if delete dataset was called twice
-        self.assertEqual(mock_fuseki_delete_data_mqa.call_count, len(uris))
-        # check if create dataset was called twice
         self.assertEqual(mock_fuseki_create_data_mqa.call_count, len(uris))
-        # check if delete dataset was called twice
-        self.assertEqual(mock_fuseki_delete_hi.call_count, len(uris))
-        # check if create dataset was called twice
-        self.assertEqual(mock_fuseki_create_hi.call_count, len(uris))
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_multiple_datasets_after_parse_batch_size(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
+        """
+        Test if the datasets are split into batches of the configured size in after_parsing().
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/%s" % index) for index in range(5)]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvester.triplestore_client.batch_size = 2
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        mock_triplestore_is_available = Mock(name='triplestore-is-available')
+        mock_triplestore_is_available.return_value = True
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+        harvester.triplestore_client.is_available = mock_triplestore_is_available
+
+        # run
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(len(error_msgs), 0)
+        self.assertEqual(mock_fuseki_upsert_data.call_count, 3)
+        self.assertEqual([len(args[0]) for args, _ in mock_fuseki_upsert_data.call_args_list], [2, 2, 1])
+        self.assertEqual(mock_fuseki_delete_data_mqa.call_count, 3)
+        # the harvest info of all batches is written with one request
+        mock_fuseki_upsert_hi.assert_called_once_with(ANY)
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, uris, "test-org-id",
+                                      harvest_obj.source.id)
+        self.assertEqual(mock_shacl_validate.call_count, len(uris))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_multiple_datasets_after_parse_harvest_info_chunk_size(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
+        """
+        Test if the harvest info is written in chunks of the configured size in after_parsing().
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/%s" % index) for index in range(5)]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvester.triplestore_client.batch_size = 2
+        harvester.harvest_info_chunk_size = 3
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        mock_triplestore_is_available = Mock(name='triplestore-is-available')
+        mock_triplestore_is_available.return_value = True
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+        harvester.triplestore_client.is_available = mock_triplestore_is_available
+
+        # run
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(len(error_msgs), 0)
+        self.assertEqual(mock_fuseki_upsert_data.call_count, 3)
+        self.assertEqual([len(args[0]) for args, _ in mock_fuseki_upsert_hi.call_args_list], [3, 2])
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, uris, "test-org-id",
+                                      harvest_obj.source.id)
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_harvest_info_error_after_parse(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
+        """
+        Test if an error while writing the harvest info is returned in after_parsing().
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/%s" % index) for index in range(2)]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        mock_triplestore_is_available = Mock(name='triplestore-is-available')
+        mock_triplestore_is_available.return_value = True
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+        harvester.triplestore_client.is_available = mock_triplestore_is_available
+        mock_fuseki_upsert_hi.side_effect = SPARQLWrapperException('500 Internal server error!')
+
+        # run
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(len(error_msgs), 1)
+        mock_fuseki_upsert_data.assert_called_once_with(ANY)
+        mock_fuseki_upsert_hi.assert_called_once_with(ANY)
+        self.assertEqual(mock_shacl_validate.call_count, len(uris))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_multiple_datasets_after_parse_concurrent_validation(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
+        """
+        Test if the datasets are validated concurrently in after_parsing() and if an error while validating
+        one dataset does not affect the other datasets.
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/%s" % index) for index in range(7)]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvester.validation_workers = 2
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        harvester.triplestore_client.is_available = Mock(return_value=True)
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+
+        def validate(rdf_graph, uri, owner_org, contributor_id, rdf_format, content_hash=None):
+            if uri == uris[3]:
+                raise ValueError('validation failed')
+            return 'report-%s' % uri
+        mock_shacl_validate.side_effect = validate
+
+        # run
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(error_msgs, ['Unexpected error while validating dataset: validation failed'])
+        self.assertEqual(mock_shacl_validate.call_count, len(uris))
+        self.assertCountEqual(mock_fuseki_create_data_mqa.call_args_list,
+                              [call('report-%s' % uri, uri) for uri in uris if uri != uris[3]])
+        mock_fuseki_upsert_data.assert_called_once_with(ANY)
+        mock_fuseki_upsert_hi.assert_called_once_with(ANY)
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, uris, "test-org-id",
+                                      harvest_obj.source.id)
+
+    @patch('ckanext.dcatde.triplestore.sync_queue.TriplestoreSyncQueue.enqueue')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.select_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_multiple_datasets_after_parse_queue_mode(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_upsert_data, mock_select_datasets_ts,
+            mock_enqueue):
+        """
+        Test if the datasets are only added to the triplestore queue in after_parsing() in the sync mode
+        'queue'.
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvester.sync_mode = 'queue'
+        harvester.skip_unchanged_datasets = True
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        mock_triplestore_is_available = Mock(name='triplestore-is-available')
+        harvester.triplestore_client.is_available = mock_triplestore_is_available
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+
+        # run
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(len(error_msgs), 0)
+        mock_triplestore_is_available.assert_not_called()
+        mock_select_datasets_ts.assert_not_called()
+        mock_fuseki_upsert_data.assert_not_called()
+        mock_shacl_validate.assert_not_called()
+        mock_enqueue.assert_called_once_with(ANY)
+        items = mock_enqueue.call_args[0][0]
+        self.assertCountEqual([item['uri'] for item in items], [str(uri) for uri in uris])
+        for item in items:
+            self.assertEqual(item['owner_org'], "test-org-id")
+            self.assertEqual(item['harvest_source_id'], harvest_obj.source.id)
+            self.assertEqual(item['contributor_id'], 'http://dcat-ap.de/def/contributors/testId')
+            self.assertIn(item['uri'], item['rdf_graph'])
+            self.assertIsNotNone(item['content_hash'])
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    def test_update_queued_datasets_in_triplestore(
+            self, mock_shacl_validate, mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
+            mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
+        """
+        Test if the datasets of the triplestore queue are updated in the triple store.
+        """
+        # prepare
+        uri = URIRef("http://example.org/datasets/1")
+        deleted_uri = URIRef("http://example.org/datasets/2")
+        rdf_graph = '@prefix dcat: <http://www.w3.org/ns/dcat#> . <%s> a dcat:Dataset .' % uri
+        rows = [Mock(uri=str(uri), rdf_graph=rdf_graph, owner_org='test-org-id', contributor_id=None,
+                     harvest_source_id='test-source-id', content_hash='hash-1'),
+                Mock(uri=str(deleted_uri), rdf_graph=None, owner_org='test-org-id', contributor_id=None,
+                     harvest_source_id='test-source-id', content_hash=None)]
+        harvester = DCATdeRDFHarvester()
+        mock_shacl_validate.return_value = 'report'
+
+        # run
+        failed_uris, error_msgs = harvester.update_queued_datasets_in_triplestore(rows)
+
+        # check
+        self.assertEqual(len(failed_uris), 0)
+        self.assertEqual(len(error_msgs), 0)
+        mock_fuseki_upsert_data.assert_called_once_with([(uri, ANY), (deleted_uri, None)])
+        self.assertIn((uri, RDF.type, self.DCAT.Dataset), mock_fuseki_upsert_data.call_args[0][0][0][1])
+        mock_fuseki_delete_data_mqa.assert_called_once_with([uri, deleted_uri])
+        mock_shacl_validate.assert_called_once_with(rdf_graph, uri, 'test-org-id', None, 'text/turtle',
+                                                    content_hash='hash-1')
+        mock_fuseki_create_data_mqa.assert_called_once_with('report', uri)
+        mock_fuseki_upsert_hi.assert_called_once_with([(uri, ANY), (deleted_uri, None)])
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, [uri], 'test-org-id',
+                                      'test-source-id')
+
+    @patch('SPARQLWrapper.Wrapper.QueryResult.convert')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.select_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    def test_update_queued_datasets_in_triplestore_skip_unchanged(
+            self, mock_shacl_validate, mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
+            mock_fuseki_upsert_data, mock_fuseki_upsert_hi, mock_select_datasets_ts, mock_convert):
+        """
+        Test if the worker skips the queued datasets whose content hash matches the hash stored in the
+        harvest info.
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        rows = [Mock(uri=str(uri), rdf_graph='<%s> a <http://www.w3.org/ns/dcat#Dataset> .' % uri,
+                     owner_org='test-org-id', contributor_id=None, harvest_source_id='test-source-id',
+                     content_hash='hash-%s' % index) for index, uri in enumerate(uris)]
+        harvester = DCATdeRDFHarvester()
+        harvester.skip_unchanged_datasets = True
+        mock_select_datasets_ts.return_value = QueryResult(None)
+        mock_convert.return_value = {"results": {"bindings": [
+            {"s": {"value": str(uris[0])}, "hash": {"value": 'hash-0'}},
+            {"s": {"value": str(uris[1])}, "hash": {"value": 'outdated-hash'}}]}}
+        mock_shacl_validate.return_value = 'report'
+
+        # run
+        failed_uris, error_msgs = harvester.update_queued_datasets_in_triplestore(rows)
+
+        # check
+        self.assertEqual(len(failed_uris), 0)
+        self.assertEqual(len(error_msgs), 0)
+        mock_select_datasets_ts.assert_called_once_with(
+            GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_QUERY % {
+                'owner_org_or_source_id': 'test-source-id', 'uris': '<%s> <%s>' % tuple(uris)})
+        mock_fuseki_upsert_data.assert_called_once_with([(uris[1], ANY)])
+        mock_fuseki_upsert_hi.assert_called_once_with([(uris[1], ANY)])
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    def test_update_queued_datasets_in_triplestore_error(self, mock_shacl_validate, mock_fuseki_upsert_data,
+                                                         mock_fuseki_upsert_hi):
+        """
+        Test if the URIs of the queued datasets are returned as failed if the triple store is not available.
+        """
+        # prepare
+        uris = ["http://example.org/datasets/1", "http://example.org/datasets/2"]
+        rows = [Mock(uri=uri, rdf_graph=None, owner_org='test-org-id', contributor_id=None,
+                     harvest_source_id='test-source-id', content_hash=None) for uri in uris]
+        harvester = DCATdeRDFHarvester()
+        mock_fuseki_upsert_data.side_effect = SPARQLWrapperException('500 Internal server error!')
+
+        # run
+        failed_uris, error_msgs = harvester.update_queued_datasets_in_triplestore(rows)
+
+        # check
+        self.assertEqual(failed_uris, set(uris))
+        self.assertEqual(len(error_msgs), 1)
+        mock_fuseki_upsert_data.assert_called_once_with([(URIRef(uri), None) for uri in uris])
+        mock_fuseki_upsert_hi.assert_not_called()
+        mock_shacl_validate.assert_not_called()
+
+    @patch('SPARQLWrapper.Wrapper.QueryResult.convert')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.select_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_multiple_datasets_after_parse_skip_unchanged(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi,
+            mock_select_datatsets_ts, mock_convert):
+        """
+        Test if unchanged datasets are skipped in after_parsing() when the content hash matches the
+        hash stored in the harvest info.
+        """
+        # prepare
+        uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvester.skip_unchanged_datasets = True
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        harvester.triplestore_client.is_available = Mock(return_value=True)
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+        mock_select_datatsets_ts.return_value = QueryResult(None)
+        mock_convert.return_value = {"results": {"bindings": []}}
+
+        # first run stores the content hashes in the harvest info
+        harvester.after_parsing(rdf_parser, harvest_obj)
+
+        mock_select_datatsets_ts.assert_called_once_with(GET_CONTENT_HASHES_FROM_HARVEST_INFO_QUERY % {
+            'owner_org_or_source_id': harvest_obj.source.id})
+        hashes = {}
+        for uri, graph in mock_fuseki_upsert_hi.call_args[0][0]:
+            hashes[str(uri)] = str(graph.value(uri, GOVDATA_HARVEST_INFO.contentHash))
+        self.assertEqual(len(set(hashes.values())), len(uris))
+
+        # second run with the first dataset unchanged
+        mock_fuseki_upsert_data.reset_mock()
+        mock_fuseki_upsert_hi.reset_mock()
+        mock_convert.return_value = {"results": {"bindings": [
+            {"s": {"value": str(uris[0])}, "hash": {"value": hashes[str(uris[0])]}},
+            {"s": {"value": str(uris[1])}, "hash": {"value": "outdated-hash"}}]}}
+        harvest_obj.id = 'next-harvest-job'
+
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        self.assertEqual(len(error_msgs), 0)
+        mock_fuseki_upsert_data.assert_called_once_with([(uris[1], ANY)])
+        mock_fuseki_upsert_hi.assert_called_once_with([(uris[1], ANY)])
+
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.get_content_hash')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_after_parse_no_content_hash_by_default(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi,
+            mock_get_content_hash):
+        """
+        Test if the content hash is not computed if neither unchanged datasets are skipped nor the validation
+        cache is activated.
+        """
+        # prepare
+        uri = URIRef("http://example.org/datasets/1")
+        g = Graph()
+        g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        harvester.triplestore_client.is_available = Mock(return_value=True)
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+        mock_shacl_validate.return_value = 'report'
+
+        # run
+        harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        mock_get_content_hash.assert_not_called()
+        mock_shacl_validate.assert_called_once_with(ANY, uri, 'test-org-id', ANY, 'text/turtle',
+                                                    content_hash=None)
+        graph = mock_fuseki_upsert_hi.call_args[0][0][0][1]
+        self.assertIsNone(graph.value(uri, GOVDATA_HARVEST_INFO.contentHash))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
+    @patch('ckan.model.Package.get')
+    def test_harvesting_after_parse_no_content_hash_if_validation_failed(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
+        """
+        Test if the content hash is not stored if the validation report could not be saved, so that the
+        dataset is updated again in the next harvest run.
+        """
+        # prepare
+        uri = URIRef("http://example.org/datasets/1")
+        g = Graph()
+        g.add((uri, RDF.type, self.DCAT.Dataset))
+
+        rdf_parser = RDFParser()
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
+        harvester.skip_unchanged_datasets = True
+        harvester.shacl_validator_client.validator_url = 'http://validator'
+        harvester.shacl_validator_client.validator_profile = 'profile'
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        harvester.triplestore_client.is_available = Mock(return_value=True)
+        mock_model_get.return_value = Mock(owner_org="test-org-id")
+        mock_shacl_validate.return_value = None
+
+        # run
+        harvester.after_parsing(rdf_parser, harvest_obj)
+
+        # check
+        mock_fuseki_upsert_data.assert_called_once_with([(uri, ANY)])
+        mock_fuseki_create_data_mqa.assert_not_called()
+        graph = mock_fuseki_upsert_hi.call_args[0][0][0][1]
+        self.assertIsNone(graph.value(uri, GOVDATA_HARVEST_INFO.contentHash))
+        self.assertIn((uri, FOAF.knows, Literal(harvest_obj.source.id)), graph)
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_harvesting_multiple_datasets_invalid_uriref_after_parse(
             self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
-            mock_fuseki_delete_data_mqa, mock_fuseki_create_data, mock_fuseki_delete_data,
-            mock_fuseki_create_hi, mock_fuseki_delete_hi):
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
         Test multiple datasets in after_parsing() with some invalid URIs and check if only correctly parsed
         datasets are imported.
@@ -1024,98 +1477,95 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         self.assertEqual(rdf_parser_return, rdf_parser)
         # There should be two errors
         self.assertEqual(len(error_msgs), 2)
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # all datasets should be deleted
-        self.assertEqual(mock_fuseki_delete_data.call_count, len(uris))
-        # only datsets 3 and 4 should be imported
-        self.assertEqual(mock_fuseki_create_data.call_count, 2)
-        mock_fuseki_create_data.assert_any_call(ANY, uris[2])
-        mock_fuseki_create_data.assert_any_call(ANY, uris[3])
+        mock_triplestore_is_available.assert_called_once_with()
+        # all datasets should be replaced in one request, but only datsets 3 and 4 should be imported
+        mock_fuseki_upsert_data.assert_called_once_with(ANY)
+        datasets = dict(mock_fuseki_upsert_data.call_args[0][0])
+        self.assertCountEqual(list(datasets.keys()), uris)
+        self.assertIsNone(datasets[uris[0]])
+        self.assertIsNone(datasets[uris[1]])
+        self.assertIsNotNone(datasets[uris[2]])
+        self.assertIsNotNone(datasets[uris[3]])
         # check if shacle validator was called for datasets 3 and 4
         self.assertEqual(mock_shacl_validate.call_count, 2)
-        mock_shacl_validate.assert_any_call(ANY, uris[2], org_id, config['contributorID'])
-        mock_shacl_validate.assert_any_call(ANY, uris[3], org_id, config['contributorID'])
+        mock_shacl_validate.assert_any_call(ANY, uris[2], org_id, config['contributorID'], 'text/turtle',
+                                            content_hash=ANY)
+        mock_shacl_validate.assert_any_call(ANY, uris[3], org_id, config['contributorID'], 'text/turtle',
+                                            content_hash=ANY)
         # check if delete mqa storage called for all datasets
-        self.assertEqual(mock_fuseki_delete_data_mqa.call_count, len(uris))
-        for uri in uris:
-            mock_fuseki_delete_data_mqa.assert_any_call(uri)
+        mock_fuseki_delete_data_mqa.assert_called_once_with(ANY)
+        self.assertCountEqual(mock_fuseki_delete_data_mqa.call_args[0][0], uris)
         # check if MQA result storage is handled correctly for datsets 3 and 4
         self.assertEqual(mock_fuseki_create_data_mqa.call_count, 2)
         mock_fuseki_create_data_mqa.assert_any_call(mock_validate_result, uris[2])
         mock_fuseki_create_data_mqa.assert_any_call(mock_validate_result, uris[3])
-        # check if delete harvest_info was called.
-        self.assertEqual(mock_fuseki_delete_hi.call_count, len(uris))
-        for uri in uris:
-            mock_fuseki_delete_hi.assert_any_call(uri)
-        # check if create harvest_info was called.
-        self.assertEqual(mock_fuseki_create_hi.call_count, 2)
-        mock_fuseki_create_hi.assert_any_call(ANY, uris[2])
-        mock_fuseki_create_hi.assert_any_call(ANY, uris[3])
-        # check if create harvest_info was called with correct parameters
-        # the order of the graph is random, so we to check values individually
-        self._assert_rdf_harvest_info(mock_fuseki_create_hi.call_args_list, [uris[2], uris[3]], org_id,
+        # check if harvest_info was replaced for all datasets, but only created for datsets 3 and 4
+        mock_fuseki_upsert_hi.assert_called_once_with(ANY)
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, [uris[2], uris[3]], org_id,
                                       harvest_obj.source.id)
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
-    def test_harvesting_delete_error_msg_after_parse(
-            self, mock_shacl_validate, mock_fuseki_create_data_mqa, mock_fuseki_delete_data_mqa,
-            mock_fuseki_create_data, mock_fuseki_delete_data, mock_fuseki_create_hi, mock_fuseki_delete_hi):
+    @patch('ckan.model.Package.get')
+    def test_harvesting_multiple_datasets_bad_request_after_parse(
+            self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
-        Test SPARQLWrapper exception while deleting in method after_parsing().
+        Test if the datasets are updated one by one in after_parsing(), if the triplestore rejects the
+        request for the whole batch.
         """
         # prepare
-        harvester = DCATdeRDFHarvester()
-        maxrdf = self._get_max_rdf('metadata_max_only_valid_uris')
+        uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        g = Graph()
+        for uri in uris:
+            g.add((uri, RDF.type, self.DCAT.Dataset))
+
         rdf_parser = RDFParser()
-        rdf_parser.parse(maxrdf, 'application/rdf+xml')
+        rdf_parser.g = g
+        harvester = DCATdeRDFHarvester()
         harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
 
         mock_triplestore_is_available = Mock(name='triplestore-is-available')
         mock_triplestore_is_available.return_value = True
         harvester.triplestore_client.is_available = mock_triplestore_is_available
+        org_id = "test-org-id"
+        mock_model_get.return_value = Mock(owner_org=org_id)
 
-        mock_fuseki_delete_data.side_effect = SPARQLWrapperException('500 Internal server error!')
+        def _upsert(datasets):
+            if len(datasets) > 1 or datasets[0][0] == uris[0]:
+                raise QueryBadFormed('400 Bad Request!')
+        mock_fuseki_upsert_data.side_effect = _upsert
 
         # run
-        rdf_parser_return, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
+        _, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
 
-        # the parser should not have changed
-        self.assertEqual(rdf_parser_return, rdf_parser)
-        # check that one error is returned
+        # check that one error for the broken dataset is returned
         self.assertEqual(len(error_msgs), 1)
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # check if delete dataset was called. Testdata has only one dataset.
-        mock_fuseki_delete_data.assert_called_once_with(next(rdf_parser._datasets()))
-        # create dataset should not be called
-        mock_fuseki_create_data.assert_not_called()
-        mock_shacl_validate.assert_not_called()
-        mock_fuseki_delete_data_mqa.assert_not_called()
-        mock_fuseki_create_data_mqa.assert_not_called()
-        mock_fuseki_delete_hi.assert_not_called()
-        mock_fuseki_create_hi.assert_not_called()
-
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+        # one request for the batch and one for every dataset
+        self.assertEqual(mock_fuseki_upsert_data.call_count, 1 + len(uris))
+        mock_fuseki_upsert_data.assert_any_call([(uris[0], ANY)])
+        mock_fuseki_upsert_data.assert_any_call([(uris[1], ANY)])
+        # only the valid dataset is updated completely and validated
+        mock_fuseki_delete_data_mqa.assert_called_once_with([uris[1]])
+        mock_fuseki_upsert_hi.assert_called_once_with([(uris[1], ANY)])
+        mock_shacl_validate.assert_called_once_with(ANY, uris[1], org_id, ANY, 'text/turtle',
+                                                    content_hash=ANY)
+        mock_fuseki_create_data_mqa.assert_called_once_with(ANY, uris[1])
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
-    def test_harvesting_create_error_msg_after_parse(
+    def test_harvesting_update_error_msg_after_parse(
             self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
-            mock_fuseki_delete_data_mqa, mock_fuseki_create_data, mock_fuseki_delete_data,
-            mock_fuseki_create_hi, mock_fuseki_delete_hi):
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
-        Test SPARQLWrapper exception while creating in method after_parsing().
+        Test SPARQLWrapper exception while updating in method after_parsing().
         """
         # prepare
         harvester = DCATdeRDFHarvester()
@@ -1128,7 +1578,7 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         mock_triplestore_is_available.return_value = True
         harvester.triplestore_client.is_available = mock_triplestore_is_available
 
-        mock_fuseki_create_data.side_effect = SPARQLWrapperException('500 Internal server error!')
+        mock_fuseki_upsert_data.side_effect = SPARQLWrapperException('500 Internal server error!')
 
         # run
         rdf_parser_return, error_msgs = harvester.after_parsing(rdf_parser, harvest_obj)
@@ -1138,31 +1588,23 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         self.assertEqual(rdf_parser_return, rdf_parser)
         # check that one error is returned
         self.assertEqual(len(error_msgs), 1)
-        uri = next(rdf_parser._datasets())
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # check if delete dataset was called. Testdata has only one dataset.
-        mock_fuseki_delete_data.assert_called_once_with(uri)
-        # check if create dataset was called
-        mock_fuseki_create_data.assert_called_once_with(ANY, uri)
+        mock_triplestore_is_available.assert_called_once_with()
+        # check if update dataset was called. Testdata has only one dataset.
+        mock_fuseki_upsert_data.assert_called_once_with([(next(rdf_parser._datasets()), ANY)])
         mock_shacl_validate.assert_not_called()
-        mock_fuseki_delete_data_mqa.assert_called_once_with(uri)
+        mock_fuseki_delete_data_mqa.assert_not_called()
         mock_fuseki_create_data_mqa.assert_not_called()
-        mock_fuseki_delete_hi.assert_called_once_with(uri)
-        mock_fuseki_create_hi.assert_not_called()
+        mock_fuseki_upsert_hi.assert_not_called()
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore_harvest_info')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.upsert_datasets_in_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets_in_triplestore_mqa')
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.create_dataset_in_triplestore_mqa')
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator.validate')
     @patch('ckan.model.Package.get')
     def test_check_if_datasets_skipped_when_resource_required(
             self, mock_model_get, mock_shacl_validate, mock_fuseki_create_data_mqa,
-            mock_fuseki_delete_data_mqa, mock_fuseki_create_data, mock_fuseki_delete_data,
-            mock_fuseki_create_hi, mock_fuseki_delete_hi):
+            mock_fuseki_delete_data_mqa, mock_fuseki_upsert_data, mock_fuseki_upsert_hi):
         """
         Test datasets in after_parsing() with and without distributions when required_resource is true.
         """
@@ -1201,31 +1643,24 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         self.assertEqual(rdf_parser_return, rdf_parser)
         # There should be zero errors
         self.assertEqual(len(error_msgs), 0)
-        # at the beginning of after_parsing and delete from triplestore for every dataset
-        mock_triplestore_is_available.assert_has_calls([call(), call()])
-        # all datasets should be deleted
-        self.assertEqual(mock_fuseki_delete_data.call_count, len(uris))
-        mock_fuseki_delete_data.assert_any_call(uris[0])
-        mock_fuseki_delete_data.assert_any_call(uris[1])
-        # only datset 1 should be imported
-        mock_fuseki_create_data.assert_called_once_with(ANY, uris[0])
+        mock_triplestore_is_available.assert_called_once_with()
+        # all datasets should be deleted, but only datset 0 should be imported
+        mock_fuseki_upsert_data.assert_called_once_with(ANY)
+        datasets = dict(mock_fuseki_upsert_data.call_args[0][0])
+        self.assertCountEqual(list(datasets.keys()), uris)
+        self.assertIsNotNone(datasets[uris[0]])
+        self.assertIsNone(datasets[uris[1]])
         # check if shacle validator was called for dataset 0
-        mock_shacl_validate.assert_called_once_with(ANY, uris[0], org_id, config['contributorID'])
+        mock_shacl_validate.assert_called_once_with(ANY, uris[0], org_id, config['contributorID'],
+                                                    'text/turtle', content_hash=ANY)
         # check if delete mqa storage called for all datasets
-        self.assertEqual(mock_fuseki_delete_data_mqa.call_count, len(uris))
-        mock_fuseki_delete_data_mqa.assert_any_call(uris[0])
-        mock_fuseki_delete_data_mqa.assert_any_call(uris[1])
+        mock_fuseki_delete_data_mqa.assert_called_once_with(ANY)
+        self.assertCountEqual(mock_fuseki_delete_data_mqa.call_args[0][0], uris)
         # check if MQA result storage is handled correctly for datsets 0
         mock_fuseki_create_data_mqa.assert_called_once_with(mock_validate_result, uris[0])
-        # check if delete harvest_info was called.
-        self.assertEqual(mock_fuseki_delete_hi.call_count, len(uris))
-        mock_fuseki_delete_hi.assert_any_call(uris[0])
-        mock_fuseki_delete_hi.assert_any_call(uris[1])
-        # check if create harvest_info was called.
-        mock_fuseki_create_hi.assert_called_once_with(ANY, uris[0])
-        # check if create harvest_info was called with correct parameters
-        # the order of the graph is random, so we to check values individually
-        self._assert_rdf_harvest_info(mock_fuseki_create_hi.call_args_list, [uris[0]],
+        # check if harvest_info was replaced for all datasets, but only created for datset 0
+        mock_fuseki_upsert_hi.assert_called_once_with(ANY)
+        self._assert_rdf_harvest_info(mock_fuseki_upsert_hi.call_args_list, [uris[0]],
                                       org_id, harvest_obj.source.id)
 
     @patch('ckanext.harvest.harvesters.base.HarvesterBase._get_user_name')
@@ -1379,13 +1814,11 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         mock_fuseki_delete_data_mqa.assert_not_called()
         mock_fuseki_delete_hi.assert_not_called()
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._get_existing_dataset_uris_from_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._iter_existing_dataset_uris_from_triplestore')
     @patch('ckan.model.Package.get')
     def test_delete_deprecated_datasets_from_triplestore(self, mock_package_get, mock_get_uris,
-                                                         mock_triplestore_delete_ds, mock_triplestore_delete_mqa, mock_triplestore_delete_hi):
+                                                         mock_triplestore_delete_datasets):
         """ Check if the functions to delete an URI in all triplestore datastores are called properly """
 
         uris_db_marked_as_deleted = ["URI-3"]
@@ -1408,17 +1841,13 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         mock_triplestore_is_available.assert_called_once_with()
         mock_package_get.assert_called_once_with(harvest_obj.source.id)
         mock_get_uris.assert_called_once_with(harvest_obj.source.id)
-        mock_triplestore_delete_ds.assert_called_once_with(existing_uris[0])
-        mock_triplestore_delete_mqa.assert_called_once_with(existing_uris[0])
-        mock_triplestore_delete_hi.assert_called_once_with(existing_uris[0])
+        mock_triplestore_delete_datasets.assert_called_once_with([existing_uris[0]])
 
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_harvest_info')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore_mqa')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_dataset_in_triplestore')
-    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._get_existing_dataset_uris_from_triplestore')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.delete_datasets')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._iter_existing_dataset_uris_from_triplestore')
     @patch('ckan.model.Package.get')
     def test_delete_deprecated_datasets_from_triplestore_no_source(self, mock_package_get, mock_get_uris,
-                                                                   mock_triplestore_delete_ds, mock_triplestore_delete_mqa, mock_triplestore_delete_hi):
+                                                                   mock_triplestore_delete_datasets):
         """
         Test behaviour if owner org is not found: Deletes dataset from all triple stores as with owner org,
         because owner org is only used for logging
@@ -1443,65 +1872,119 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         mock_triplestore_is_available.assert_called_once_with()
         mock_package_get.assert_called_once_with(harvest_obj.source.id)
         mock_get_uris.assert_called_once_with(harvest_obj.source.id)
-        mock_triplestore_delete_ds.assert_called_once_with(existing_uris[0])
-        mock_triplestore_delete_mqa.assert_called_once_with(existing_uris[0])
-        mock_triplestore_delete_hi.assert_called_once_with(existing_uris[0])
+        mock_triplestore_delete_datasets.assert_called_once_with([existing_uris[0]])
 
-    @patch('SPARQLWrapper.Wrapper.QueryResult.convert')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.select_datasets_in_triplestore_harvest_info')
-    def test_get_existing_dataset_uris_from_triplestore(self, mock_select_datatsets_ts, mock_convert):
-        """ Test if select-request to triplestore is send properly and response is returned correctly """
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.iter_dataset_uris_in_triplestore_harvest_info')
+    def test_iter_existing_dataset_uris_from_triplestore(self, mock_iter_uris_ts):
+        """ Test if the URIs are requested from the triplestore and yielded correctly """
 
         test_owner_org = "org-1"
         expected_result = ["URI-1", "URI-2"]
-        raw_result = {"results": {"bindings": [{"s": {"value": expected_result[0]}}, {"s": {"value": expected_result[1]}}]}}
-
-        mock_select_datatsets_ts.return_value = QueryResult(None)
-        mock_convert.return_value = raw_result
+        mock_iter_uris_ts.return_value = iter(expected_result)
 
         harvester = DCATdeRDFHarvester()
-        result = harvester._get_existing_dataset_uris_from_triplestore(test_owner_org)
+        result = list(harvester._iter_existing_dataset_uris_from_triplestore(test_owner_org))
 
-        mock_select_datatsets_ts.assert_called_once_with(GET_URIS_FROM_HARVEST_INFO_QUERY % {
-            'owner_org_or_source_id': test_owner_org})
+        mock_iter_uris_ts.assert_called_once_with(test_owner_org)
         self.assertEqual(result, expected_result)
 
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.iter_dataset_uris_in_triplestore_harvest_info')
+    def test_iter_existing_dataset_uris_from_triplestore_error(self, mock_iter_uris_ts):
+        """ Test if the iteration stops after the URIs received before an error """
+
+        def _iter_uris(_):
+            yield "URI-1"
+            raise SPARQLWrapperException('500 Internal server error!')
+
+        mock_iter_uris_ts.side_effect = _iter_uris
+
+        harvester = DCATdeRDFHarvester()
+        result = list(harvester._iter_existing_dataset_uris_from_triplestore("org-1"))
+
+        self.assertEqual(result, ["URI-1"])
+
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.make_uuid')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.HarvestObjectExtra')
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.HarvestObject')
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._delete_deprecated_datasets_from_triplestore')
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.model')
     def test_mark_datasets_for_deletion_dataset_to_delete(self, mock_model, mock_delete_deprecated_datasets,
-                                                          mock_harvest_object):
+                                                          mock_harvest_object, mock_harvest_object_extra,
+                                                          mock_make_uuid):
         """ Check if the functions to delete deprecated datasets is called properly """
 
         packages_in_db = [('id-3', "URI-3"), ('id-4', "URI-4"), ('id-5', "URI-5")]
         uris_db_marked_as_deleted = [guid for package_id, guid in packages_in_db[1:]]
-        # Mocking attribute 'id' with side_effect doesn't work. Possibly because the attribute 'id' isn't
-        # declared for the HarvestObject class
-        # harvest_obj_property_mock = PropertyMock(side_effect=uris_db_marked_as_deleted)
-        # type(mock_harvest_object).id = harvest_obj_property_mock
-        harvest_object_id = 'obj.id'
-        mock_harvest_object.return_value.id = harvest_object_id
+        mock_make_uuid.side_effect = ['obj-1', 'extra-1', 'obj-2', 'extra-2']
         harvested_uris = ["URI-1", "URI-2", "URI-3"]
         mock_query_result = Mock(name='query-result')
-        mock_query_result.join().outerjoin().filter().filter().filter().filter.return_value = packages_in_db
+        mock_query_result.join().outerjoin().filter().filter().filter().filter().yield_per.return_value = \
+            packages_in_db
         mock_query = Mock(name='query')
         mock_update_harvest_obj = Mock(name='update-harvest-obj')
-        mock_query.side_effect = [Mock(name='subquery'), mock_query_result, mock_update_harvest_obj,
-                                  mock_update_harvest_obj]
+        mock_query.side_effect = [Mock(name='subquery'), mock_query_result, mock_update_harvest_obj]
         mock_model.Session.query = mock_query
         harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
 
         harvester = DCATdeRDFHarvester()
         object_ids = harvester._mark_datasets_for_deletion(harvested_uris, harvest_obj)
 
-        # the values should be compared, but the side_effect isn't working
-        self.assertEqual(object_ids, [harvest_object_id for x in uris_db_marked_as_deleted])
-        self.assertEqual(mock_harvest_object.call_count, len(uris_db_marked_as_deleted))
-        # subquery, query, 2 x update harvest_obj
-        self.assertEqual(mock_query.call_count, 4)
+        self.assertEqual(object_ids, ['obj-1', 'obj-2'])
+        # subquery, query, 1 x update harvest_obj for all GUIDs
+        self.assertEqual(mock_query.call_count, 3)
+        mock_update_harvest_obj.filter.return_value.update.assert_called_once_with({'current': False}, False)
+        self.assertEqual(mock_model.Session.bulk_insert_mappings.call_count, 2)
+        objects_call, extras_call = mock_model.Session.bulk_insert_mappings.call_args_list
+        self.assertEqual(objects_call[0][0], mock_harvest_object)
+        self.assertEqual(sorted(obj['guid'] for obj in objects_call[0][1]), uris_db_marked_as_deleted)
+        for obj in objects_call[0][1]:
+            self.assertEqual(obj['package_id'], 'id-4' if obj['guid'] == 'URI-4' else 'id-5')
+            self.assertEqual(obj['harvest_job_id'], harvest_obj.id)
+            self.assertEqual(obj['harvest_source_id'], harvest_obj.source.id)
+        self.assertEqual(extras_call[0][0], mock_harvest_object_extra)
+        self.assertEqual(extras_call[0][1], [
+            {'id': 'extra-1', 'harvest_object_id': 'obj-1', 'key': 'status', 'value': 'delete'},
+            {'id': 'extra-2', 'harvest_object_id': 'obj-2', 'key': 'status', 'value': 'delete'}])
+        mock_model.Session.commit.assert_called_once_with()
+        mock_harvest_object.assert_not_called()
         mock_delete_deprecated_datasets.assert_called_once_with(
             set(harvested_uris), set(uris_db_marked_as_deleted), harvest_obj)
 
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DELETION_CHUNK_SIZE', 2)
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.HarvestObjectExtra')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.HarvestObject')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.model')
+    def test_create_deletion_harvest_objects_chunked(self, mock_model, mock_harvest_object,
+                                                     mock_harvest_object_extra):
+        """ Check if the deletion harvest objects are written in chunks and committed once """
+
+        guid_to_package_id = {'URI-%s' % i: 'id-%s' % i for i in range(5)}
+        harvest_job = TestDCATdeRDFHarvester._get_harvest_obj_dummy('testportal', 'test-status')
+
+        object_ids = DCATdeRDFHarvester._create_deletion_harvest_objects(
+            sorted(guid_to_package_id), guid_to_package_id, harvest_job)
+
+        self.assertEqual(len(object_ids), 5)
+        self.assertEqual(len(set(object_ids)), 5)
+        # 3 chunks with 2, 2 and 1 GUIDs
+        self.assertEqual(mock_model.Session.query.call_count, 3)
+        self.assertEqual(mock_model.Session.bulk_insert_mappings.call_count, 6)
+        inserted_ids = [obj['id'] for args, _ in mock_model.Session.bulk_insert_mappings.call_args_list
+                        if args[0] == mock_harvest_object for obj in args[1]]
+        self.assertEqual(inserted_ids, object_ids)
+        mock_model.Session.commit.assert_called_once_with()
+
+    def test_compact_package_id(self):
+        """ Check if UUIDs are stored as integers and restored unchanged """
+        package_id = 'a1b2c3d4-0000-4000-8000-00000000abcd'
+        compact_id = _compact_package_id(package_id)
+        self.assertIsInstance(compact_id, int)
+        self.assertEqual(_expand_package_id(compact_id), package_id)
+        # IDs which are no UUIDs in canonical form are not changed
+        for package_id in ['id-4', package_id.upper(), package_id.replace('-', '')]:
+            self.assertEqual(_compact_package_id(package_id), package_id)
+            self.assertEqual(_expand_package_id(package_id), package_id)
+
     @patch('ckanext.dcat.harvesters.DCATRDFHarvester._mark_datasets_for_deletion')
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.HarvestObject')
     @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._delete_deprecated_datasets_from_triplestore')
@@ -1531,4 +2014,173 @@ class TestDCATdeRDFHarvester(unittest.TestCase):
         self.assertEqual(mock_query.call_count, 1)
         mock_super_mark_datasets_for_deletion.assert_called_once_with(harvested_uris, harvest_obj)
         mock_delete_deprecated_datasets.assert_called_once_with(
-            set(harvested_uris), uris_db_marked_as_deleted, harvest_obj)
\ No newline at end of file
+            set(harvested_uris), uris_db_marked_as_deleted, harvest_obj)
+
+    @helpers.change_config('ckanext.dcatde.harvest.batch_delete', 'true')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.BatchDeletionExecutor')
+    @patch('ckanext.dcat.harvesters.DCATRDFHarvester._mark_datasets_for_deletion')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.HarvestObject')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._delete_deprecated_datasets_from_triplestore')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.model')
+    def test_mark_datasets_for_deletion_batch_delete(self, mock_model, mock_delete_deprecated_datasets,
+                                                     mock_harvest_object,
+                                                     mock_super_mark_datasets_for_deletion,
+                                                     mock_batch_deletion_executor):
+        """ Check if the datasets are deleted in one batch and only the remaining objects are returned """
+
+        mock_super_mark_datasets_for_deletion.return_value = ['obj-1', 'obj-2']
+        mock_model.Session.query.return_value.filter.return_value = [('URI-4', 'id-4'), ('URI-5', 'id-5')]
+        mock_batch_deletion_executor.return_value.execute.return_value = ['obj-2']
+        harvest_obj = TestDCATdeRDFHarvester._get_harvest_obj_dummy(None, 'test-status')
+
+        harvester = DCATdeRDFHarvester()
+        result = harvester._mark_datasets_for_deletion(["URI-1"], harvest_obj)
+
+        self.assertEqual(result, ['obj-2'])
+        mock_batch_deletion_executor.assert_called_once_with(harvester.triplestore_client)
+        mock_batch_deletion_executor.return_value.execute.assert_called_once_with(['obj-1', 'obj-2'])
+
+    @staticmethod
+    def _get_paged_catalog(dataset_number, next_page=None):
+        rdf = '''@prefix dcat: <http://www.w3.org/ns/dcat#> .
+            @prefix dct: <http://purl.org/dc/terms/> .
+            @prefix hydra: <http://www.w3.org/ns/hydra/core#> .
+            <http://example.org/datasets/{0}> a dcat:Dataset ; dct:title "Dataset {0}" .
+            '''.format(dataset_number)
+        if next_page:
+            rdf += '''<http://example.org/catalog> a hydra:PagedCollection ; hydra:next "{0}" .
+            '''.format(next_page)
+        return rdf
+
+    @helpers.change_config('ckanext.dcatde.harvest.streaming', 'true')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._mark_datasets_for_deletion')
+    @patch('ckanext.dcat.harvesters.rdf.DCATRDFHarvester._get_content_and_type')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.DCATdeRDFHarvester._gen_new_name')
+    @patch('ckanext.dcat.harvesters.rdf.HarvestObject')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
+    @patch('ckanext.dcatde.harvesters.dcatde_rdf.p.PluginImplementations')
+    @patch('ckan.model.Package.get')
+    def test_gather_stage_streaming(self, mock_model_get, mock_plugin_implementations,
+                                    mock_triplestore_is_available, mock_harvest_object, mock_gen_new_name,
+                                    mock_get_content_and_type, mock_mark_datasets_for_deletion):
+        """
+        Tests if all pages of a paged harvest source are gathered in the streaming mode and the next page is
+        prefetched while the current page is processed.
+        """
+        # prepare
+        harvester = DCATdeRDFHarvester()
+        harvest_job = Mock(source=Mock(config=None, url='http://example.org/catalog', id='test-source-id'))
+        mock_model_get.return_value = Mock(owner_org='test-org-id', url='http://example.org/catalog')
+        mock_plugin_implementations.return_value = [harvester]
+        mock_triplestore_is_available.return_value = False
+        mock_gen_new_name.side_effect = lambda title: title.lower().replace(' ', '-')
+        mock_get_content_and_type.side_effect = [
+            (self._get_paged_catalog(1, 'http://example.org/catalog?page=2'), 'turtle'),
+            (self._get_paged_catalog(2), 'turtle')]
+        mock_harvest_object.return_value.id = 'object-id'
+        mock_mark_datasets_for_deletion.return_value = ['deleted-object-id']
+
+        # run
+        with patch.object(harvester, '_download_page', wraps=harvester._download_page) as mock_download_page:
+            object_ids = harvester.gather_stage(harvest_job)
+
+        # check
+        self.assertEqual(object_ids, ['object-id', 'object-id', 'deleted-object-id'])
+        mock_download_page.assert_called_once_with('http://example.org/catalog?page=2', harvest_job, 'turtle')
+        self.assertIsNone(harvester._prefetch_executor)
+        mock_get_content_and_type.assert_has_calls([
+            call('http://example.org/catalog', harvest_job, 1, content_type=None),
+            call('http://example.org/catalog?page=2', harvest_job, 1, content_type='turtle')])
+        self.assertEqual([kwargs['guid'] for _, kwargs in mock_harvest_object.call_args_list],
+                         ['http://example.org/datasets/1', 'http://example.org/datasets/2'])
+        mock_mark_datasets_for_deletion.assert_called_once_with(
+            ['http://example.org/datasets/1', 'http://example.org/datasets/2'], harvest_job)
+
+    @patch('ckanext.dcatde.validation.shacl_validation.LocalShaclEngine.from_config')
+    @helpers.change_config('ckanext.dcatde.shacl_validator.engine', 'local')
+    @helpers.change_config('ckanext.dcatde.shacl_validator.max_workers', '2')
+    def test_validation_workers_local_engine(self, mock_local_engine_from_config):
+        """ Tests if at least as many validation workers as local SHACL validation workers are used """
+        mock_local_engine_from_config.return_value = Mock(workers=4)
+        self.assertEqual(DCATdeRDFHarvester().validation_workers, 4)
+
+        mock_local_engine_from_config.return_value = Mock(workers=1)
+        self.assertEqual(DCATdeRDFHarvester().validation_workers, 2)
+
+    @patch('ckanext.dcat.harvesters.DCATRDFHarvester.gather_stage')
+    def test_gather_stage_not_streaming(self, mock_super_gather_stage):
+        """ Tests if the gather stage of the superclass is used if the streaming mode is not activated """
+        harvester = DCATdeRDFHarvester()
+        harvest_job = Mock()
+
+        result = harvester.gather_stage(harvest_job)
+
+        self.assertEqual(result, mock_super_gather_stage.return_value)
+        mock_super_gather_stage.assert_called_once_with(harvest_job)
+
+    @patch('ckanext.dcat.harvesters.DCATRDFHarvester.gather_stage')
+    def test_gather_stage_shuts_down_validation_executor(self, mock_super_gather_stage):
+        """ Tests if the validation threads are shut down at the end of the gather stage """
+        harvester = DCATdeRDFHarvester()
+        harvester.validation_workers = 2
+        executors = []
+
+        def gather_stage(harvest_job):
+            executors.append(harvester._get_validation_executor())
+            executors[0].submit(lambda: None).result()
+            raise ValueError('gather error')
+        mock_super_gather_stage.side_effect = gather_stage
+
+        with self.assertRaises(ValueError):
+            harvester.gather_stage(Mock())
+
+        self.assertIsNone(harvester._validation_executor)
+        # an executor which was shut down doesn't accept new tasks
+        with self.assertRaises(RuntimeError):
+            executors[0].submit(lambda: None)
+
+    @patch('ckanext.dcat.harvesters.DCATRDFHarvester._save_gather_error')
+    @patch('ckanext.dcat.harvesters.rdf.DCATRDFHarvester._get_content_and_type')
+    def test_download_page_collects_errors(self, mock_get_content_and_type, mock_super_save_gather_error):
+        """ Tests if the gather errors of a page download are returned with the page """
+        harvester = DCATdeRDFHarvester()
+        harvest_job = Mock()
+
+        def get_content_and_type(url, job, page, content_type=None):
+            harvester._save_gather_error('Could not get content', job)
+            return None, None
+        mock_get_content_and_type.side_effect = get_content_and_type
+
+        page = harvester._download_page('http://example.org/catalog', harvest_job, None)
+
+        self.assertEqual(page.errors, ['Could not get content'])
+        self.assertIsNone(page.content)
+        mock_super_save_gather_error.assert_not_called()
+        harvester._save_gather_error('Other error', harvest_job)
+        mock_super_save_gather_error.assert_called_once_with('Other error', harvest_job)
+
+    @patch('ckanext.dcat.harvesters.rdf.DCATRDFHarvester._get_content_and_type')
+    def test_get_content_and_type_prefetched_page_other_url(self, mock_get_content_and_type):
+        """ Tests if a prefetched page is discarded if another URL is requested """
+        harvester = DCATdeRDFHarvester()
+        harvest_job = Mock()
+        prefetched_future = Mock()
+        harvester._prefetched_page = ('http://example.org/catalog?page=2', prefetched_future)
+        mock_get_content_and_type.return_value = ('content', 'turtle')
+
+        result = harvester._get_content_and_type('http://example.org/catalog?page=2&key=1', harvest_job, 1,
+                                                 content_type='turtle')
+
+        self.assertEqual(result, ('content', 'turtle'))
+        mock_get_content_and_type.assert_called_once_with('http://example.org/catalog?page=2&key=1',
+                                                          harvest_job, 1, content_type='turtle')
+        prefetched_future.result.assert_not_called()
+        self.assertIsNone(harvester._prefetched_page)
+
+    @helpers.change_config('ckanext.dcatde.harvest.streaming.memory_budget_mb', '1')
+    def test_is_prefetch_in_memory_budget(self):
+        """ Tests if the next page is only prefetched if the estimated memory usage is within the budget """
+        harvester = DCATdeRDFHarvester()
+
+        self.assertTrue(harvester._is_prefetch_in_memory_budget(50 * 1024, 1))
+        self.assertFalse(harvester._is_prefetch_in_memory_budget(100 * 1024, 1))
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import json
+import unittest
+
+from ckantoolkit.tests import helpers
+from mock import Mock, patch
+from ckanext.dcatde.harvesters.harvest_source_config import DEFAULT_LICENSE, DEFAULT_PRIORITY, \
+    get_harvest_source_config, parse_harvest_source_config
+
+
+class TestHarvestSourceConfig(unittest.TestCase):
+    """
+    Test class for the parsed harvest source configuration
+    """
+
+    def test_parse_empty_config(self):
+        """ Tests the default values if the harvest source has no configuration """
+        config = parse_harvest_source_config('')
+
+        self.assertIsNone(config.harvested_portal)
+        self.assertFalse(config.resources_required)
+        self.assertIsNone(config.contributor_id)
+        self.assertEqual(config.priority, DEFAULT_PRIORITY)
+        self.assertIsNone(config.rdf_format)
+        self.assertEqual(config.fallback_license, DEFAULT_LICENSE)
+
+    @helpers.change_config('ckanext.dcatde.harvest.default_license', 'test-license')
+    def test_parse_config(self):
+        """ Tests if all values are read from the configuration """
+        config = parse_harvest_source_config(json.dumps({
+            'harvested_portal': 'testportal', 'resources_required': True,
+            'contributorID': 'http://dcat-ap.de/def/contributors/testId', 'priority': '10',
+            'rdf_format': 'text/turtle'}))
+
+        self.assertEqual(config.harvested_portal, 'testportal')
+        self.assertTrue(config.resources_required)
+        self.assertEqual(config.contributor_id, 'http://dcat-ap.de/def/contributors/testId')
+        self.assertEqual(config.priority, 10)
+        self.assertEqual(config.rdf_format, 'text/turtle')
+        self.assertEqual(config.fallback_license, 'test-license')
+
+    def test_parse_invalid_priority(self):
+        """ Tests if the default priority is used for an invalid priority """
+        self.assertEqual(parse_harvest_source_config('{"priority": "invalid10"}').priority, DEFAULT_PRIORITY)
+
+    @patch('ckanext.dcatde.harvesters.harvest_source_config.parse_harvest_source_config',
+           wraps=parse_harvest_source_config)
+    def test_get_harvest_source_config_cached(self, mock_parse):
+        """ Tests if the configuration is parsed once per source and configuration value """
+        source = Mock(id='cached-source', config='{"harvested_portal": "portal-1"}')
+
+        self.assertEqual(get_harvest_source_config(source).harvested_portal, 'portal-1')
+        self.assertEqual(get_harvest_source_config(source).harvested_portal, 'portal-1')
+        self.assertEqual(mock_parse.call_count, 1)
+
+        source.config = '{"harvested_portal": "portal-2"}'
+        self.assertEqual(get_harvest_source_config(source).harvested_portal, 'portal-2')
+        self.assertEqual(mock_parse.call_count, 2)
@@ -1,7 +1,9 @@
 #!/usr/bin/python
 # -*- coding: utf8 -*-
+import datetime
 import json
 import unittest
+from collections import namedtuple
 
 from ckanext.dcatde.harvesters.harvest_utils import HarvestUtils, model
 from ckanext.harvest.model import HarvestObject
@@ -32,45 +34,6 @@ class TestHarvestUtils(unittest.TestCase):
         new_name = HarvestUtils.create_new_name_for_deletion(test_name)
         self.assertNotEqual(test_name, new_name, "Dataset name not changed")
 
-    @patch('ckan.plugins.toolkit.get_action')
-    def test_rename_datasets_before_delete(self, mock_get_action):
-        # prepare
-        package1 = {
-            'id': 'abc',
-            'name': 'one'
-        }
-        package2 = {
-            'id': 'efg',
-            'name': 'two'
-        }
-
-        mock_action_methods = Mock("action-methods")
-        # 3) get_action('package_update')(context, package)
-        mock_get_action.return_value = mock_action_methods
-
-        deprecated_package_dicts = [package1, package2]
-
-        oldnames = []
-        for pkg in deprecated_package_dicts:
-            oldnames.append(pkg['name'])
-
-        # execute
-        HarvestUtils.rename_datasets_before_delete(deprecated_package_dicts)
-
-        # verify
-        self.assertEqual(mock_get_action.call_count, 1)
-        mock_get_action.assert_any_call("package_update")
-        self.assertEqual(mock_action_methods.call_count, len(deprecated_package_dicts))
-
-        expected_action_calls = []
-        for pkg in deprecated_package_dicts:
-            self.assertTrue(pkg['name'] not in oldnames,
-                            "Expected dataset " + pkg['id'] + " to be renamed, but wasn't.")
-
-            expected_action_calls.append(call(TestHarvestUtils._mock_api_context(), pkg))
-
-        mock_action_methods.assert_has_calls(expected_action_calls, any_order=True)
-
     @patch('ckan.plugins.toolkit.get_action')
     def test_delete_packages(self, mock_get_action):
         # prepare
@@ -102,9 +65,10 @@ class TestHarvestUtils(unittest.TestCase):
     @patch('ckan.plugins.toolkit.get_action')
     def test_rename_delete_dataset_with_id(self, mock_get_action, mock_model, mock_harvest_object):
         mock_action_methods = Mock("action-methods")
-        # always return a pseudo-package from API methods
-        mock_action_methods.return_value = {'id': 'test', 'name': 'package'}
         mock_get_action.return_value = mock_action_methods
+        mock_package = Mock(name='package')
+        mock_package.name = 'package'
+        mock_model.Package.get.return_value = mock_package
 
         mock_query = Mock(name='query')
         mock_update_harvest_obj = Mock(name='update-harvest-obj')
@@ -113,46 +77,30 @@ class TestHarvestUtils(unittest.TestCase):
 
         HarvestUtils.rename_delete_dataset_with_id('test')
 
-        # check if the expected API calls were made (show to get the package name)
-        self.assertEqual(mock_get_action.call_count, 3)
-        mock_get_action.assert_any_call("package_show")
-        mock_get_action.assert_any_call("package_update")
-        mock_get_action.assert_any_call("package_delete")
-
-        self.assertEqual(mock_action_methods.call_count, 3)
-        expected_action_calls = []
-        # call with ID only (show)
-        expected_action_calls.append(
-            call(TestHarvestUtils._mock_api_context(),
-                 {'id': 'test'}))
-        # one call with a name (update)
-        expected_action_calls.append(
-            call(TestHarvestUtils._mock_api_context(),
-                 {'id': 'test', 'name': ANY}))
-        # and only ID again (delete)
-        expected_action_calls.append(expected_action_calls[0])
-        mock_action_methods.assert_has_calls(expected_action_calls)
+        # the package is renamed in the model, only the delete action is called
+        mock_model.Package.get.assert_called_once_with('test')
+        self.assertNotEqual(mock_package.name, 'package', "Name was not updated")
+        self.assertTrue(mock_package.name.startswith('package-deleted'))
+        self.assertIsInstance(mock_package.metadata_modified, datetime.datetime)
+        mock_get_action.assert_called_once_with("package_delete")
+        mock_action_methods.assert_called_once_with(TestHarvestUtils._mock_api_context(), {'id': 'test'})
 
         # Check if the function to update harvest objects (current=false) is called properly before delete
         self.assertEqual(mock_query.call_count, 1)
-
-        # finally check if the name passed to the update call was different
-        self.assertTrue(
-            call(TestHarvestUtils._mock_api_context(),
-                 {'id': 'test', 'name': 'package'}) not in mock_action_methods.call_args_list,
-            "Name was not updated")
+        mock_model.Session.rollback.assert_not_called()
 
     @patch('ckanext.dcatde.harvesters.harvest_utils.HarvestObject')
     @patch('ckanext.dcatde.harvesters.harvest_utils.model')
     @patch('ckan.plugins.toolkit.get_action')
-    def test_rename_delete_dataset_with_id_if_name_updated(self, mock_get_action, mock_model, mock_harvest_object):
-        '''Tests if dataset with id deleted if name was not updated'''
+    def test_rename_delete_dataset_with_id_delete_failed(self, mock_get_action, mock_model,
+                                                          mock_harvest_object):
+        '''Tests if the rename is discarded if the dataset couldn't be deleted'''
         mock_action_methods = Mock("action-methods")
-        # always return a pseudo-package from API methods
-        #mock_action_methods.return_value = {'id': 'test', 'name': 'Package'}
-        mock_action_methods.side_effect = [{'id': 'test', 'name': 'Package'},
-            Exception('Update action failed'),{'id': 'test', 'name': 'Package'}]
+        mock_action_methods.side_effect = Exception('Delete action failed')
         mock_get_action.return_value = mock_action_methods
+        mock_package = Mock(name='package')
+        mock_package.name = 'package'
+        mock_model.Package.get.return_value = mock_package
 
         mock_query = Mock(name='query')
         mock_update_harvest_obj = Mock(name='update-harvest-obj')
@@ -161,28 +109,10 @@ class TestHarvestUtils(unittest.TestCase):
 
         HarvestUtils.rename_delete_dataset_with_id('test')
 
-        # check if the expected API calls were made (show to get the package name)
-        self.assertEqual(mock_get_action.call_count, 3)
-        mock_get_action.assert_any_call("package_show")
-        mock_get_action.assert_any_call("package_update")
-        mock_get_action.assert_any_call("package_delete")
-
-        self.assertEqual(mock_action_methods.call_count, 3)
-        expected_action_calls = []
-        # call with ID only (show)
-        expected_action_calls.append(
-            call(TestHarvestUtils._mock_api_context(),
-                 {'id': 'test'}))
-        # one call with a name (update)
-        expected_action_calls.append(
-            call(TestHarvestUtils._mock_api_context(),
-                 {'id': 'test', 'name': ANY}))
-        # and only ID again (delete)
-        expected_action_calls.append(expected_action_calls[0])
-        mock_action_methods.assert_has_calls(expected_action_calls)
-
-        # Check if the function to update harvest objects (current=false) is called properly before delete
+        mock_get_action.assert_called_once_with("package_delete")
+        self.assertEqual(mock_action_methods.call_count, 1)
         self.assertEqual(mock_query.call_count, 1)
+        mock_model.Session.rollback.assert_called_once_with()
 
     def test_compare_harvester_priorities(self):
         # Remote priority is higher than local priority
@@ -595,3 +525,127 @@ class TestHandleDuplicates(unittest.TestCase):
         self.mock_package_delete_action.assert_called_with(
             TestHarvestUtils._mock_api_context(), {'id': 'hasone-local'})
         mock_get_harvest_config.assert_called_once_with('source_id1')
+
+
+RegistryEntry = namedtuple('RegistryEntry', ['package_id', 'identifier', 'guid', 'modified',
+                                             'harvest_source_id'])
+
+
+@patch('ckanext.dcatde.harvesters.harvest_utils.HarvestObject')
+@patch('ckanext.dcatde.harvesters.harvest_utils.model')
+@patch('ckanext.dcatde.harvesters.harvest_utils.get_identifier_registry')
+@patch('ckan.plugins.toolkit.get_action')
+class TestHandleDuplicatesWithRegistry(unittest.TestCase):
+    """
+    Test class for handling duplicates with the identifier registry
+    """
+
+    @staticmethod
+    def _prepare(mock_model, mock_get_registry, local_entries, active_ids):
+        registry = Mock(name='registry')
+        registry.find_duplicates.return_value = local_entries
+        mock_get_registry.return_value = registry
+        active_query = Mock(name='active-query')
+        active_query.filter.return_value.filter.return_value = [(package_id,) for package_id in active_ids]
+        # query the active datasets, mark the harvest objects of the deleted datasets as not current
+        mock_model.Session.query.side_effect = [active_query, Mock(name='harvest-object-query')]
+        return registry
+
+    @staticmethod
+    def _get_harvest_object(modified, priority=0):
+        remote_dataset = json.dumps({'extras': {'modified': modified, 'identifier': 'id-1',
+                                                'guid': 'guid-1'}})
+        return HarvestObject(content=remote_dataset,
+                             source=DummySource('DummyHarvester', '{"priority": %s}' % priority))
+
+    def test_remote_is_newer(self, mock_get_action, mock_get_registry, mock_model,
+                             mock_harvest_object):
+        """Tests if newer remote dataset is accepted and the local dataset is deleted"""
+        registry = self._prepare(mock_model, mock_get_registry, [
+            RegistryEntry('local-1', 'id-1', 'guid-2', datetime.datetime(2017, 8, 14, 10), 'source-1')],
+                                 ['local-1'])
+
+        result = HarvestUtils.handle_duplicates(self._get_harvest_object('2017-08-15T10:00:00+02:00'))
+
+        self.assertTrue(result)
+        registry.find_duplicates.assert_called_once_with('id-1', 'guid-1')
+        mock_get_action.return_value.assert_called_once_with(TestHarvestUtils._mock_api_context(),
+                                                             {'id': 'local-1'})
+
+    @patch('ckanext.dcatde.harvesters.harvest_utils._get_harvester_config_from_db')
+    def test_same_modified_local_priority_is_higher(self, mock_get_harvest_source, mock_get_action,
+                                                    mock_get_registry, mock_model, mock_harvest_object):
+        """Tests if the remote dataset is rejected at the same timestamp and a higher local priority"""
+        registry = self._prepare(mock_model, mock_get_registry, [
+            RegistryEntry('local-1', 'id-1', 'guid-2', datetime.datetime(2017, 8, 15, 8), 'source-1')],
+                                 ['local-1'])
+        mock_get_harvest_source.return_value = DummySource('LocalHarvester', '{"priority": 10}')
+
+        result = HarvestUtils.handle_duplicates(self._get_harvest_object('2017-08-15T10:00:00+02:00', 5))
+
+        self.assertFalse(result)
+        mock_get_harvest_source.assert_called_once_with('source-1')
+        mock_get_action.return_value.assert_not_called()
+        registry.unregister.assert_not_called()
+
+    @patch('ckanext.dcatde.harvesters.harvest_utils._get_harvester_config_from_db')
+    def test_same_modified_current_priority_is_used(self, mock_get_harvest_source, mock_get_action,
+                                                    mock_get_registry, mock_model, mock_harvest_object):
+        """Tests if the current priority of the harvest source of the local dataset is compared"""
+        self._prepare(mock_model, mock_get_registry, [
+            RegistryEntry('local-1', 'id-1', 'guid-2', datetime.datetime(2017, 8, 15, 8), 'source-1')],
+                      ['local-1'])
+        # the priority of the local harvest source was lowered after importing the local dataset
+        mock_get_harvest_source.return_value = DummySource('LocalHarvester', '{"priority": 1}')
+
+        result = HarvestUtils.handle_duplicates(self._get_harvest_object('2017-08-15T10:00:00+02:00', 5))
+
+        self.assertTrue(result)
+        mock_get_action.return_value.assert_called_once_with(TestHarvestUtils._mock_api_context(),
+                                                             {'id': 'local-1'})
+
+    def test_local_is_newer_delete_older_duplicates(self, mock_get_action, mock_get_registry, mock_model,
+                                                    mock_harvest_object):
+        """Tests if the remote dataset is rejected and only the latest local dataset is kept"""
+        self._prepare(mock_model, mock_get_registry, [
+            RegistryEntry('local-1', 'id-1', 'guid-2', datetime.datetime(2017, 8, 17, 10), 'source-1'),
+            RegistryEntry('local-2', 'id-1', 'guid-3', datetime.datetime(2017, 8, 14, 10), 'source-1')],
+                      ['local-1', 'local-2'])
+
+        result = HarvestUtils.handle_duplicates(self._get_harvest_object('2017-08-15T10:00:00+02:00'))
+
+        self.assertFalse(result)
+        mock_get_action.return_value.assert_called_once_with(TestHarvestUtils._mock_api_context(),
+                                                             {'id': 'local-2'})
+
+    def test_inactive_local_dataset(self, mock_get_action, mock_get_registry, mock_model,
+                                    mock_harvest_object):
+        """Tests if registry entries of deleted datasets are ignored and removed"""
+        registry = self._prepare(mock_model, mock_get_registry, [
+            RegistryEntry('local-1', 'id-1', 'guid-2', datetime.datetime(2017, 8, 17, 10), 'source-1')],
+                                 [])
+
+        result = HarvestUtils.handle_duplicates(self._get_harvest_object('2017-08-15T10:00:00+02:00'))
+
+        self.assertTrue(result)
+        registry.unregister.assert_called_once_with(['local-1'])
+        mock_get_action.return_value.assert_not_called()
+
+    def test_registry_not_populated(self, mock_get_action, mock_get_registry, mock_model,
+                                    mock_harvest_object):
+        """Tests if the datasets are searched in the database as long as the registry isn't populated"""
+        registry = self._prepare(mock_model, mock_get_registry, [], [])
+        registry.is_populated.return_value = False
+        query = MagicMock(name='query')
+        query.join.return_value = query
+        query.filter.return_value = query
+        query.count.return_value = 0
+        query.__iter__.return_value = iter([])
+        mock_model.Session.query.side_effect = None
+        mock_model.Session.query.return_value = query
+
+        result = HarvestUtils.handle_duplicates(self._get_harvest_object('2017-08-15T10:00:00+02:00'))
+
+        self.assertTrue(result)
+        registry.find_duplicates.assert_not_called()
+        query.count.assert_called_once_with()
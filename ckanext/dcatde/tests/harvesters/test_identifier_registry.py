@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import datetime
+import unittest
+
+from ckantoolkit.tests import helpers
+from mock import patch, Mock
+from sqlalchemy import create_engine
+from ckanext.dcatde.harvesters.identifier_registry import IdentifierRegistry, get_identifier_registry, \
+    normalize_modified, register_dataset, unregister_dataset
+
+
+class TestIdentifierRegistry(unittest.TestCase):
+    """
+    Test class for the IdentifierRegistry
+    """
+
+    def setUp(self):
+        self.registry = IdentifierRegistry(create_engine('sqlite://'))
+
+    def _register(self, package_id, identifier='id-1', guid=None, modified='2017-08-14T10:00:00',
+                  harvest_source_id='source-1'):
+        self.registry.register(package_id, identifier, guid or 'guid-%s' % package_id, modified,
+                               harvest_source_id)
+
+    def test_normalize_modified(self):
+        """ Tests if dates are converted to UTC without time zone """
+        self.assertEqual(normalize_modified('2017-08-15T10:00:00+02:00'), datetime.datetime(2017, 8, 15, 8))
+        self.assertEqual(normalize_modified('2017-08-14T10:00:00.000'), datetime.datetime(2017, 8, 14, 10))
+        self.assertIsNone(normalize_modified(''))
+        self.assertIsNone(normalize_modified('invalid'))
+
+    def test_find_duplicates(self):
+        """ Tests if the datasets with the same identifier and a modified date are found """
+        self._register('pkg-1')
+        self._register('pkg-2', modified='2017-08-15T10:00:00+02:00', harvest_source_id='source-2')
+        self._register('pkg-3', modified=None)
+        self._register('pkg-4', identifier='id-2')
+
+        result = self.registry.find_duplicates('id-1')
+
+        self.assertEqual([(row.package_id, row.modified, row.harvest_source_id) for row in result],
+                         [('pkg-1', datetime.datetime(2017, 8, 14, 10), 'source-1'),
+                          ('pkg-2', datetime.datetime(2017, 8, 15, 8), 'source-2')])
+
+    def test_find_duplicates_exclude_guid(self):
+        """ Tests if the dataset with the GUID of the remote dataset is excluded """
+        self._register('pkg-1')
+        self._register('pkg-2')
+
+        result = self.registry.find_duplicates('id-1', exclude_guid='guid-pkg-1')
+
+        self.assertEqual([row.package_id for row in result], ['pkg-2'])
+
+    def test_register_update_and_unregister(self):
+        """ Tests if a dataset is updated on register and removed on unregister """
+        self._register('pkg-1')
+        self._register('pkg-2')
+        self._register('pkg-1', identifier='id-2')
+
+        self.assertEqual([row.package_id for row in self.registry.find_duplicates('id-1')], ['pkg-2'])
+        self.assertEqual([row.package_id for row in self.registry.find_duplicates('id-2')], ['pkg-1'])
+
+        self.registry.unregister(['pkg-1'])
+        self._register('pkg-2', identifier=None)
+
+        self.assertEqual(self.registry.find_duplicates('id-1'), [])
+        self.assertEqual(self.registry.find_duplicates('id-2'), [])
+
+    def test_replace_all(self):
+        """ Tests if the content of the registry is replaced with the datasets having an identifier """
+        self._register('pkg-1')
+        rows = [{'package_id': 'pkg-2', 'identifier': 'id-1', 'guid': None, 'modified': '2017-08-14',
+                 'harvest_source_id': 'source-1'},
+                {'package_id': 'pkg-3', 'identifier': None, 'guid': None, 'modified': '2017-08-14',
+                 'harvest_source_id': 'source-1'}]
+
+        count = self.registry.replace_all(rows)
+
+        self.assertEqual(count, 1)
+        self.assertEqual([row.package_id for row in self.registry.find_duplicates('id-1')], ['pkg-2'])
+
+    def test_is_populated(self):
+        """ Tests if the registry is marked as populated after it was filled with all datasets """
+        self._register('pkg-1')
+        self.assertFalse(self.registry.is_populated())
+
+        self.registry.replace_all([])
+
+        self.assertTrue(self.registry.is_populated())
+        self.assertTrue(IdentifierRegistry(self.registry.engine).is_populated())
+
+    def test_get_identifier_registry_not_activated(self):
+        """ Tests if no registry is returned if it isn't activated """
+        self.assertIsNone(get_identifier_registry())
+
+    @helpers.change_config('ckanext.dcatde.harvest.identifier_registry', 'true')
+    def test_get_identifier_registry(self):
+        """ Tests if the same registry is returned if it is activated """
+        registry = get_identifier_registry()
+
+        self.assertIsInstance(registry, IdentifierRegistry)
+        self.assertIs(get_identifier_registry(), registry)
+
+
+@patch('ckanext.dcatde.harvesters.identifier_registry._get_harvest_object')
+@patch('ckanext.dcatde.harvesters.identifier_registry.get_identifier_registry')
+class TestRegisterDataset(unittest.TestCase):
+    """
+    Test class for keeping the identifier registry up to date for changed datasets
+    """
+
+    def test_register_dataset(self, mock_get_registry, mock_get_harvest_object):
+        """ Tests if a harvested dataset is added with the source and the GUID of its harvest object """
+        mock_get_harvest_object.return_value = ('source-1', 'guid-1')
+        dataset_dict = {'id': 'pkg-1', 'state': 'active',
+                        'extras': [{'key': 'identifier', 'value': 'id-1'},
+                                   {'key': 'modified', 'value': '2017-08-14'}]}
+
+        register_dataset(dataset_dict)
+
+        mock_get_harvest_object.assert_called_once_with('pkg-1')
+        mock_get_registry.return_value.register.assert_called_once_with('pkg-1', 'id-1', 'guid-1',
+                                                                        '2017-08-14', 'source-1')
+
+    def test_register_dataset_not_harvested(self, mock_get_registry, mock_get_harvest_object):
+        """ Tests if datasets which weren't harvested or aren't active are removed from the registry """
+        mock_get_harvest_object.return_value = None
+        register_dataset({'id': 'pkg-1', 'extras': [{'key': 'identifier', 'value': 'id-1'}]})
+
+        mock_get_harvest_object.return_value = ('source-1', 'guid-1')
+        register_dataset({'id': 'pkg-2', 'state': 'deleted', 'extras': []})
+
+        mock_get_registry.return_value.register.assert_not_called()
+        self.assertEqual(mock_get_registry.return_value.unregister.call_count, 2)
+        mock_get_registry.return_value.unregister.assert_called_with(['pkg-2'])
+
+    def test_register_dataset_not_activated(self, mock_get_registry, mock_get_harvest_object):
+        """ Tests if nothing is done if the registry isn't activated """
+        mock_get_registry.return_value = None
+
+        register_dataset({'id': 'pkg-1', 'extras': []})
+
+        mock_get_harvest_object.assert_not_called()
+
+    @patch('ckanext.dcatde.harvesters.identifier_registry.model')
+    def test_unregister_dataset(self, mock_model, mock_get_registry, mock_get_harvest_object):
+        """ Tests if the deleted dataset is removed by its ID, also if it is deleted by its name """
+        mock_model.Package.get.return_value = Mock(id='pkg-1')
+
+        unregister_dataset({'id': 'name-1'})
+
+        mock_model.Package.get.assert_called_once_with('name-1')
+        mock_get_registry.return_value.unregister.assert_called_once_with(['pkg-1'])
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import json
+import unittest
+
+from ckanext.dcatde.harvesters.license_statistics import HARVEST_OBJECT_EXTRA_KEY, LICENSE_MISSING, \
+    LICENSE_UNKNOWN, LICENSE_UPGRADED, LicenseStatistics, harvest_jobs_run, log_license_statistics, \
+    save_license_statistics
+from mock import patch, Mock
+
+
+@patch('ckanext.dcatde.harvesters.license_statistics.LOGGER')
+class TestLicenseStatistics(unittest.TestCase):
+    """
+    Test class for the license statistics
+    """
+
+    def test_log_summary(self, mock_logger):
+        """ Tests if one summary with the counts and limited examples is logged """
+        statistics = LicenseStatistics(max_samples=2)
+        for number in range(3):
+            statistics.add(LICENSE_MISSING, 'guid-%s' % number, 'http://example.com/%s' % number, 'default')
+        statistics.add(LICENSE_UPGRADED, 'guid-3', 'http://example.com/3', 'foo', 'foo_new')
+
+        statistics.log_summary('Test source', 'job-1')
+
+        mock_logger.info.assert_called_once()
+        message = mock_logger.info.call_args[0][0] % mock_logger.info.call_args[0][1:]
+        self.assertIn('job-1', message)
+        self.assertIn('3 resources without license', message)
+        self.assertIn('1 resources with an upgraded license', message)
+        self.assertNotIn('deprecated or unknown', message)
+        self.assertIn('resource http://example.com/1 of GUID guid-1 (default)', message)
+        self.assertNotIn('guid-2', message)
+        self.assertIn('(foo -> foo_new)', message)
+
+    def test_log_summary_without_events(self, mock_logger):
+        """ Tests if no summary is logged if no license event was counted """
+        LicenseStatistics().log_summary('Test source', 'job-1')
+
+        mock_logger.info.assert_not_called()
+
+    def test_save_license_statistics(self, mock_logger):
+        """ Tests if the counts and limited examples are stored as harvest object extra """
+        harvest_object = Mock(extras=[])
+
+        save_license_statistics(harvest_object, LicenseStatistics())
+        self.assertEqual(harvest_object.extras, [])
+
+        statistics = LicenseStatistics(max_samples=1)
+        for number in range(3):
+            statistics.add(LICENSE_UNKNOWN, 'guid-1', 'http://example.com/%s' % number, 'foo')
+        save_license_statistics(harvest_object, statistics)
+        self.assertEqual(len(harvest_object.extras), 1)
+        self.assertEqual(harvest_object.extras[0].key, HARVEST_OBJECT_EXTRA_KEY)
+        self.assertEqual(json.loads(harvest_object.extras[0].value),
+                         {'counts': {LICENSE_UNKNOWN: 3},
+                          'samples': {LICENSE_UNKNOWN: [['http://example.com/0', 'foo', None]]}})
+
+    @patch('ckanext.dcatde.harvesters.license_statistics.model')
+    def test_log_license_statistics(self, mock_model, mock_logger):
+        """ Tests if the license statistics stored for the datasets of a harvest job are summarized """
+        mock_query = mock_model.Session.query.return_value.join.return_value.filter.return_value.filter
+        mock_query.return_value = [
+            ('guid-1', json.dumps({'counts': {LICENSE_UNKNOWN: 5},
+                                   'samples': {LICENSE_UNKNOWN: [['http://example.com/1', 'foo', None]]}})),
+            ('guid-2', json.dumps({'counts': {LICENSE_UNKNOWN: 1},
+                                   'samples': {LICENSE_UNKNOWN: [['http://example.com/3', 'bar', None]]}}))]
+        harvest_job = Mock(id='job-1', source=Mock(title='Test source'))
+
+        log_license_statistics(harvest_job)
+
+        mock_logger.info.assert_called_once()
+        self.assertEqual(mock_logger.info.call_args[0][1:3], ('Test source', 'job-1'))
+        self.assertIn('6 resources with a deprecated or unknown license', mock_logger.info.call_args[0][3])
+        self.assertIn('resource http://example.com/3 of GUID guid-2 (bar)', mock_logger.info.call_args[0][4])
+
+    @patch('ckanext.dcatde.harvesters.license_statistics.log_license_statistics')
+    @patch('ckanext.dcatde.harvesters.license_statistics.model')
+    def test_harvest_jobs_run(self, mock_model, mock_log_statistics, mock_logger):
+        """ Tests if the statistics of the jobs finished by the action harvest_jobs_run are logged """
+        mock_running_query = Mock()
+        mock_running_query.filter.return_value.filter.return_value = [('job-1',), ('job-2',)]
+        finished_job = Mock(id='job-1')
+        mock_finished_query = Mock()
+        mock_finished_query.filter.return_value.filter.return_value = [finished_job]
+        mock_model.Session.query.side_effect = [mock_running_query, mock_finished_query]
+        original_action = Mock()
+        data_dict = {'source_id': 'source-1'}
+
+        result = harvest_jobs_run(original_action, {}, data_dict)
+
+        self.assertEqual(result, original_action.return_value)
+        original_action.assert_called_once_with({}, data_dict)
+        mock_log_statistics.assert_called_once_with(finished_job)
+
+    @patch('ckanext.dcatde.harvesters.license_statistics.log_license_statistics')
+    @patch('ckanext.dcatde.harvesters.license_statistics.model')
+    def test_harvest_jobs_run_without_running_jobs(self, mock_model, mock_log_statistics, mock_logger):
+        """ Tests if no statistics are logged if no harvest job was running """
+        mock_model.Session.query.return_value.filter.return_value = []
+        original_action = Mock()
+
+        harvest_jobs_run(original_action, {}, {})
+
+        original_action.assert_called_once_with({}, {})
+        mock_log_statistics.assert_not_called()
+        self.assertEqual(mock_model.Session.query.call_count, 1)
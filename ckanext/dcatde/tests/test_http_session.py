@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+
+import gzip
+import unittest
+
+from ckanext.dcatde import http_session
+from ckanext.dcatde.http_session import get_session, get_timeout, prepare_body
+from ckantoolkit.tests import helpers
+from mock import patch
+
+
+class TestHttpSession(unittest.TestCase):
+    '''Tests the pooled HTTP session and the request helpers'''
+
+    @helpers.change_config('ckanext.dcatde.http.pool_size', '3')
+    @patch.object(http_session, '_session', None)
+    def test_get_session_is_shared(self):
+        '''The session is created once and mounts a connection pool of the configured size'''
+        session = get_session()
+
+        self.assertIs(get_session(), session)
+        adapter = session.get_adapter('http://localhost')
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(adapter.max_retries.total, 0)
+
+    @helpers.change_config('ckanext.dcatde.http.connect_timeout', '2')
+    @helpers.change_config('ckanext.dcatde.http.read_timeout', '20')
+    def test_get_timeout(self):
+        '''The configured timeouts are returned and the read timeout can be overridden'''
+        self.assertEqual(get_timeout(), (2.0, 20.0))
+        self.assertEqual(get_timeout(600), (2.0, 600))
+
+    def test_prepare_body(self):
+        '''Strings are encoded as UTF-8 and the headers are not changed without compression'''
+        headers = {'Content-Type': 'text/plain'}
+
+        data, result_headers = prepare_body(u'Straße', headers)
+
+        self.assertEqual(data, u'Straße'.encode('utf-8'))
+        self.assertIs(result_headers, headers)
+
+    @helpers.change_config('ckanext.dcatde.http.gzip_requests', 'true')
+    def test_prepare_body_gzip(self):
+        '''The body is compressed and the header Content-Encoding is added if activated'''
+        headers = {'Content-Type': 'text/plain'}
+
+        data, result_headers = prepare_body(u'Straße', headers)
+
+        self.assertEqual(gzip.decompress(data), u'Straße'.encode('utf-8'))
+        self.assertEqual(result_headers, {'Content-Type': 'text/plain', 'Content-Encoding': 'gzip'})
+        self.assertEqual(headers, {'Content-Type': 'text/plain'})
@@ -0,0 +1,37 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import json
+import unittest
+
+from ckanext.dcatde import json_utils
+from mock import patch
+
+PACKAGE = {'name': u'datensatz-müll', 'extras': [{'key': 'guid', 'value': 'http://example.org/1'}],
+           'resources': [{'url': 'http://example.org/1.csv', 'size': 12}]}
+
+
+class TestJsonUtils(unittest.TestCase):
+    """
+    Test class for the JSON serialization
+    """
+
+    def test_dumps_and_loads(self):
+        """ Tests if the serialized package is parsed to the same package """
+        content = json_utils.dumps(PACKAGE)
+
+        self.assertIsInstance(content, str)
+        self.assertEqual(json.loads(content), PACKAGE)
+        self.assertEqual(json_utils.loads(content), PACKAGE)
+        self.assertEqual(json_utils.loads(content.encode('utf-8')), PACKAGE)
+
+    def test_dumps_unsupported_keys(self):
+        """ Tests if dicts with keys which are no strings are serialized """
+        self.assertEqual(json.loads(json_utils.dumps({1: 'a'})), {'1': 'a'})
+
+    @patch('ckanext.dcatde.json_utils.orjson', None)
+    def test_dumps_and_loads_without_orjson(self):
+        """ Tests if the json module is used if orjson isn't installed """
+        content = json_utils.dumps(PACKAGE)
+
+        self.assertEqual(content, json.dumps(PACKAGE))
+        self.assertEqual(json_utils.loads(content), PACKAGE)
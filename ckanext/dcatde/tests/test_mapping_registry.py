@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from urllib.error import HTTPError
+from urllib.request import pathname2url
+
+from ckanext.dcatde.mapping_registry import MappingRegistry, get_mapping_registry
+from mock import patch, Mock
+
+
+class TestMappingRegistry(unittest.TestCase):
+    '''Tests the registry of the JSON mappings'''
+
+    def setUp(self):
+        self.registry = MappingRegistry()
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'mapping.json')
+        self.url = 'file://' + pathname2url(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_mapping(self, mapping, mtime):
+        with open(self.path, 'w') as mapping_file:
+            json.dump(mapping, mapping_file)
+        os.utime(self.path, (mtime, mtime))
+
+    @staticmethod
+    def _response(mapping, etag):
+        response = Mock(name='response')
+        response.__enter__ = Mock(return_value=response)
+        response.__exit__ = Mock(return_value=False)
+        response.read.return_value = json.dumps(mapping).encode('utf-8')
+        response.headers = {'ETag': etag}
+        return response
+
+    def test_get_file_mapping_cached(self):
+        '''The file is parsed once and reloaded after it has changed'''
+        self._write_mapping({'foo': 'foo_new'}, 1000)
+
+        mapping = self.registry.get(self.url, 'test')
+        with patch('ckanext.dcatde.mapping_registry.open') as mock_open:
+            self.assertIs(self.registry.get(self.url, 'test'), mapping)
+            mock_open.assert_not_called()
+
+        self._write_mapping({'foo': 'foo_newer'}, 2000)
+        self.assertEqual(self.registry.get(self.url, 'test'), {'foo': 'foo_newer'})
+
+    def test_get_indexed_mapping(self):
+        '''The result of the indexer is cached and computed again for a changed mapping'''
+        self._write_mapping({'list': [{'key': 'a', 'value': 1}]}, 1000)
+        indexer = Mock(side_effect=lambda mapping: {item['key']: item['value'] for item in mapping['list']})
+
+        self.assertEqual(self.registry.get(self.url, 'test', indexer), {'a': 1})
+        self.assertEqual(self.registry.get(self.url, 'test', indexer), {'a': 1})
+        self.assertEqual(indexer.call_count, 1)
+
+        self._write_mapping({'list': [{'key': 'b', 'value': 2}]}, 2000)
+        self.assertEqual(self.registry.get(self.url, 'test', indexer), {'b': 2})
+        self.assertEqual(indexer.call_count, 2)
+
+    def test_get_missing_mapping(self):
+        '''An empty dict is returned if the mapping can't be loaded'''
+        self.assertEqual(self.registry.get(self.url, 'test'), {})
+        self.assertEqual(self.registry.get(None, 'test'), {})
+
+    def test_get_deleted_mapping(self):
+        '''The cached mapping is returned if the file can't be read anymore'''
+        self._write_mapping({'foo': 'foo_new'}, 1000)
+        self.registry.get(self.url, 'test')
+        os.remove(self.path)
+
+        self.assertEqual(self.registry.get(self.url, 'test'), {'foo': 'foo_new'})
+
+    @patch('ckanext.dcatde.mapping_registry.urllib.request.urlopen')
+    def test_get_http_mapping_revalidated_with_etag(self, mock_urlopen):
+        '''The cached mapping is revalidated with the ETag of the previous response'''
+        url = 'http://example.org/mapping.json'
+        mock_urlopen.side_effect = [
+            self._response({'foo': 'foo_new'}, '"v1"'),
+            HTTPError(url, 304, 'Not Modified', {}, io.BytesIO()),
+            self._response({'foo': 'foo_newer'}, '"v2"')]
+
+        mapping = self.registry.get(url, 'test')
+        self.assertIs(self.registry.get(url, 'test'), mapping)
+        self.assertEqual(self.registry.get(url, 'test'), {'foo': 'foo_newer'})
+
+        self.assertIsNone(mock_urlopen.call_args_list[0][0][0].get_header('If-none-match'))
+        self.assertEqual(mock_urlopen.call_args_list[1][0][0].get_header('If-none-match'), '"v1"')
+        self.assertEqual(mock_urlopen.call_args_list[2][0][0].get_header('If-none-match'), '"v1"')
+
+    def test_get_mapping_registry(self):
+        '''The registry is shared within the process'''
+        self.assertIs(get_mapping_registry(), get_mapping_registry())
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import unittest
+
+from mock import patch
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from ckanext.dcatde.package_extra_indexes import PACKAGE_EXTRA_INDEXES, PackageExtraIndexes
+
+
+class TestPackageExtraIndexes(unittest.TestCase):
+    """
+    Test class for the PackageExtraIndexes
+    """
+
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        with engine.begin() as connection:
+            connection.execute(text(u'CREATE TABLE package_extra (id TEXT PRIMARY KEY, package_id TEXT, '
+                                    u'key TEXT, value TEXT, state TEXT)'))
+        self.indexes = PackageExtraIndexes(engine)
+        self.index_names = [index.name for index in PACKAGE_EXTRA_INDEXES]
+
+    def test_create_indexes(self):
+        """ Tests if all indexes are created and a second run doesn't create them again """
+        self.assertEqual(self.indexes.create(), self.index_names)
+
+        self.assertTrue(set(self.index_names).issubset(self.indexes.get_existing_index_names()))
+        self.assertEqual(self.indexes.create(), [])
+
+    def test_create_invalid_indexes(self):
+        """ Tests if the invalid indexes are dropped and created again """
+        self.indexes.create()
+        invalid_index_name = self.index_names[0]
+
+        with patch.object(self.indexes, 'get_invalid_index_names', return_value={invalid_index_name}), \
+                patch.object(PACKAGE_EXTRA_INDEXES[0], 'drop',
+                             wraps=PACKAGE_EXTRA_INDEXES[0].drop) as mock_drop:
+            self.assertEqual(self.indexes.create(), [invalid_index_name])
+
+        mock_drop.assert_called_once()
+        self.assertIn(invalid_index_name, self.indexes.get_existing_index_names())
+
+    def test_value_indexes_use_hash(self):
+        """ Tests if the unbounded values are indexed with hash indexes on PostgreSQL """
+        for index in PACKAGE_EXTRA_INDEXES:
+            statement = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+            if index.info['lookup_column'].name == 'value':
+                self.assertIn('USING hash (value)', statement)
+            self.assertIn('CONCURRENTLY', statement)
+
+    def test_create_indexes_dry_run(self):
+        """ Tests if no index is created in dry-run mode """
+        self.assertEqual(self.indexes.create(dry_run=True), self.index_names)
+
+        self.assertEqual(self.indexes.get_existing_index_names() & set(self.index_names), set())
+
+    def test_drop_indexes(self):
+        """ Tests if the created indexes are dropped """
+        self.indexes.create()
+
+        self.assertEqual(self.indexes.drop(), self.index_names)
+
+        self.assertEqual(self.indexes.get_existing_index_names() & set(self.index_names), set())
+        self.assertEqual(self.indexes.drop(), [])
+
+    def test_check_without_indexes(self):
+        """ Tests the check result if the indexes don't exist """
+        for status in self.indexes.check():
+            self.assertFalse(status.exists)
+            self.assertFalse(status.used)
+
+    def test_check_with_indexes(self):
+        """ Tests if the query planner uses the created indexes """
+        self.indexes.create()
+
+        result = self.indexes.check()
+
+        self.assertEqual([status.name for status in result], self.index_names)
+        for status in result:
+            self.assertTrue(status.exists)
+            self.assertTrue(status.valid)
+            self.assertTrue(status.used, status.name)
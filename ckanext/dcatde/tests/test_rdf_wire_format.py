@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+
+import unittest
+
+from ckanext.dcatde.rdf_wire_format import WIRE_FORMAT_NTRIPLES, WIRE_FORMAT_TURTLE, get_wire_format, \
+    serialize_graph
+from ckantoolkit.tests import helpers
+from rdflib import Graph, Literal, URIRef
+
+
+class TestRdfWireFormat(unittest.TestCase):
+    '''Tests the RDF wire formats'''
+
+    def test_get_wire_format_default(self):
+        '''Turtle is used if no wire format is configured'''
+        self.assertEqual(get_wire_format(), WIRE_FORMAT_TURTLE)
+
+    @helpers.change_config('ckanext.dcatde.rdf.wire_format', 'NTriples')
+    def test_get_wire_format_configured(self):
+        '''The configured wire format is returned'''
+        self.assertEqual(get_wire_format(), WIRE_FORMAT_NTRIPLES)
+        self.assertEqual(get_wire_format().content_type, 'application/n-triples')
+
+    def test_get_wire_format_unknown(self):
+        '''Turtle is used if the wire format is unknown'''
+        self.assertEqual(get_wire_format('thrift'), WIRE_FORMAT_TURTLE)
+
+    def test_serialize_graph(self):
+        '''The graph is serialized as string in the given wire format'''
+        graph = Graph()
+        graph.add((URIRef('http://example.org/s'), URIRef('http://example.org/p'), Literal(u'Straße')))
+
+        result = serialize_graph(graph, WIRE_FORMAT_NTRIPLES)
+
+        self.assertEqual(result.strip(), u'<http://example.org/s> <http://example.org/p> "Straße" .')
@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+
+import unittest
+import socket
+from urllib.error import HTTPError, URLError
+
+import requests
+
+from ckanext.dcatde.service_health import ServiceHealthMonitor, ServiceUnavailableError, STATE_CLOSED, \
+    STATE_HALF_OPEN, STATE_OPEN
+from mock import patch, Mock
+
+
+class TestServiceHealthMonitor(unittest.TestCase):
+    '''Tests the health monitor with the circuit breaker'''
+
+    @staticmethod
+    def _get_monitor():
+        return ServiceHealthMonitor('test-service', failure_threshold=2, reset_timeout=30, health_check_ttl=10,
+                                    max_retries=2, retry_backoff=0)
+
+    def test_call_retries_transient_errors(self):
+        '''A connection error is retried and the circuit stays closed on success'''
+        monitor = ServiceHealthMonitor('test-service', failure_threshold=5, max_retries=2, retry_backoff=0)
+        func = Mock(side_effect=[URLError('connection refused'), 'result'])
+
+        result = monitor.call(func, 'arg', key='value')
+
+        self.assertEqual(result, 'result')
+        self.assertEqual(func.call_count, 2)
+        func.assert_called_with('arg', key='value')
+        self.assertEqual(monitor.state, STATE_CLOSED)
+
+    def test_call_retries_read_timeouts_of_idempotent_requests(self):
+        '''A read timeout is retried if the request is idempotent'''
+        monitor = ServiceHealthMonitor('test-service', failure_threshold=5, max_retries=2, retry_backoff=0)
+        func = Mock(side_effect=[requests.exceptions.ReadTimeout('read timeout'), socket.timeout(), 'result'])
+
+        result = monitor.call(func, 'arg')
+
+        self.assertEqual(result, 'result')
+        self.assertEqual(func.call_count, 3)
+
+    def test_call_does_not_retry_read_timeouts_of_non_idempotent_requests(self):
+        '''A read timeout of a non-idempotent request is raised immediately, but counts as failure'''
+        for exception in [requests.exceptions.ReadTimeout('read timeout'), socket.timeout()]:
+            monitor = ServiceHealthMonitor('test-service', failure_threshold=1, max_retries=2,
+                                           retry_backoff=0)
+            func = Mock(side_effect=[exception, 'result'])
+
+            with self.assertRaises(type(exception)):
+                monitor.call(func, 'arg', idempotent=False)
+
+            func.assert_called_once_with('arg')
+            self.assertEqual(monitor.state, STATE_OPEN)
+
+    def test_call_retries_connection_errors_of_non_idempotent_requests(self):
+        '''A connection error of a non-idempotent request is retried, because the request wasn't received'''
+        monitor = ServiceHealthMonitor('test-service', failure_threshold=5, max_retries=2, retry_backoff=0)
+        func = Mock(side_effect=[requests.exceptions.ConnectTimeout('connect timeout'),
+                                 URLError('connection refused'), 'result'])
+
+        result = monitor.call(func, 'arg', idempotent=False)
+
+        self.assertEqual(result, 'result')
+        self.assertEqual(func.call_count, 3)
+        func.assert_called_with('arg')
+
+    def test_call_does_not_retry_other_errors(self):
+        '''An error response of the service is raised immediately and does not open the circuit'''
+        monitor = self._get_monitor()
+        func = Mock(side_effect=HTTPError('http://test', 400, 'bad request', None, None))
+
+        with self.assertRaises(HTTPError):
+            monitor.call(func)
+
+        func.assert_called_once_with()
+        self.assertEqual(monitor.state, STATE_CLOSED)
+
+    def test_call_opens_circuit(self):
+        '''The circuit is opened after the failure threshold and further requests are rejected'''
+        monitor = self._get_monitor()
+        func = Mock(side_effect=URLError('connection refused'))
+
+        with self.assertRaises(URLError):
+            monitor.call(func)
+        with self.assertRaises(ServiceUnavailableError):
+            monitor.call(func)
+
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(monitor.state, STATE_OPEN)
+        self.assertFalse(monitor.allow_request())
+
+    @patch('ckanext.dcatde.service_health.time.monotonic')
+    def test_half_open_probe(self, mock_monotonic):
+        '''After the reset timeout one probe request is allowed, which closes the circuit on success'''
+        mock_monotonic.return_value = 100
+        monitor = self._get_monitor()
+        monitor.record_failure()
+        monitor.record_failure()
+        self.assertEqual(monitor.state, STATE_OPEN)
+
+        mock_monotonic.return_value = 131
+        self.assertTrue(monitor.allow_request())
+        self.assertEqual(monitor.state, STATE_HALF_OPEN)
+        self.assertFalse(monitor.allow_request())
+
+        monitor.record_success()
+        self.assertEqual(monitor.state, STATE_CLOSED)
+        self.assertTrue(monitor.get_cached_availability())
+
+    @patch('ckanext.dcatde.service_health.time.monotonic')
+    def test_half_open_probe_failure(self, mock_monotonic):
+        '''A failed probe request opens the circuit again'''
+        mock_monotonic.return_value = 100
+        monitor = self._get_monitor()
+        monitor.record_failure()
+        monitor.record_failure()
+
+        mock_monotonic.return_value = 131
+        self.assertTrue(monitor.allow_request())
+        monitor.record_failure()
+
+        self.assertEqual(monitor.state, STATE_OPEN)
+        self.assertFalse(monitor.allow_request())
+
+    @patch('ckanext.dcatde.service_health.time.monotonic')
+    def test_cached_availability_expires(self, mock_monotonic):
+        '''The cached availability expires after the TTL'''
+        mock_monotonic.return_value = 100
+        monitor = self._get_monitor()
+        self.assertIsNone(monitor.get_cached_availability())
+
+        monitor.record_failure()
+        self.assertFalse(monitor.get_cached_availability())
+
+        mock_monotonic.return_value = 111
+        self.assertIsNone(monitor.get_cached_availability())
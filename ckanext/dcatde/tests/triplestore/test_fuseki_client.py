@@ -2,15 +2,28 @@ import unittest
 
 import requests
 from ckanext.dcatde.triplestore.fuseki_client import (
-    FusekiTriplestoreClient, CONTENT_TYPE_RDF_XML, CONTENT_TYPE_TURTLE)
+    FusekiTriplestoreClient, CONTENT_TYPE_CSV, CONTENT_TYPE_RDF_XML, CONTENT_TYPE_SPARQL_QUERY,
+    CONTENT_TYPE_SPARQL_UPDATE, CONTENT_TYPE_TURTLE, MIGRATION_TIMEOUT)
+from ckanext.dcatde.triplestore.sparql_query_templates import COUNT_TRIPLES_IN_DEFAULT_GRAPH_QUERY
 from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASET_BY_URI_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASETS_BY_URIS_SPARQL_QUERY
 from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASET_FROM_HARVEST_INFO_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASETS_FROM_HARVEST_INFO_QUERY
 from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_VALIDATION_REPORTS_BY_URIS_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DROP_GRAPH_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import INSERT_DATA_INTO_GRAPH_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import MIGRATE_DATASETS_TO_NAMED_GRAPHS_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import CLEAR_DEFAULT_GRAPH_QUERY
 from ckanext.dcatde.triplestore.sparql_query_templates import GET_URIS_FROM_HARVEST_INFO_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import GET_URIS_FROM_HARVEST_INFO_PAGED_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import \
+    GET_URIS_FROM_HARVEST_INFO_NAMED_GRAPHS_PAGED_QUERY
 from ckantoolkit.tests import helpers
-from mock import patch
-from rdflib import Graph, URIRef
-from rdflib.namespace import RDF, Namespace
+from mock import Mock, call, patch
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import FOAF, RDF, Namespace
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed
 
 FUSEKI_BASE_URL = 'http://foo:1010'
 FUSEKI_BASE_DS_NAME = 'bar'
@@ -21,6 +34,7 @@ FUSEKI_SHACL_ENDPOINT_URL = '{}/{}'.format(FUSEKI_BASE_URL, FUSEKI_SHACL_DS_NAME
 FUSEKI_HARVEST_ENDPOINT_URL = '{}/{}'.format(FUSEKI_BASE_URL, FUSEKI_HARVEST_DS_NAME)
 HEADERS_CONTENT_TYPE_TURTLE = {'Content-Type': CONTENT_TYPE_TURTLE}
 HEADERS_CONTENT_TYPE_RDF_XML = {'Content-Type': CONTENT_TYPE_RDF_XML}
+HEADERS_CONTENT_TYPE_SPARQL_UPDATE = {'Content-Type': CONTENT_TYPE_SPARQL_UPDATE}
 
 
 class TestFusekiTriplestoreClient(unittest.TestCase):
@@ -29,6 +43,15 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
     """
     DCAT = Namespace("http://www.w3.org/ns/dcat#")
 
+    def _get_sparql_update(self, mock_get_session, update_endpoint):
+        """ Returns the SPARQL update sent once via the mocked session to the given endpoint """
+        mock_session_post = mock_get_session.return_value.post
+        mock_session_post.assert_called_once()
+        args, kwargs = mock_session_post.call_args
+        self.assertEqual(args, (update_endpoint,))
+        self.assertEqual(kwargs['headers'], HEADERS_CONTENT_TYPE_SPARQL_UPDATE)
+        return kwargs['data'].decode('utf-8')
+
     @helpers.change_config('ckanext.dcatde.fuseki.harvester.info.name', None)
     @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', None)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', None)
@@ -45,11 +68,11 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.get')
-    def test_is_available_triplestore_not_responding(self, mock_requests_get):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_is_available_triplestore_not_responding(self, mock_get_session):
         """ Tests if is_available() returns False if triplestore is connected but does not respond """
 
-        mock_requests_get.return_value.status_code = 404
+        mock_get_session.return_value.get.return_value.status_code = 404
 
         client = FusekiTriplestoreClient()
 
@@ -60,11 +83,11 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.get')
-    def test_is_available_triplestore_reachable(self, mock_requests_get):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_is_available_triplestore_reachable(self, mock_get_session):
         """ Tests if is_available() returns True if triplestore is reachable """
 
-        mock_requests_get.return_value.status_code = 200
+        mock_get_session.return_value.get.return_value.status_code = 200
 
         client = FusekiTriplestoreClient()
 
@@ -72,6 +95,39 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
 
         self.assertEqual(is_available_return, True)
 
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_is_available_cached(self, mock_get_session):
+        """ Tests if the result of is_available() is cached """
+
+        mock_get_session.return_value.get.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+
+        self.assertEqual(client.is_available(), True)
+        self.assertEqual(client.is_available(), True)
+
+        mock_get_session.return_value.get.assert_called_once_with(
+            FUSEKI_BASE_URL + '/$/ping', timeout=client.timeout)
+
+    @helpers.change_config('ckanext.dcatde.circuit_breaker.failure_threshold', '2')
+    @helpers.change_config('ckanext.dcatde.circuit_breaker.health_check_ttl', '0')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_is_available_circuit_open(self, mock_get_session):
+        """ Tests if no ping is sent while the circuit is open after repeated failures """
+
+        mock_get_session.return_value.get.side_effect = requests.exceptions.ConnectionError('test_error')
+
+        client = FusekiTriplestoreClient()
+
+        for _ in range(4):
+            self.assertEqual(client.is_available(), False)
+
+        self.assertEqual(mock_get_session.return_value.get.call_count, 2)
+
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', FUSEKI_SHACL_DS_NAME)
@@ -93,11 +149,12 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.get')
-    def test_is_available_triplestore_request_exception(self, mock_requests_get):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_is_available_triplestore_request_exception(self, mock_get_session):
         """ Tests if is_available() returns False if raises an exception while connecting triplestore. """
 
-        mock_requests_get.return_value.status_code = requests.exceptions.ConnectionError('test_error')
+        mock_get_session.return_value.get.return_value.status_code = \
+            requests.exceptions.ConnectionError('test_error')
 
         client = FusekiTriplestoreClient()
 
@@ -147,91 +204,95 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.post')
-    def test_create_dataset_successful(self, mock_requests_post, mock_fuseki_is_available):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_successful(self, mock_get_session, mock_fuseki_is_available):
         """ Tests create is called with correct parameters """
 
         uri = "http://example.org/datasets/1"
         g = Graph()
         g.add((URIRef(uri), RDF.type, self.DCAT.Dataset))
 
-        mock_requests_post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.status_code = 200
         mock_fuseki_is_available.return_value = True
 
         client = FusekiTriplestoreClient()
         client.create_dataset_in_triplestore(g, uri)
 
-        mock_requests_post.assert_called_once_with('{}/data'.format(FUSEKI_ENDPOINT_URL),
-                                                   data=g, headers=HEADERS_CONTENT_TYPE_TURTLE)
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/data'.format(FUSEKI_ENDPOINT_URL), data=g.serialize(format='turtle').encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_TURTLE, timeout=client.timeout)
 
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', FUSEKI_SHACL_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.post')
-    def test_create_dataset_successful_mqa(self, mock_requests_post, mock_fuseki_is_available):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_successful_mqa(self, mock_get_session, mock_fuseki_is_available):
         """ Tests create MQA is called with correct parameters """
 
         uri = "http://example.org/datasets/1"
         g = Graph()
         g.add((URIRef(uri), RDF.type, self.DCAT.Dataset))
 
-        mock_requests_post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.status_code = 200
         mock_fuseki_is_available.return_value = True
 
         client = FusekiTriplestoreClient()
-        client.create_dataset_in_triplestore_mqa(g, uri)
+        client.create_dataset_in_triplestore_mqa(g.serialize(format='xml'), uri)
 
-        mock_requests_post.assert_called_once_with('{}/data'.format(FUSEKI_SHACL_ENDPOINT_URL),
-                                                   data=g, headers=HEADERS_CONTENT_TYPE_RDF_XML)
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/data'.format(FUSEKI_SHACL_ENDPOINT_URL), data=g.serialize(format='xml').encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_RDF_XML, timeout=client.timeout)
 
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.post')
-    def test_create_dataset_successful_harvest_info(self, mock_requests_post, mock_fuseki_is_available):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_successful_harvest_info(self, mock_get_session, mock_fuseki_is_available):
         """ Tests create MQA is called with correct parameters """
 
         uri = "http://example.org/datasets/1"
         g = Graph()
         g.add((URIRef(uri), RDF.type, self.DCAT.Dataset))
 
-        mock_requests_post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.status_code = 200
         mock_fuseki_is_available.return_value = True
 
         client = FusekiTriplestoreClient()
-        client.create_dataset_in_triplestore_harvest_info(g, uri)
+        client.create_dataset_in_triplestore_harvest_info(g.serialize(format='xml'), uri)
 
-        mock_requests_post.assert_called_once_with('{}/data'.format(FUSEKI_HARVEST_ENDPOINT_URL),
-                                                   data=g, headers=HEADERS_CONTENT_TYPE_RDF_XML)
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/data'.format(FUSEKI_HARVEST_ENDPOINT_URL), data=g.serialize(format='xml').encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_RDF_XML, timeout=client.timeout)
 
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.post')
-    def test_create_dataset_unsuccessful_404(self, mock_requests_post, mock_fuseki_is_available):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_unsuccessful_404(self, mock_get_session, mock_fuseki_is_available):
         """ Tests create gets 404 from server """
 
         uri = "http://example.org/datasets/1"
         g = Graph()
         g.add((URIRef(uri), RDF.type, self.DCAT.Dataset))
 
-        mock_requests_post.return_value.status_code = 404
+        mock_get_session.return_value.post.return_value.status_code = 404
         mock_fuseki_is_available.return_value = True
 
         client = FusekiTriplestoreClient()
         client.create_dataset_in_triplestore(g, uri)
 
-        mock_requests_post.assert_called_once_with('{}/data'.format(FUSEKI_ENDPOINT_URL),
-                                                   data=g, headers=HEADERS_CONTENT_TYPE_TURTLE)
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/data'.format(FUSEKI_ENDPOINT_URL), data=g.serialize(format='turtle').encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_TURTLE, timeout=client.timeout)
 
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.requests.post')
-    def test_create_dataset_base_ds_name_none(self, mock_requests_post, mock_fuseki_is_available):
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_base_ds_name_none(self, mock_get_session, mock_fuseki_is_available):
         """ Tests create gets 404 from server """
 
         uri = "http://example.org/datasets/1"
@@ -243,75 +304,73 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
         client = FusekiTriplestoreClient()
         client._create_dataset_in_triplestore_base(g, uri, None, CONTENT_TYPE_RDF_XML)
 
-        mock_requests_post.assert_not_called()
+        mock_get_session.return_value.post.assert_not_called()
 
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.setQuery')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.query')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    def test_delete_dataset(self, mock_sparql_query, mock_sparql_set_query, mock_fuseki_is_available):
+    def test_delete_dataset(self, mock_get_session, mock_fuseki_is_available):
         """ Tests query for deletion is set properly """
 
         test_uri = URIRef("http://example.org/datasets/1")
 
         mock_fuseki_is_available.return_value = True
+        mock_get_session.return_value.post.return_value.status_code = 200
 
         client = FusekiTriplestoreClient()
         client.delete_dataset_in_triplestore(test_uri)
 
-        # set_query() is called in SPARQLWrapper-init() as well, so we can't check for called_once
-        self.assertEqual(mock_sparql_set_query.call_count, 2)
-        mock_sparql_set_query.assert_called_with(DELETE_DATASET_BY_URI_SPARQL_QUERY % {'uri': str(test_uri)})
-        mock_sparql_query.assert_called_once_with()
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/update'.format(FUSEKI_ENDPOINT_URL),
+            data=(DELETE_DATASET_BY_URI_SPARQL_QUERY % {'uri': str(test_uri)}).encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_SPARQL_UPDATE, timeout=client.timeout)
 
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.setQuery')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.query')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
     @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', FUSEKI_SHACL_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    def test_delete_dataset_mqa(self, mock_sparql_query, mock_sparql_set_query, mock_fuseki_is_available):
+    def test_delete_dataset_mqa(self, mock_get_session, mock_fuseki_is_available):
         """ Tests query for MQA deletion is set properly """
 
         test_uri = URIRef("http://example.org/datasets/1")
 
         mock_fuseki_is_available.return_value = True
+        mock_get_session.return_value.post.return_value.status_code = 200
 
         client = FusekiTriplestoreClient()
         client.delete_dataset_in_triplestore_mqa(test_uri)
 
-        # set_query() is called in SPARQLWrapper-init() as well, so we can't check for called_once
-        self.assertEqual(mock_sparql_set_query.call_count, 2)
-        mock_sparql_set_query.assert_called_with(
-            DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY % {'uri': str(test_uri)})
-        mock_sparql_query.assert_called_once_with()
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/update'.format(FUSEKI_SHACL_ENDPOINT_URL),
+            data=(DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY % {'uri': str(test_uri)}).encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_SPARQL_UPDATE, timeout=client.timeout)
 
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.setQuery')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.query')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
     @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    def test_delete_dataset_harvest_info(self, mock_sparql_query, mock_sparql_set_query, mock_fuseki_is_available):
+    def test_delete_dataset_harvest_info(self, mock_get_session, mock_fuseki_is_available):
         """ Tests query for harvest_info deletion is set properly """
 
         test_uri = URIRef("http://example.org/datasets/1")
 
         mock_fuseki_is_available.return_value = True
+        mock_get_session.return_value.post.return_value.status_code = 200
 
         client = FusekiTriplestoreClient()
         client.delete_dataset_in_triplestore_harvest_info(test_uri)
 
-        # set_query() is called in SPARQLWrapper-init() as well, so we can't check for called_once
-        self.assertEqual(mock_sparql_set_query.call_count, 2)
-        mock_sparql_set_query.assert_called_with(
-            DELETE_DATASET_FROM_HARVEST_INFO_QUERY % {'uri': str(test_uri)})
-        mock_sparql_query.assert_called_once_with()
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/update'.format(FUSEKI_HARVEST_ENDPOINT_URL),
+            data=(DELETE_DATASET_FROM_HARVEST_INFO_QUERY % {'uri': str(test_uri)}).encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_SPARQL_UPDATE, timeout=client.timeout)
 
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
-    @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.query')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
     @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
-    def test_delete_dataset_base_ds_name_none(self, mock_sparql_query, mock_fuseki_is_available):
+    def test_delete_dataset_base_ds_name_none(self, mock_get_session, mock_fuseki_is_available):
         """ Tests query for deletion is set properly """
 
         test_uri = URIRef("http://example.org/datasets/1")
@@ -321,7 +380,306 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
         client = FusekiTriplestoreClient()
         client._delete_dataset_in_triplestore_base(test_uri, DELETE_DATASET_BY_URI_SPARQL_QUERY, None)
 
-        mock_sparql_query.assert_not_called()
+        mock_get_session.return_value.post.assert_not_called()
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_delete_dataset_bad_query(self, mock_get_session):
+        """ Tests if an error response of the update endpoint is raised as SPARQLWrapper exception """
+
+        mock_get_session.return_value.post.return_value.status_code = 400
+
+        client = FusekiTriplestoreClient()
+        with self.assertRaises(QueryBadFormed):
+            client.delete_dataset_in_triplestore(URIRef("http://example.org/datasets/1"))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_upsert_datasets(self, mock_get_session):
+        """ Tests if multiple datasets are replaced with one single update request """
+
+        test_uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        graph = Graph()
+        graph.add((test_uris[0], RDF.type, self.DCAT.Dataset))
+        graph.add((test_uris[0], self.DCAT.keyword, Literal('test')))
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.upsert_datasets_in_triplestore([(test_uris[0], graph), (test_uris[1], None)])
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_ENDPOINT_URL))
+        self.assertEqual(query.count('DELETE'), 2)
+        self.assertEqual(query.count('INSERT DATA'), 1)
+        self.assertIn(DELETE_DATASET_BY_URI_SPARQL_QUERY % {'uri': str(test_uris[0])}, query)
+        self.assertIn(DELETE_DATASET_BY_URI_SPARQL_QUERY % {'uri': str(test_uris[1])}, query)
+        self.assertIn('<http://example.org/datasets/1> <http://www.w3.org/ns/dcat#keyword> "test" .', query)
+        self.assertLess(query.index(DELETE_DATASET_BY_URI_SPARQL_QUERY % {'uri': str(test_uris[0])}),
+                        query.index('INSERT DATA'))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_upsert_datasets_harvest_info_blank_nodes(self, mock_get_session):
+        """ Tests if blank nodes of different datasets get distinct labels within one update request """
+
+        test_uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        datasets = []
+        for uri in test_uris:
+            graph = Graph()
+            graph.add((uri, self.DCAT.distribution, BNode('dist')))
+            datasets.append((uri, graph))
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.upsert_datasets_in_triplestore_harvest_info(datasets)
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_HARVEST_ENDPOINT_URL))
+        self.assertEqual(query.count('INSERT DATA'), 1)
+        self.assertIn('_:d0xdist .', query)
+        self.assertIn('_:d1xdist .', query)
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_upsert_datasets_harvest_info_bulk_delete(self, mock_get_session):
+        """ Tests if the old harvest info of all datasets is deleted with one single operation """
+
+        test_uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        graph = Graph()
+        graph.add((test_uris[0], FOAF.knows, Literal('source-id')))
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.upsert_datasets_in_triplestore_harvest_info([(test_uris[0], graph), (test_uris[1], None)])
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_HARVEST_ENDPOINT_URL))
+        self.assertEqual(query.count('DELETE'), 1)
+        self.assertIn(DELETE_DATASETS_FROM_HARVEST_INFO_QUERY % {
+            'uris': '<http://example.org/datasets/1> <http://example.org/datasets/2>'}, query)
+        self.assertEqual(query.count('INSERT DATA'), 1)
+        self.assertIn('<http://example.org/datasets/1> <http://xmlns.com/foaf/0.1/knows> "source-id" .', query)
+        self.assertLess(query.index('DELETE'), query.index('INSERT DATA'))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_upsert_datasets_harvest_info_delete_only(self, mock_get_session):
+        """ Tests if no INSERT DATA block is sent if the harvest info is only deleted """
+
+        test_uri = URIRef("http://example.org/datasets/1")
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.upsert_datasets_in_triplestore_harvest_info([(test_uri, None)])
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_HARVEST_ENDPOINT_URL))
+        self.assertEqual(query, DELETE_DATASETS_FROM_HARVEST_INFO_QUERY % {'uris': '<%s>' % test_uri})
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', FUSEKI_SHACL_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_delete_datasets_mqa(self, mock_get_session):
+        """ Tests if the validation reports of multiple datasets are deleted with one single request """
+
+        test_uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.delete_datasets_in_triplestore_mqa(test_uris)
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_SHACL_ENDPOINT_URL))
+        self.assertEqual(
+            query,
+            ' ;\n'.join([DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY % {'uri': str(uri)} for uri in test_uris]))
+
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', None)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    def test_upsert_datasets_base_ds_name_none(self, mock_get_session):
+        """ Tests if no request is sent when no datastore name is configured or no datasets are given """
+
+        client = FusekiTriplestoreClient()
+        client.upsert_datasets_in_triplestore([(URIRef("http://example.org/datasets/1"), None)])
+        client._upsert_datasets_in_triplestore_base([], DELETE_DATASET_BY_URI_SPARQL_QUERY, FUSEKI_BASE_DS_NAME)
+
+        mock_get_session.return_value.post.assert_not_called()
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.batch_size', '0')
+    def test_load_config_batch_size(self):
+        """ Tests if the batch size is at least 1 """
+
+        client = FusekiTriplestoreClient()
+
+        self.assertEqual(client.batch_size, 1)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.named_graphs', 'true')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_named_graph(self, mock_get_session):
+        """ Tests if the named graph of the dataset is replaced in the named graph storage mode """
+
+        uri = "http://example.org/datasets/1"
+        g = Graph()
+        g.add((URIRef(uri), RDF.type, self.DCAT.Dataset))
+        mock_get_session.return_value.put.return_value.status_code = 201
+
+        client = FusekiTriplestoreClient()
+        client.create_dataset_in_triplestore(g, uri)
+
+        mock_get_session.return_value.put.assert_called_once_with(
+            '{}/data'.format(FUSEKI_ENDPOINT_URL), params={'graph': uri},
+            data=g.serialize(format='turtle').encode('utf-8'), headers=HEADERS_CONTENT_TYPE_TURTLE,
+            timeout=client.timeout)
+        mock_get_session.return_value.post.assert_not_called()
+
+    @helpers.change_config('ckanext.dcatde.rdf.wire_format', 'ntriples')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_wire_format_ntriples(self, mock_get_session):
+        """ Tests if a rdflib graph is uploaded as N-Triples if the wire format is configured """
+
+        uri = "http://example.org/datasets/1"
+        g = Graph()
+        g.add((URIRef(uri), RDF.type, self.DCAT.Dataset))
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.create_dataset_in_triplestore(g, uri)
+
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/data'.format(FUSEKI_ENDPOINT_URL), data=g.serialize(format='nt').encode('utf-8'),
+            headers={'Content-Type': 'application/n-triples'}, timeout=client.timeout)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_create_dataset_serialized_graph(self, mock_get_session):
+        """ Tests if a serialized graph is uploaded unchanged as Turtle """
+
+        uri = "http://example.org/datasets/1"
+        rdf = '<%s> a <http://www.w3.org/ns/dcat#Dataset> .' % uri
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.create_dataset_in_triplestore(rdf, uri)
+
+        mock_get_session.return_value.post.assert_called_once_with(
+            '{}/data'.format(FUSEKI_ENDPOINT_URL), data=rdf.encode('utf-8'),
+            headers=HEADERS_CONTENT_TYPE_TURTLE, timeout=client.timeout)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.named_graphs', 'true')
+    @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', FUSEKI_SHACL_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_delete_dataset_mqa_named_graph(self, mock_get_session):
+        """ Tests if the named graph of the dataset is deleted in the named graph storage mode """
+
+        test_uri = URIRef("http://example.org/datasets/1")
+        mock_get_session.return_value.delete.return_value.status_code = 404
+
+        client = FusekiTriplestoreClient()
+        client.delete_dataset_in_triplestore_mqa(test_uri)
+
+        mock_get_session.return_value.delete.assert_called_once_with(
+            '{}/data'.format(FUSEKI_SHACL_ENDPOINT_URL), params={'graph': str(test_uri)},
+            timeout=client.timeout)
+        mock_get_session.return_value.post.assert_not_called()
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.named_graphs', 'true')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_upsert_datasets_named_graphs(self, mock_get_session):
+        """ Tests if the named graphs of the datasets are replaced in the named graph storage mode """
+
+        test_uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        graph = Graph()
+        graph.add((test_uris[0], RDF.type, self.DCAT.Dataset))
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.upsert_datasets_in_triplestore([(test_uris[0], graph), (test_uris[1], None)])
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_ENDPOINT_URL))
+        self.assertNotIn(DELETE_DATASET_BY_URI_SPARQL_QUERY % {'uri': str(test_uris[0])}, query)
+        self.assertIn(DROP_GRAPH_SPARQL_QUERY % {'uri': str(test_uris[0])}, query)
+        self.assertIn(DROP_GRAPH_SPARQL_QUERY % {'uri': str(test_uris[1])}, query)
+        self.assertIn(INSERT_DATA_INTO_GRAPH_SPARQL_QUERY % {
+            'uri': str(test_uris[0]),
+            'triples': '<http://example.org/datasets/1> '
+                       '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type> '
+                       '<http://www.w3.org/ns/dcat#Dataset> .'}, query)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', None)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient._send_sparql_update')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient._select_datasets_in_triplestore_base')
+    def test_migrate_to_named_graphs(self, mock_select, mock_send_sparql_update):
+        """ Tests if only the configured datastores containing data in the default graph are migrated """
+
+        mock_select.return_value.convert.side_effect = [
+            {'results': {'bindings': [{'count': {'value': '10'}}]}},
+            {'results': {'bindings': [{'count': {'value': '0'}}]}},
+            {'results': {'bindings': [{'count': {'value': '0'}}]}}]
+
+        client = FusekiTriplestoreClient()
+        result = client.migrate_to_named_graphs()
+
+        self.assertEqual(result, [(FUSEKI_BASE_DS_NAME, 10, 0), (FUSEKI_HARVEST_DS_NAME, 0, 0)])
+        mock_select.assert_has_calls([call(COUNT_TRIPLES_IN_DEFAULT_GRAPH_QUERY, FUSEKI_BASE_DS_NAME),
+                                      call(COUNT_TRIPLES_IN_DEFAULT_GRAPH_QUERY, FUSEKI_HARVEST_DS_NAME)],
+                                     any_order=True)
+        mock_send_sparql_update.assert_called_once_with(
+            FUSEKI_BASE_DS_NAME, MIGRATE_DATASETS_TO_NAMED_GRAPHS_QUERY, read_timeout=MIGRATION_TIMEOUT)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.LOGGER')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient._send_sparql_update')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient._select_datasets_in_triplestore_base')
+    def test_migrate_to_named_graphs_triples_left(self, mock_select, mock_send_sparql_update, mock_logger):
+        """ Tests if the triples left in the default graph are logged and only deleted with clear_default """
+        catalog = {'s': {'value': 'http://example.org/catalog'}, 'type': {'value': str(self.DCAT.Catalog)}}
+        for clear_default in [False, True]:
+            mock_select.reset_mock()
+            mock_send_sparql_update.reset_mock()
+            mock_select.return_value.convert.side_effect = [
+                {'results': {'bindings': [{'count': {'value': '10'}}]}},
+                {'results': {'bindings': [{'count': {'value': '2'}}]}},
+                {'results': {'bindings': [catalog]}}]
+
+            client = FusekiTriplestoreClient()
+            result = client.migrate_to_named_graphs(clear_default=clear_default)
+
+            self.assertEqual(result, [(FUSEKI_BASE_DS_NAME, 10, 0 if clear_default else 2)])
+            self.assertIn('http://example.org/catalog', mock_logger.warning.call_args[0][-1])
+            expected_calls = [call(FUSEKI_BASE_DS_NAME, MIGRATE_DATASETS_TO_NAMED_GRAPHS_QUERY,
+                                   read_timeout=MIGRATION_TIMEOUT)]
+            if clear_default:
+                expected_calls.append(call(FUSEKI_BASE_DS_NAME, CLEAR_DEFAULT_GRAPH_QUERY,
+                                           read_timeout=MIGRATION_TIMEOUT))
+            self.assertEqual(mock_send_sparql_update.call_args_list, expected_calls)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient._send_sparql_update')
+    @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient._select_datasets_in_triplestore_base')
+    def test_migrate_to_named_graphs_dry_run(self, mock_select, mock_send_sparql_update):
+        """ Tests if nothing is migrated with dry run """
+
+        mock_select.return_value.convert.return_value = {'results': {'bindings': [{'count': {'value': '10'}}]}}
+
+        client = FusekiTriplestoreClient()
+        result = client.migrate_to_named_graphs(dry_run=True)
+
+        self.assertEqual(result, [(FUSEKI_BASE_DS_NAME, 10, 0)])
+        mock_send_sparql_update.assert_not_called()
 
     @patch('ckanext.dcatde.triplestore.fuseki_client.FusekiTriplestoreClient.is_available')
     @patch('ckanext.dcatde.triplestore.fuseki_client.SPARQLWrapper.setQuery')
@@ -343,3 +701,116 @@ class TestFusekiTriplestoreClient(unittest.TestCase):
         self.assertEqual(result, mock_response)
         mock_sparql_query.assert_called_once_with()
         mock_sparql_set_query.assert_called_with(test_query)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.page_size', '2')
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_iter_dataset_uris_in_triplestore_harvest_info(self, mock_get_session):
+        """ Tests if the URIs are requested page by page and decoded from the streamed CSV results """
+
+        first_page = Mock(status_code=200)
+        first_page.iter_lines.return_value = iter(['s', 'http://example.org/datasets/1',
+                                                   'http://example.org/datasets/2'])
+        second_page = Mock(status_code=200)
+        second_page.iter_lines.return_value = iter(['s', 'http://example.org/datasets/3'])
+        mock_get_session.return_value.post.side_effect = [first_page, second_page]
+
+        client = FusekiTriplestoreClient()
+        result = list(client.iter_dataset_uris_in_triplestore_harvest_info('source-id'))
+
+        self.assertEqual(result, ['http://example.org/datasets/1', 'http://example.org/datasets/2',
+                                  'http://example.org/datasets/3'])
+        self.assertEqual(mock_get_session.return_value.post.call_count, 2)
+        queries = []
+        for args, kwargs in mock_get_session.return_value.post.call_args_list:
+            self.assertEqual(args, ('{}/query'.format(FUSEKI_HARVEST_ENDPOINT_URL),))
+            self.assertEqual(kwargs['headers'], {'Content-Type': CONTENT_TYPE_SPARQL_QUERY,
+                                                 'Accept': CONTENT_TYPE_CSV})
+            self.assertEqual(kwargs['stream'], True)
+            queries.append(kwargs['data'].decode('utf-8'))
+        self.assertEqual(queries, [
+            GET_URIS_FROM_HARVEST_INFO_PAGED_QUERY % {
+                'owner_org_or_source_id': 'source-id', 'after': '""', 'limit': 2},
+            GET_URIS_FROM_HARVEST_INFO_PAGED_QUERY % {
+                'owner_org_or_source_id': 'source-id', 'after': '"http://example.org/datasets/2"',
+                'limit': 2}])
+        first_page.close.assert_called_once_with()
+        second_page.close.assert_called_once_with()
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.named_graphs', 'true')
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_iter_dataset_uris_in_triplestore_harvest_info_named_graphs(self, mock_get_session):
+        """ Tests if the URIs are requested from the named graphs in the named graph storage mode """
+
+        mock_get_session.return_value.post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.iter_lines.return_value = iter(['s'])
+
+        client = FusekiTriplestoreClient()
+        result = list(client.iter_dataset_uris_in_triplestore_harvest_info('source-id'))
+
+        self.assertEqual(result, [])
+        mock_get_session.return_value.post.assert_called_once()
+        self.assertEqual(mock_get_session.return_value.post.call_args[1]['data'].decode('utf-8'),
+                         GET_URIS_FROM_HARVEST_INFO_NAMED_GRAPHS_PAGED_QUERY % {
+                             'owner_org_or_source_id': 'source-id', 'after': '""',
+                             'limit': client.page_size})
+
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_iter_dataset_uris_in_triplestore_harvest_info_error(self, mock_get_session):
+        """ Tests if an error response is raised as SPARQLWrapper exception """
+
+        mock_get_session.return_value.post.return_value.status_code = 400
+
+        client = FusekiTriplestoreClient()
+        with self.assertRaises(QueryBadFormed):
+            list(client.iter_dataset_uris_in_triplestore_harvest_info('source-id'))
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.batch_size', '2')
+    @helpers.change_config('ckanext.dcatde.fuseki.harvest.info.name', FUSEKI_HARVEST_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.shacl.store.name', FUSEKI_SHACL_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_delete_datasets(self, mock_get_session):
+        """ Tests if the datasets are deleted in chunks with one request per chunk and datastore """
+
+        uris = ['http://example.org/datasets/%s' % index for index in range(3)]
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.delete_datasets(uris)
+
+        values = ['<http://example.org/datasets/0> <http://example.org/datasets/1>',
+                  '<http://example.org/datasets/2>']
+        expected_calls = []
+        for uris_values in values:
+            for endpoint_url, query_template in [
+                    (FUSEKI_ENDPOINT_URL, DELETE_DATASETS_BY_URIS_SPARQL_QUERY),
+                    (FUSEKI_SHACL_ENDPOINT_URL, DELETE_VALIDATION_REPORTS_BY_URIS_SPARQL_QUERY),
+                    (FUSEKI_HARVEST_ENDPOINT_URL, DELETE_DATASETS_FROM_HARVEST_INFO_QUERY)]:
+                expected_calls.append(call(
+                    '{}/update'.format(endpoint_url),
+                    data=(query_template % {'uris': uris_values}).encode('utf-8'),
+                    headers=HEADERS_CONTENT_TYPE_SPARQL_UPDATE, timeout=client.timeout))
+        self.assertEqual(mock_get_session.return_value.post.call_args_list, expected_calls)
+
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.named_graphs', 'true')
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.name', FUSEKI_BASE_DS_NAME)
+    @helpers.change_config('ckanext.dcatde.fuseki.triplestore.url', FUSEKI_BASE_URL)
+    @patch('ckanext.dcatde.triplestore.fuseki_client.get_session')
+    def test_delete_datasets_named_graphs(self, mock_get_session):
+        """ Tests if the named graphs of the datasets are dropped in the named graph storage mode """
+
+        uris = ['http://example.org/datasets/1', 'http://example.org/datasets/2']
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = FusekiTriplestoreClient()
+        client.delete_datasets(uris)
+
+        query = self._get_sparql_update(mock_get_session, '{}/update'.format(FUSEKI_ENDPOINT_URL))
+        self.assertEqual(query, ' ;\n'.join(DROP_GRAPH_SPARQL_QUERY % {'uri': uri} for uri in uris))
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import unittest
+
+import pkg_resources
+from rdflib import BNode, ConjunctiveGraph, Graph, Literal, URIRef
+from rdflib.namespace import RDF, Namespace
+from ckanext.dcatde.triplestore.sparql_query_templates import GET_DATASET_BY_URI_SPARQL_QUERY
+from ckanext.dcatde.triplestore.subgraph_extractor import DatasetSubgraphExtractor
+
+DCAT = Namespace("http://www.w3.org/ns/dcat#")
+DCT = Namespace("http://purl.org/dc/terms/")
+
+
+class TestDatasetSubgraphExtractor(unittest.TestCase):
+    """
+    Test class for the DatasetSubgraphExtractor
+    """
+
+    @staticmethod
+    def _get_subgraph_by_query(graph, uri):
+        subgraph = Graph()
+        for triple in graph.query(GET_DATASET_BY_URI_SPARQL_QUERY % {'uri': uri}):
+            subgraph.add(triple)
+        return subgraph
+
+    def _assert_same_as_query(self, graph):
+        extractor = DatasetSubgraphExtractor(graph)
+        uris = list(graph.subjects(RDF.type, DCAT.Dataset))
+        self.assertTrue(len(uris) > 0)
+        for uri in uris:
+            self.assertEqual(set(extractor.get_subgraph(uri)), set(self._get_subgraph_by_query(graph, uri)))
+
+    def test_get_subgraph_same_as_query(self):
+        """ Tests if the subgraph of a real world dataset contains the same triples as the query result """
+        graph = ConjunctiveGraph()
+        graph.parse(data=pkg_resources.resource_string(__name__, "../resources/metadata_max.rdf"),
+                    format='application/rdf+xml')
+
+        self._assert_same_as_query(graph)
+
+    def test_get_subgraph_shared_nodes_and_cycles(self):
+        """ Tests if shared nodes and cycles are resolved correctly """
+        graph = Graph()
+        datasets = [URIRef("http://example.org/datasets/%s" % index) for index in range(3)]
+        publisher = URIRef("http://example.org/publisher")
+        catalog = URIRef("http://example.org/catalog")
+        graph.add((publisher, DCT.title, Literal('Publisher')))
+        graph.add((catalog, RDF.type, DCAT.Catalog))
+        for dataset in datasets:
+            distribution = BNode()
+            graph.add((dataset, RDF.type, DCAT.Dataset))
+            graph.add((dataset, DCT.publisher, publisher))
+            graph.add((dataset, DCAT.distribution, distribution))
+            graph.add((distribution, DCT.title, Literal('Distribution')))
+            graph.add((catalog, DCAT.dataset, dataset))
+        # cycle between dataset 0 and 1, dataset 2 points back to the catalog
+        graph.add((datasets[0], DCT.relation, datasets[1]))
+        graph.add((datasets[1], DCT.relation, datasets[0]))
+        graph.add((datasets[2], DCT.isPartOf, catalog))
+
+        self._assert_same_as_query(graph)
+        extractor = DatasetSubgraphExtractor(graph)
+        self.assertEqual(len(extractor.get_subgraph(datasets[0])), 11)
+        self.assertEqual(len(extractor.get_subgraph(datasets[2])), len(graph))
+
+    def test_get_subgraph_unknown_uri(self):
+        """ Tests if an empty graph is returned for an URI which is not contained in the graph """
+        graph = Graph()
+        graph.add((URIRef("http://example.org/datasets/1"), RDF.type, DCAT.Dataset))
+
+        subgraph = DatasetSubgraphExtractor(graph).get_subgraph(URIRef("http://example.org/datasets/2"))
+
+        self.assertEqual(len(subgraph), 0)
+
+    def test_get_subgraphs(self):
+        """ Tests if the subgraphs of all given URIs are returned """
+        graph = Graph()
+        uris = [URIRef("http://example.org/datasets/1"), URIRef("http://example.org/datasets/2")]
+        for uri in uris:
+            graph.add((uri, RDF.type, DCAT.Dataset))
+
+        result = dict(DatasetSubgraphExtractor(graph).get_subgraphs(uris))
+
+        self.assertCountEqual(list(result.keys()), uris)
+        for uri in uris:
+            self.assertEqual(set(result[uri]), {(uri, RDF.type, DCAT.Dataset)})
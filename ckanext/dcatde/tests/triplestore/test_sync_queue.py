@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import datetime
+import unittest
+
+from sqlalchemy import create_engine
+from ckanext.dcatde.triplestore.sync_queue import TriplestoreSyncQueue, queue_table
+
+
+class TestTriplestoreSyncQueue(unittest.TestCase):
+    """
+    Test class for the TriplestoreSyncQueue
+    """
+
+    def setUp(self):
+        self.queue = TriplestoreSyncQueue(create_engine('sqlite://'))
+
+    @staticmethod
+    def _get_items(count):
+        return [{'uri': 'http://example.org/datasets/%s' % index, 'rdf_graph': None, 'owner_org': 'org-1',
+                 'contributor_id': None, 'harvest_source_id': 'source-1', 'content_hash': None}
+                for index in range(count)]
+
+    def test_get_status_empty_queue(self):
+        """ Tests the status of an empty queue """
+        self.assertEqual(self.queue.get_status(), (0, None))
+
+    def test_process_next_batch(self):
+        """ Tests if the oldest items are passed to the callback and removed from the queue """
+        self.queue.enqueue(self._get_items(3))
+        processed_uris = []
+
+        count = self.queue.process_next_batch(2, lambda rows: processed_uris.extend(row.uri for row in rows))
+
+        self.assertEqual(count, 2)
+        self.assertEqual(processed_uris, ['http://example.org/datasets/0', 'http://example.org/datasets/1'])
+        depth, oldest = self.queue.get_status()
+        self.assertEqual(depth, 1)
+        self.assertIsNotNone(oldest)
+
+    def test_process_next_batch_callback_error(self):
+        """ Tests if the items stay in the queue if the callback raises an exception """
+        self.queue.enqueue(self._get_items(2))
+
+        def callback(rows):
+            raise ValueError('triplestore error')
+
+        with self.assertRaises(ValueError):
+            self.queue.process_next_batch(2, callback)
+
+        self.assertEqual(self.queue.get_status()[0], 2)
+
+    def test_process_next_batch_failed_uris(self):
+        """ Tests if the items which could not be updated stay in the queue until the retry delay """
+        self.queue.enqueue(self._get_items(3))
+        processed_uris = []
+
+        count = self.queue.process_next_batch(3, lambda rows: ['http://example.org/datasets/1'])
+
+        self.assertEqual(count, 2)
+        self.assertEqual(self.queue.get_status()[0], 1)
+        # the failed item is not passed to a worker before the retry delay has passed
+        self.assertEqual(self.queue.process_next_batch(3, processed_uris.extend), 0)
+        self.assertEqual(processed_uris, [])
+
+        with self.queue.engine.begin() as connection:
+            connection.execute(queue_table.update().values(
+                claimed_until=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)))
+        self.assertEqual(self.queue.process_next_batch(3, lambda rows: processed_uris.extend(
+            row.uri for row in rows)), 1)
+        self.assertEqual(processed_uris, ['http://example.org/datasets/1'])
+        self.assertEqual(self.queue.get_status()[0], 0)
+
+    def test_process_next_batch_claimed_items(self):
+        """ Tests if the items claimed by a worker are skipped by the other workers """
+        self.queue.enqueue(self._get_items(3))
+        other_worker_uris = []
+
+        def callback(rows):
+            self.queue.process_next_batch(3, lambda other_rows: other_worker_uris.extend(
+                row.uri for row in other_rows))
+            return []
+
+        self.assertEqual(self.queue.process_next_batch(2, callback), 2)
+        self.assertEqual(other_worker_uris, ['http://example.org/datasets/2'])
+        self.assertEqual(self.queue.get_status()[0], 0)
+
+    def test_process_next_batch_newest_item_per_uri(self):
+        """ Tests if only the newest item of a URI is processed and the older items are removed """
+        items = self._get_items(2)
+        self.queue.enqueue(items)
+        newest_item = dict(items[0], rdf_graph='newest')
+        self.queue.enqueue([newest_item])
+        processed = []
+
+        count = self.queue.process_next_batch(3, lambda rows: processed.extend(
+            (row.uri, row.rdf_graph) for row in rows))
+
+        self.assertEqual(count, 2)
+        self.assertEqual(processed, [('http://example.org/datasets/1', None),
+                                     ('http://example.org/datasets/0', 'newest')])
+        self.assertEqual(self.queue.get_status()[0], 0)
+
+    def test_process_next_batch_uri_claimed_by_other_worker(self):
+        """ Tests if a newer item is not claimed while an older item of the same URI is processed """
+        self.queue.enqueue(self._get_items(1))
+        other_worker_uris = []
+
+        def callback(rows):
+            self.queue.enqueue([dict(self._get_items(1)[0], rdf_graph='newer')])
+            self.queue.process_next_batch(3, lambda other_rows: other_worker_uris.extend(
+                row.uri for row in other_rows))
+            return []
+
+        self.assertEqual(self.queue.process_next_batch(3, callback), 1)
+        self.assertEqual(other_worker_uris, [])
+        # the newer item stays in the queue and is processed afterwards
+        processed = []
+        self.assertEqual(self.queue.process_next_batch(3, lambda rows: processed.extend(
+            row.rdf_graph for row in rows)), 1)
+        self.assertEqual(processed, ['newer'])
+        self.assertEqual(self.queue.get_status()[0], 0)
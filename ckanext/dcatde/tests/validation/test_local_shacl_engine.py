@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import os
+import unittest
+
+from ckanext.dcatde.validation.local_shacl_engine import LocalShaclEngine
+from ckanext.dcatde.validation.shacl_validation import DQV, SHACL, ShaclValidator
+from ckantoolkit.tests import helpers
+from mock import patch
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import RDF
+
+SHAPES_FILE = os.path.join(os.path.dirname(__file__), '..', 'resources', 'shacl_shapes_test.ttl')
+DATASET_URI = 'http://example.org/datasets/1'
+TEST_ORGANIZATION_ID = '1e17f560-2061-4219-a37d-61e2fce75336'
+DATASET_WITHOUT_TITLE = '<%s> a <http://www.w3.org/ns/dcat#Dataset> .' % DATASET_URI
+
+
+class TestLocalShaclEngine(unittest.TestCase):
+    """
+    Test class for the LocalShaclEngine
+    """
+
+    def test_validate(self):
+        """ Tests if the report query is applied to the validation report """
+        engine = LocalShaclEngine(SHAPES_FILE)
+        report_query = ShaclValidator._get_report_query(DATASET_URI, TEST_ORGANIZATION_ID, None)
+
+        result = engine.validate(DATASET_WITHOUT_TITLE, 'text/turtle', report_query)
+
+        report = Graph()
+        report.parse(data=result, format='xml')
+        report_node = next(report.subjects(RDF.type, SHACL.ValidationReport))
+        self.assertIn((report_node, SHACL.conforms, Literal(False)), report)
+        self.assertIn((report_node, DQV.computedOn, URIRef(DATASET_URI)), report)
+        self.assertEqual(len(list(report.subjects(RDF.type, SHACL.ValidationResult))), 1)
+
+    @patch('ckanext.dcatde.validation.local_shacl_engine.ProcessPoolExecutor')
+    def test_validate_process_pool(self, mock_executor):
+        """ Tests if the graphs are validated in the process pool if there are multiple workers """
+        engine = LocalShaclEngine(SHAPES_FILE, 2)
+
+        result = engine.validate(DATASET_WITHOUT_TITLE, 'text/turtle', 'query')
+        engine.validate(DATASET_WITHOUT_TITLE, 'text/turtle', 'query')
+
+        mock_executor.assert_called_once()
+        self.assertEqual(mock_executor.call_args[1]['max_workers'], 2)
+        self.assertEqual(mock_executor.return_value.submit.call_count, 2)
+        self.assertEqual(result, mock_executor.return_value.submit.return_value.result.return_value)
+
+    def test_from_config_without_shapes_file(self):
+        """ Tests if no engine is returned if the shapes file isn't configured """
+        self.assertIsNone(LocalShaclEngine.from_config())
+
+    @helpers.change_config('ckanext.dcatde.shacl_validator.local_workers', '3')
+    @helpers.change_config('ckanext.dcatde.shacl_validator.shapes_file', SHAPES_FILE)
+    def test_from_config(self):
+        """ Tests if the engine is created with the configured shapes file and workers """
+        engine = LocalShaclEngine.from_config()
+
+        self.assertEqual(engine.shapes_file, SHAPES_FILE)
+        self.assertEqual(engine.workers, 3)
+
+    @helpers.change_config('ckanext.dcatde.shacl.validator.profile.type', 'all')
+    @helpers.change_config('ckanext.dcatde.shacl_validator.shapes_file', SHAPES_FILE)
+    @helpers.change_config('ckanext.dcatde.shacl_validator.engine', 'local')
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_shacl_validator_with_local_engine(self, mock_get_session):
+        """ Tests if the ShaclValidator uses the local engine instead of the validator service """
+        client = ShaclValidator()
+
+        result = client.validate(DATASET_WITHOUT_TITLE, DATASET_URI, TEST_ORGANIZATION_ID)
+
+        self.assertTrue(client.is_enabled())
+        self.assertIsNotNone(result)
+        mock_get_session.return_value.post.assert_not_called()
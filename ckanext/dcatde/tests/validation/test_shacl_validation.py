@@ -1,8 +1,11 @@
+import json
 import unittest
 
 from ckanext.dcatde.validation.shacl_validation import ShaclValidator
 from ckantoolkit.tests import helpers
 from mock import patch
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDF
 
 VALIDATOR_API_URL = "http://foo:8050/shacl/dcat-ap.de/api/"
 VALIDATION_PROFILE = "all"
@@ -64,11 +67,11 @@ class TestShaclValidatorClient(unittest.TestCase):
 
 
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
-    @patch('ckanext.dcatde.validation.shacl_validation.requests.post')
-    def test_validate_fail_validator_responds_with_bad_status(self, mock_requests_post, mock_validator_get_config):
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_fail_validator_responds_with_bad_status(self, mock_get_session, mock_validator_get_config):
         """ Tests if validate() returns None if the post request has a bad status response """
 
-        mock_requests_post.return_value.status_code = 404
+        mock_get_session.return_value.post.return_value.status_code = 404
         mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
 
         client = ShaclValidator()
@@ -78,15 +81,15 @@ class TestShaclValidatorClient(unittest.TestCase):
 
 
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
-    @patch('ckanext.dcatde.validation.shacl_validation.requests.post')
-    def test_validate_successful_request(self, mock_requests_post, mock_validator_get_config):
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_successful_request(self, mock_get_session, mock_validator_get_config):
         """ Tests if validate() returns the expected value if the post request is successful """
 
         contributor_id = 'http://dcat-ap.de/def/contributors/test'
 
         expected_repsonse = "SUCCESS"
-        mock_requests_post.return_value.status_code = 200
-        mock_requests_post.return_value.text = expected_repsonse
+        mock_get_session.return_value.post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.text = expected_repsonse
         mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
 
         client = ShaclValidator()
@@ -95,16 +98,16 @@ class TestShaclValidatorClient(unittest.TestCase):
         self.assertEqual(result, expected_repsonse)
 
     @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
-    @patch('ckanext.dcatde.validation.shacl_validation.requests.post')
-    def test_validate_successful_request_without_contributor_id(self, mock_requests_post,
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_successful_request_without_contributor_id(self, mock_get_session,
                                                                 mock_validator_get_config):
         """ Tests if validate() returns the expected value if the post request is successful 
             without contributorID
         """
 
         expected_repsonse = "SUCCESS"
-        mock_requests_post.return_value.status_code = 200
-        mock_requests_post.return_value.text = expected_repsonse
+        mock_get_session.return_value.post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.text = expected_repsonse
         mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
 
         client = ShaclValidator()
@@ -112,6 +115,93 @@ class TestShaclValidatorClient(unittest.TestCase):
 
         self.assertEqual(result, expected_repsonse)
 
+    @helpers.change_config('ckanext.dcatde.rdf.wire_format', 'ntriples')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_graph_wire_format_ntriples(self, mock_get_session, mock_validator_get_config):
+        """ Tests if validate() sends a rdflib graph as N-Triples if the wire format is configured """
+
+        graph = Graph()
+        graph.add((URIRef('http://example.org/datasets/1'), RDF.type,
+                   URIRef('http://www.w3.org/ns/dcat#Dataset')))
+        mock_get_session.return_value.post.return_value.status_code = 200
+        mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
+
+        client = ShaclValidator()
+        client.validate(graph, DATASET_TEST_URI, TEST_ORGANIZATION_ID)
+
+        body = json.loads(mock_get_session.return_value.post.call_args[1]['data'])
+        self.assertEqual(body['contentSyntax'], 'application/n-triples')
+        self.assertEqual(body['contentToValidate'], graph.serialize(format='nt'))
+
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_rdf_format(self, mock_get_session, mock_validator_get_config):
+        """ Tests if validate() sends the given content syntax of the serialized graph """
+
+        mock_get_session.return_value.post.return_value.status_code = 200
+        mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
+
+        client = ShaclValidator()
+        client.validate(TEST_QUERY, DATASET_TEST_URI, TEST_ORGANIZATION_ID)
+        client.validate(TEST_QUERY, DATASET_TEST_URI, TEST_ORGANIZATION_ID,
+                        rdf_format='application/n-triples')
+
+        content_syntaxes = [json.loads(args[1]['data'])['contentSyntax']
+                            for args in mock_get_session.return_value.post.call_args_list]
+        self.assertEqual(content_syntaxes, ['text/turtle', 'application/n-triples'])
+
+
+    @helpers.change_config('ckanext.dcatde.shacl_validator.cache.max_entries', '10')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidationCache')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_cached_report(self, mock_get_session, mock_validator_get_config, mock_cache):
+        """ Tests if validate() returns the cached report without requesting the validator """
+
+        mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
+        mock_cache.return_value.get.return_value = 'CACHED'
+
+        client = ShaclValidator()
+        result = client.validate(TEST_QUERY, DATASET_TEST_URI, TEST_ORGANIZATION_ID, content_hash='hash')
+
+        self.assertEqual(result, 'CACHED')
+        mock_cache.assert_called_once_with(VALIDATION_PROFILE, 10)
+        mock_cache.return_value.get.assert_called_once_with('hash')
+        mock_get_session.return_value.post.assert_not_called()
+
+    @helpers.change_config('ckanext.dcatde.shacl_validator.cache.max_entries', '10')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidationCache')
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_stores_report_in_cache(self, mock_get_session, mock_validator_get_config,
+                                             mock_cache):
+        """ Tests if validate() stores the report in the cache if it isn't cached yet """
+
+        mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
+        mock_get_session.return_value.post.return_value.status_code = 200
+        mock_get_session.return_value.post.return_value.text = 'SUCCESS'
+        mock_cache.return_value.get.side_effect = ValueError('database error')
+
+        client = ShaclValidator()
+        result = client.validate(TEST_QUERY, DATASET_TEST_URI, TEST_ORGANIZATION_ID, content_hash='hash')
+
+        self.assertEqual(result, 'SUCCESS')
+        mock_cache.return_value.put.assert_called_once_with('hash', 'SUCCESS')
+
+    @patch('ckanext.dcatde.validation.shacl_validation.ShaclValidator._get_validator_config')
+    @patch('ckanext.dcatde.validation.shacl_validation.get_session')
+    def test_validate_cache_not_activated(self, mock_get_session, mock_validator_get_config):
+        """ Tests if the cache is not used if it isn't activated """
+
+        mock_validator_get_config.return_value = VALIDATOR_API_URL, VALIDATION_PROFILE
+        mock_get_session.return_value.post.return_value.status_code = 200
+
+        client = ShaclValidator()
+        client.validate(TEST_QUERY, DATASET_TEST_URI, TEST_ORGANIZATION_ID, content_hash='hash')
+
+        self.assertIsNone(client.cache)
+        mock_get_session.return_value.post.assert_called_once()
 
     def test_get_report_query(self):
         """ Tests if get_report_query() returns the expected Query """
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+import datetime
+import threading
+import unittest
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS
+from mock import patch
+from sqlalchemy import create_engine, select
+from ckanext.dcatde.validation.validation_cache import ShaclValidationCache, cache_table, get_content_hash
+
+
+class TestShaclValidationCache(unittest.TestCase):
+    """
+    Test class for the ShaclValidationCache
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.cache = ShaclValidationCache('profile-1', 2, self.engine, eviction_interval=1,
+                                          last_used_interval=0)
+
+    def test_get_not_cached(self):
+        """ Tests if None is returned for an unknown key """
+        self.assertIsNone(self.cache.get('unknown'))
+
+    def test_put_and_get(self):
+        """ Tests if a stored report is returned and replaced if stored again """
+        self.cache.put('key-1', 'report-1')
+        self.cache.put('key-1', 'report-2')
+
+        self.assertEqual(self.cache.get('key-1'), 'report-2')
+
+    def test_put_evicts_least_recently_used(self):
+        """ Tests if the least recently used report is removed if the cache is full """
+        self.cache.put('key-1', 'report-1')
+        self.cache.put('key-2', 'report-2')
+        self.cache.get('key-1')
+
+        self.cache.put('key-3', 'report-3')
+
+        self.assertEqual(self.cache.get('key-1'), 'report-1')
+        self.assertIsNone(self.cache.get('key-2'))
+        self.assertEqual(self.cache.get('key-3'), 'report-3')
+
+    def test_put_evicts_every_interval(self):
+        """ Tests if the least recently used reports are removed only every eviction_interval reports """
+        cache = ShaclValidationCache('profile-1', 2, self.engine, eviction_interval=3)
+        for number in range(1, 6):
+            cache.put('key-%s' % number, 'report-%s' % number)
+
+        # evicted with the third report
+        self.assertIsNone(cache.get('key-1'))
+        # stored after the eviction
+        self.assertEqual(cache.get('key-4'), 'report-4')
+        self.assertEqual(cache.get('key-5'), 'report-5')
+
+        cache.put('key-6', 'report-6')
+
+        self.assertIsNone(cache.get('key-2'))
+        self.assertIsNone(cache.get('key-3'))
+        self.assertIsNone(cache.get('key-4'))
+
+    def test_setup_once_with_threads(self):
+        """ Tests if the table is set up only once if the cache is used by several threads """
+        cache = ShaclValidationCache('profile-1', 2, self.engine)
+        with patch.object(cache_table, 'create', wraps=cache_table.create) as mock_create:
+            threads = [threading.Thread(target=cache.setup) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        mock_create.assert_called_once_with(bind=self.engine, checkfirst=True)
+
+    def test_profile_change_invalidates_cache(self):
+        """ Tests if the reports of another validator profile are removed """
+        self.cache.put('key-1', 'report-1')
+
+        cache = ShaclValidationCache('profile-2', 2, self.engine)
+
+        self.assertIsNone(cache.get('key-1'))
+        self.assertIsNone(ShaclValidationCache('profile-1', 2, self.engine).get('key-1'))
+
+    def test_get_updates_last_used_after_interval(self):
+        """ Tests if the time of the last use is updated only if it is older than the interval """
+        cache = ShaclValidationCache('profile-1', 2, self.engine)
+        cache.put('key-1', 'report-1')
+        last_used = self._get_last_used('key-1')
+
+        self.assertEqual(cache.get('key-1'), 'report-1')
+        self.assertEqual(self._get_last_used('key-1'), last_used)
+
+        old_last_used = datetime.datetime.utcnow() - datetime.timedelta(hours=2)
+        with self.engine.begin() as connection:
+            connection.execute(cache_table.update().values(last_used=old_last_used))
+
+        self.assertEqual(cache.get('key-1'), 'report-1')
+        self.assertGreater(self._get_last_used('key-1'), old_last_used)
+
+    def test_get_content_hash(self):
+        """ Tests if the hash doesn't depend on the blank node labels, but on all other inputs """
+        uri = URIRef('http://example.org/datasets/1')
+        graphs = []
+        for _ in range(2):
+            graph = Graph()
+            publisher = BNode()
+            graph.add((uri, DCTERMS.publisher, publisher))
+            graph.add((publisher, DCTERMS.title, Literal('Publisher')))
+            graphs.append(graph)
+        content_hash = get_content_hash(graphs[0], 'org', None, 'profile-1')
+
+        self.assertEqual(get_content_hash(graphs[1], 'org', None, 'profile-1'), content_hash)
+        self.assertNotEqual(get_content_hash(graphs[1], 'other-org', None, 'profile-1'), content_hash)
+        self.assertNotEqual(get_content_hash(graphs[1], 'org', 'contributor', 'profile-1'), content_hash)
+        self.assertNotEqual(get_content_hash(graphs[1], 'org', None, 'profile-2'), content_hash)
+        graphs[1].add((uri, DCTERMS.title, Literal('Title')))
+        self.assertNotEqual(get_content_hash(graphs[1], 'org', None, 'profile-1'), content_hash)
+
+    def _get_last_used(self, cache_key):
+        with self.engine.connect() as connection:
+            return connection.execute(select(cache_table.c.last_used)
+                                      .where(cache_table.c.cache_key == cache_key)).scalar()
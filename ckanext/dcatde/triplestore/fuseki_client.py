@@ -2,15 +2,39 @@
 # -*- coding: utf8 -*-
 """ Fuseki Client Implementation """
 
+import csv
 import logging
 import os
+from contextlib import closing
 
 from ckan.plugins import toolkit as tk
 import requests
+from rdflib import BNode, Graph, Literal
 from SPARQLWrapper import SPARQLWrapper, POST, JSON
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError, EndPointNotFound, QueryBadFormed, \
+    SPARQLWrapperException, Unauthorized
+from ckanext.dcatde.http_session import get_session, get_timeout, prepare_body
+from ckanext.dcatde.rdf_wire_format import get_wire_format, serialize_graph
+from ckanext.dcatde.service_health import ServiceHealthMonitor
 from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASET_BY_URI_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASETS_BY_URIS_SPARQL_QUERY
 from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASET_FROM_HARVEST_INFO_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_DATASETS_FROM_HARVEST_INFO_QUERY
 from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DELETE_VALIDATION_REPORTS_BY_URIS_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import INSERT_DATA_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import DROP_GRAPH_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import INSERT_DATA_INTO_GRAPH_SPARQL_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import CLEAR_DEFAULT_GRAPH_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import COUNT_TRIPLES_IN_DEFAULT_GRAPH_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import GET_SUBJECTS_IN_DEFAULT_GRAPH_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import GET_URIS_FROM_HARVEST_INFO_PAGED_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import \
+    GET_URIS_FROM_HARVEST_INFO_NAMED_GRAPHS_PAGED_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import MIGRATE_DATASETS_TO_NAMED_GRAPHS_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import MIGRATE_HARVEST_INFO_TO_NAMED_GRAPHS_QUERY
+from ckanext.dcatde.triplestore.sparql_query_templates import \
+    MIGRATE_VALIDATION_REPORTS_TO_NAMED_GRAPHS_QUERY
 
 LOGGER = logging.getLogger(__name__)
 
@@ -21,6 +45,26 @@ PING_ENDPOINT = '$/ping'
 
 CONTENT_TYPE_RDF_XML = 'application/rdf+xml'
 CONTENT_TYPE_TURTLE = 'text/turtle'
+CONTENT_TYPE_SPARQL_UPDATE = 'application/sparql-update; charset=utf-8'
+CONTENT_TYPE_SPARQL_QUERY = 'application/sparql-query; charset=utf-8'
+CONTENT_TYPE_CSV = 'text/csv'
+
+SPARQL_ERRORS_BY_STATUS_CODE = {
+    400: QueryBadFormed,
+    401: Unauthorized,
+    404: EndPointNotFound,
+    500: EndPointInternalError
+}
+
+CONFIG_PARAM_BATCH_SIZE = 'ckanext.dcatde.fuseki.triplestore.batch_size'
+DEFAULT_BATCH_SIZE = 50
+CONFIG_PARAM_NAMED_GRAPHS = 'ckanext.dcatde.fuseki.triplestore.named_graphs'
+CONFIG_PARAM_PAGE_SIZE = 'ckanext.dcatde.fuseki.triplestore.page_size'
+DEFAULT_PAGE_SIZE = 10000
+
+MIGRATION_TIMEOUT = 3600
+# Number of subjects left in the default graph after migrating to named graphs which are logged
+MAX_LOGGED_DEFAULT_GRAPH_SUBJECTS = 10
 
 
 class FusekiTriplestoreClient(object):
@@ -28,6 +72,13 @@ class FusekiTriplestoreClient(object):
 
     def __init__(self):
         self.fuseki_base_url, self.ds_name_default, self.ds_name_shacl_validation, self.ds_name_harvest_info = self._get_fuseki_config()
+        self.batch_size = max(tk.asint(tk.config.get(CONFIG_PARAM_BATCH_SIZE, DEFAULT_BATCH_SIZE)), 1)
+        self.named_graphs = tk.asbool(tk.config.get(CONFIG_PARAM_NAMED_GRAPHS, False))
+        self.page_size = max(tk.asint(tk.config.get(CONFIG_PARAM_PAGE_SIZE, DEFAULT_PAGE_SIZE)), 1)
+        self.wire_format = get_wire_format()
+        self.health = ServiceHealthMonitor.from_config(u'Fuseki')
+        self.session = get_session()
+        self.timeout = get_timeout()
 
     def delete_dataset_in_triplestore(self, uri):
         """
@@ -66,21 +117,151 @@ class FusekiTriplestoreClient(object):
             LOGGER.debug(u'No datastore name is given! Skipping...')
             return
         LOGGER.debug(u'Deleting in triplestore: Datastore name: %s, Dataset with URI %s', datastore_name, uri)
-        result = self._query_sparql_wrapper(datastore_name, query_template)
-        status_code = result.response.getcode()
+        if self.named_graphs:
+            self._delete_named_graph(uri, datastore_name)
+            return
+        response = self._send_sparql_update(datastore_name, query_template)
+        status_code = response.status_code
         if status_code == 200:
             LOGGER.debug(u'Dataset in triple store successfully deleted')
         else:
             LOGGER.warning(u'Error! Deleting dataset URI %s response status != 200: %s', uri,
                            str(status_code))
 
-    def create_dataset_in_triplestore(self, graph, uri):
+    def upsert_datasets_in_triplestore(self, datasets):
+        """
+        Replaces multiple datasets in the triplestore with one single SPARQL update request
+        :param datasets: list of tuples (uri, graph), if graph is None the dataset is only deleted
+        """
+        self._upsert_datasets_in_triplestore_base(
+            datasets, DELETE_DATASET_BY_URI_SPARQL_QUERY, self.ds_name_default)
+
+    def upsert_datasets_in_triplestore_harvest_info(self, datasets):
+        """
+        Replaces the harvest info of multiple datasets with one single SPARQL update request. The old
+        harvest info of all datasets is deleted with one bulk operation and the new one is inserted with one
+        INSERT DATA block.
+        :param datasets: list of tuples (uri, graph), if graph is None the harvest info is only deleted
+        """
+        if self.named_graphs:
+            self._upsert_datasets_in_triplestore_base(
+                datasets, DELETE_DATASET_FROM_HARVEST_INFO_QUERY, self.ds_name_harvest_info)
+            return
+        if not self.ds_name_harvest_info:
+            LOGGER.debug(u'No datastore name is given! Skipping...')
+            return
+        if not datasets:
+            return
+        operations = [DELETE_DATASETS_FROM_HARVEST_INFO_QUERY % {
+            'uris': _format_uris_as_values([uri for uri, _ in datasets])}]
+        triples = [_serialize_as_sparql_triples(graph, u'd{0}x'.format(index))
+                   for index, (_, graph) in enumerate(datasets) if graph is not None and len(graph) > 0]
+        if triples:
+            operations.append(INSERT_DATA_SPARQL_QUERY % {'triples': u'\n'.join(triples)})
+        LOGGER.debug(u'Updating the harvest info of %s datasets in triplestore.', len(datasets))
+        response = self._send_sparql_update(self.ds_name_harvest_info, u' ;\n'.join(operations))
+        status_code = response.status_code
+        if status_code == 200:
+            LOGGER.debug(u'Harvest info in triple store successfully updated')
+        else:
+            LOGGER.warning(u'Error! Updating the harvest info of %s datasets response status != 200: %s',
+                           len(datasets), str(status_code))
+
+    def delete_datasets_in_triplestore_mqa(self, uris):
+        """
+        Delete the validation reports of multiple datasets with one single SPARQL update request
+        :param uris: the uris of the datasets
+        """
+        self._upsert_datasets_in_triplestore_base(
+            [(uri, None) for uri in uris], DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY,
+            self.ds_name_shacl_validation)
+
+    def delete_datasets(self, uris):
+        """
+        Deletes multiple datasets, their validation reports and their harvest info from the triplestore.
+        The URIs are deleted in chunks of the configured batch size with one SPARQL update request per chunk
+        and datastore.
+        :param uris: the uris of the datasets
+        """
+        uris = list(uris)
+        for start in range(0, len(uris), self.batch_size):
+            chunk = uris[start:start + self.batch_size]
+            self._delete_datasets_in_triplestore_base(chunk, DELETE_DATASETS_BY_URIS_SPARQL_QUERY,
+                                                      self.ds_name_default)
+            self._delete_datasets_in_triplestore_base(chunk, DELETE_VALIDATION_REPORTS_BY_URIS_SPARQL_QUERY,
+                                                      self.ds_name_shacl_validation)
+            self._delete_datasets_in_triplestore_base(chunk, DELETE_DATASETS_FROM_HARVEST_INFO_QUERY,
+                                                      self.ds_name_harvest_info)
+
+    def _delete_datasets_in_triplestore_base(self, uris, query_template, datastore_name):
+        """
+        Deletes multiple datasets in the triplestore with one single SPARQL update request
+        :param uris: the uris of the datasets
+        :param query_template: the query template restricting the URIs with a VALUES clause
+        :param datastore_name: the datastore name which will be requested
+        """
+        if not datastore_name:
+            LOGGER.debug(u'No datastore name is given! Skipping...')
+            return
+        if not uris:
+            return
+        if self.named_graphs:
+            query = u' ;\n'.join(DROP_GRAPH_SPARQL_QUERY % {'uri': uri} for uri in uris)
+        else:
+            query = query_template % {'uris': _format_uris_as_values(uris)}
+        LOGGER.debug(u'Deleting %s datasets in triplestore. Datastore name: %s', len(uris), datastore_name)
+        response = self._send_sparql_update(datastore_name, query)
+        status_code = response.status_code
+        if status_code == 200:
+            LOGGER.debug(u'Datasets in triple store successfully deleted')
+        else:
+            LOGGER.warning(u'Error! Deleting %s datasets response status != 200: %s', len(uris),
+                           str(status_code))
+
+    def _upsert_datasets_in_triplestore_base(self, datasets, query_template, datastore_name):
+        """
+        Deletes and inserts multiple datasets in the triplestore. All operations are combined into one
+        SPARQL update request, which is executed by the triplestore within a single transaction.
+        :param datasets: list of tuples (uri, graph), if graph is None the dataset is only deleted
+        :param query_template: the query template which will be used for deleting a dataset
+        :param datastore_name: the datastore name which will be requested
+        """
+        if not datastore_name:
+            LOGGER.debug(u'No datastore name is given! Skipping...')
+            return
+        if not datasets:
+            return
+        if self.named_graphs:
+            # the named graph of a dataset is replaced as a whole
+            query_template = DROP_GRAPH_SPARQL_QUERY
+        operations = []
+        for index, (uri, graph) in enumerate(datasets):
+            operations.append(query_template % {'uri': uri})
+            if graph is not None and len(graph) > 0:
+                insert_template = INSERT_DATA_INTO_GRAPH_SPARQL_QUERY if self.named_graphs \
+                    else INSERT_DATA_SPARQL_QUERY
+                operations.append(insert_template % {
+                    'uri': uri, 'triples': _serialize_as_sparql_triples(graph, u'd{0}x'.format(index))})
+        LOGGER.debug(u'Updating %s datasets in triplestore. Datastore name: %s',
+                     len(datasets), datastore_name)
+        response = self._send_sparql_update(datastore_name, u' ;\n'.join(operations))
+        status_code = response.status_code
+        if status_code == 200:
+            LOGGER.debug(u'Datasets in triple store successfully updated')
+        else:
+            LOGGER.warning(u'Error! Updating %s datasets response status != 200: %s', len(datasets),
+                           str(status_code))
+
+    def create_dataset_in_triplestore(self, graph, uri, wire_format=None):
         """
         Create a new dataset in the triplestore
-        :param graph: the dataset as rdf graph
+        :param graph: the dataset as serialized rdf graph or as rdflib graph
         :param uri: the uri of the dataset
+        :param wire_format: the WireFormat of the serialized graph or used to serialize the rdflib graph,
+            default is Turtle for serialized graphs and the configured wire format for rdflib graphs
         """
-        self._create_dataset_in_triplestore_base(graph, uri, self.ds_name_default, CONTENT_TYPE_TURTLE)
+        self._create_dataset_in_triplestore_base(graph, uri, self.ds_name_default, CONTENT_TYPE_TURTLE,
+                                                 wire_format)
 
     def create_dataset_in_triplestore_mqa(self, graph, uri):
         """
@@ -99,31 +280,114 @@ class FusekiTriplestoreClient(object):
         """
         self._create_dataset_in_triplestore_base(graph, uri, self.ds_name_harvest_info, CONTENT_TYPE_RDF_XML)
 
-    def _create_dataset_in_triplestore_base(self, graph, uri, datastore_name, content_type):
+    def _create_dataset_in_triplestore_base(self, graph, uri, datastore_name, content_type,
+                                            wire_format=None):
         """
         Create a new dataset in the triplestore
-        :param graph: the dataset as rdf graph
+        :param graph: the dataset as serialized rdf graph or as rdflib graph
         :param uri: the uri of the dataset
         :param datastore_name: the datastore name which will be requested
         :param content_type: the Content-Type for the request, should corresponding with the graph
+        :param wire_format: the WireFormat of the serialized graph or used to serialize the rdflib graph,
+            overrides the content_type
         """
         if not datastore_name:
             LOGGER.debug(u'No datastore name is given! Skipping...')
             return
+        if isinstance(graph, Graph):
+            wire_format = wire_format or self.wire_format
+            graph = serialize_graph(graph, wire_format)
+        if wire_format is not None:
+            content_type = wire_format.content_type
         LOGGER.debug(u'Creating new dataset in triplestore. Datastore name: %s, Dataset with URI %s',
                      datastore_name, uri)
-        if isinstance(graph, str):
-            graph = graph.encode('utf-8')
-
-        headers = {'Content-Type': content_type}
-        response = requests.post(self._get_data_endpoint(datastore_name), data=graph, headers=headers)
+        data, headers = prepare_body(graph, {'Content-Type': content_type})
+        if self.named_graphs:
+            # Graph Store Protocol: replaces the named graph of the dataset
+            response = self.health.call(self.session.put, self._get_data_endpoint(datastore_name),
+                                        params={'graph': str(uri)}, data=data, headers=headers,
+                                        timeout=self.timeout)
+        else:
+            # Graph Store Protocol: adds the triples to the default graph, a retry would add the blank
+            # nodes again
+            response = self.health.call(self.session.post, self._get_data_endpoint(datastore_name),
+                                        data=data, headers=headers, timeout=self.timeout,
+                                        idempotent=False)
         status_code = response.status_code
-        if status_code == 200:
+        if status_code in (200, 201, 204):
             LOGGER.debug(u'Dataset in triple store successfully created')
         else:
             LOGGER.warning(u'Error! Creating dataset URI %s response status != 200: %s', uri,
                            str(status_code))
 
+    def _delete_named_graph(self, uri, datastore_name):
+        """
+        Deletes the named graph of the dataset with the Graph Store Protocol
+        :param uri: the uri of the dataset
+        :param datastore_name: the datastore name which will be requested
+        """
+        response = self.health.call(self.session.delete, self._get_data_endpoint(datastore_name),
+                                    params={'graph': str(uri)}, timeout=self.timeout)
+        status_code = response.status_code
+        if status_code in (200, 204):
+            LOGGER.debug(u'Dataset in triple store successfully deleted')
+        elif status_code == 404:
+            LOGGER.debug(u'No named graph found for dataset URI %s. Nothing to delete.', uri)
+        else:
+            LOGGER.warning(u'Error! Deleting dataset URI %s response status != 200: %s', uri,
+                           str(status_code))
+
+    def migrate_to_named_graphs(self, dry_run=False, clear_default=False):
+        """
+        Moves the datasets, validation reports and harvest info stored in the default graphs of the
+        datastores into one named graph per dataset. Each datastore is migrated within one transaction and
+        only the moved triples are deleted from the default graph. The triples left in the default graph,
+        e.g. catalogs or unreachable nodes, are logged and only deleted with clear_default.
+        Returns a list of tuples (datastore name, number of triples in the default graph before migrating,
+        number of triples left in the default graph after migrating, 0 with dry_run).
+        :param dry_run: if True, only the number of triples to migrate is determined
+        :param clear_default: if True, the triples left in the default graph after migrating are deleted
+        """
+        result = []
+        for datastore_name, query in [(self.ds_name_default, MIGRATE_DATASETS_TO_NAMED_GRAPHS_QUERY),
+                                      (self.ds_name_shacl_validation,
+                                       MIGRATE_VALIDATION_REPORTS_TO_NAMED_GRAPHS_QUERY),
+                                      (self.ds_name_harvest_info,
+                                       MIGRATE_HARVEST_INFO_TO_NAMED_GRAPHS_QUERY)]:
+            if not datastore_name:
+                continue
+            count = self._count_triples_in_default_graph(datastore_name)
+            left_count = 0
+            if not dry_run and count > 0:
+                LOGGER.info(u'Migrating %s triples in datastore %s to named graphs...', count, datastore_name)
+                self._send_sparql_update(datastore_name, query, read_timeout=MIGRATION_TIMEOUT)
+                left_count = self._count_triples_in_default_graph(datastore_name)
+            if left_count > 0:
+                self._log_subjects_in_default_graph(datastore_name, left_count)
+                if clear_default:
+                    LOGGER.info(u'Deleting %s triples left in the default graph of datastore %s...',
+                                left_count, datastore_name)
+                    self._send_sparql_update(datastore_name, CLEAR_DEFAULT_GRAPH_QUERY,
+                                             read_timeout=MIGRATION_TIMEOUT)
+                    left_count = 0
+            result.append((datastore_name, count, left_count))
+        return result
+
+    def _count_triples_in_default_graph(self, datastore_name):
+        """ Returns the number of triples in the default graph of the datastore """
+        response = self._select_datasets_in_triplestore_base(COUNT_TRIPLES_IN_DEFAULT_GRAPH_QUERY,
+                                                             datastore_name)
+        return int(response.convert()['results']['bindings'][0]['count']['value'])
+
+    def _log_subjects_in_default_graph(self, datastore_name, triple_count):
+        """ Logs some subjects with their types which are not moved into a named graph """
+        query = GET_SUBJECTS_IN_DEFAULT_GRAPH_QUERY % {'limit': MAX_LOGGED_DEFAULT_GRAPH_SUBJECTS}
+        response = self._select_datasets_in_triplestore_base(query, datastore_name)
+        subjects = [u'{0} ({1})'.format(binding['s']['value'], binding.get('type', {}).get('value', u'-'))
+                    for binding in response.convert()['results']['bindings']]
+        LOGGER.warning(u'%s triples are not moved into a named graph and left in the default graph of '
+                       u'datastore %s. Examples: %s', triple_count, datastore_name, u', '.join(subjects))
+
     def select_datasets_in_triplestore_harvest_info(self, query):
         """
         Execute the query in the harvest_info datastore. Return the result.
@@ -131,6 +395,47 @@ class FusekiTriplestoreClient(object):
         """
         return self._select_datasets_in_triplestore_base(query, self.ds_name_harvest_info)
 
+    def iter_dataset_uris_in_triplestore_harvest_info(self, owner_org_or_source_id):
+        """
+        Yields the URIs of the datasets in the harvest_info datastore which belong to the given organization
+        or harvest source. The URIs are requested page by page, so the whole result is never held in memory.
+        :param owner_org_or_source_id: the organization id or the harvest source id
+        """
+        query_template = GET_URIS_FROM_HARVEST_INFO_NAMED_GRAPHS_PAGED_QUERY if self.named_graphs \
+            else GET_URIS_FROM_HARVEST_INFO_PAGED_QUERY
+        last_uri = u''
+        while True:
+            query = query_template % {'owner_org_or_source_id': owner_org_or_source_id,
+                                      'after': Literal(last_uri).n3(), 'limit': self.page_size}
+            count = 0
+            for row in self._iter_select_results_as_csv(query, self.ds_name_harvest_info):
+                last_uri = row['s']
+                count += 1
+                yield last_uri
+            if count < self.page_size:
+                return
+
+    def _iter_select_results_as_csv(self, query, datastore_name):
+        """
+        Executes the SELECT query and yields the result rows as dicts (variable name -> value). The result is
+        requested in the SPARQL CSV format and decoded while it is streamed.
+        :param query: query of the sparql request
+        :param datastore_name: name of the datastore
+        """
+        if not datastore_name:
+            LOGGER.debug(u'No datastore name is given! Skipping...')
+            return
+        data, headers = prepare_body(query, {'Content-Type': CONTENT_TYPE_SPARQL_QUERY,
+                                             'Accept': CONTENT_TYPE_CSV})
+        response = self.health.call(self.session.post, self._get_query_endpoint(datastore_name), data=data,
+                                    headers=headers, timeout=self.timeout, stream=True)
+        with closing(response):
+            _raise_for_sparql_status(response)
+            # SPARQL CSV results are always encoded in UTF-8
+            response.encoding = 'utf-8'
+            for row in csv.DictReader(response.iter_lines(decode_unicode=True)):
+                yield row
+
     def _select_datasets_in_triplestore_base(self, query, datastore_name):
         """
         Create a new dataset in the triplestore
@@ -143,20 +448,28 @@ class FusekiTriplestoreClient(object):
         sparql_wrapper = SPARQLWrapper(self._get_query_endpoint(datastore_name))
         sparql_wrapper.setQuery(query)
         sparql_wrapper.setMethod(POST)
-        sparql_wrapper.setTimeout(10)
+        sparql_wrapper.setTimeout(self.timeout[1])
         sparql_wrapper.setReturnFormat(JSON)
-        return sparql_wrapper.query()
+        return self.health.call(sparql_wrapper.query)
 
     def is_available(self):
         """
-        Ping Fuseki Server to check availability
+        Ping Fuseki Server to check availability. The result is cached for a short time and no ping is sent
+        while the circuit is open after repeated connection failures.
         :return True if successful
         """
         if self.fuseki_base_url is not None:
+            available = self.health.get_cached_availability()
+            if available is not None:
+                return available
+            if not self.health.allow_request():
+                LOGGER.debug(u'Skip updating data in Triplestore, because fuseki is not available!')
+                return False
             try:
-                response = requests.get(self._get_ping_endpoint())
+                response = self.session.get(self._get_ping_endpoint(), timeout=self.timeout)
                 if response.status_code == 200:
                     LOGGER.debug(u'Fuseki is available.')
+                    self.health.record_success()
                     return True
                 else:
                     LOGGER.warning(u'Fuseki responded to ping with HTTP-Status %s! Skip updating data in ' \
@@ -165,6 +478,7 @@ class FusekiTriplestoreClient(object):
             except requests.exceptions.RequestException as ex:
                 LOGGER.warning(u'Exception occurred while connecting to Fuseki. Skip updating data in ' \
                                u'Triplestore, because fuseki is not available! Details: %s', ex)
+            self.health.record_failure()
         return False
 
     def _get_update_endpoint(self, datastore_name):
@@ -215,10 +529,42 @@ class FusekiTriplestoreClient(object):
         return (fuseki_base_url, datastore_name_default, datastore_name_shacl_validation,
                 datastore_name_harvest_info)
 
-    def _query_sparql_wrapper(self, datastore_name, query):
-        """ Queries the given query against the configured triplestore with the given datastore name. """
-        sparql_wrapper = SPARQLWrapper(self._get_update_endpoint(datastore_name))
-        sparql_wrapper.setQuery(query)
-        sparql_wrapper.setMethod(POST)
-        sparql_wrapper.setTimeout(10)
-        return sparql_wrapper.query()
+    def _send_sparql_update(self, datastore_name, query, read_timeout=None):
+        """
+        Sends the SPARQL update to the configured triplestore with the given datastore name. Error responses
+        are raised as the corresponding SPARQLWrapper exceptions.
+        :param read_timeout: overrides the configured read timeout, e.g. for long running updates
+        """
+        data, headers = prepare_body(query, {'Content-Type': CONTENT_TYPE_SPARQL_UPDATE})
+        timeout = self.timeout if read_timeout is None else get_timeout(read_timeout)
+        response = self.health.call(self.session.post, self._get_update_endpoint(datastore_name), data=data,
+                                    headers=headers, timeout=timeout)
+        _raise_for_sparql_status(response)
+        return response
+
+
+def _format_uris_as_values(uris):
+    """ Formats the URIs as the data block of a VALUES clause """
+    return u' '.join(u'<{0}>'.format(uri) for uri in uris)
+
+
+def _raise_for_sparql_status(response):
+    """ Raises the SPARQLWrapper exception corresponding to the status code of an error response """
+    if response.status_code >= 400:
+        error_class = SPARQL_ERRORS_BY_STATUS_CODE.get(response.status_code, SPARQLWrapperException)
+        raise error_class(response.text)
+
+
+def _serialize_as_sparql_triples(graph, blank_node_prefix):
+    """
+    Serializes the graph in N-Triples syntax, which can be used within an INSERT DATA block. The labels of
+    blank nodes get the given prefix, so that the blank nodes of different datasets in the same update
+    request stay distinct like they were uploaded separately.
+    """
+    def _to_n3(term):
+        if isinstance(term, BNode):
+            return u'_:{0}{1}'.format(blank_node_prefix, term)
+        return term.n3()
+
+    return u'\n'.join(
+        u'{0} {1} {2} .'.format(_to_n3(s), _to_n3(p), _to_n3(o)) for s, p, o in graph)
@@ -5,8 +5,11 @@ Query templates for SPARQL requests
 """
 # pylint: disable=pointless-string-statement
 
+from rdflib.namespace import DCAT, FOAF, Namespace
 from ckanext.dcatde.validation.shacl_validation import DQV, GOVDATA_MQA
 
+GOVDATA_HARVEST_INFO = Namespace("http://govdata.de/harvest-info/#")
+
 '''
 When formatting this query:
 Format %(uri)s with the URI of the dataset
@@ -20,6 +23,20 @@ DELETE_DATASET_BY_URI_SPARQL_QUERY = u"""DELETE { ?s ?p ?o }
                     FILTER (!isBlank(?s)) }
             }"""
 
+'''
+When formatting this query:
+Format %(uris)s with the URIs of the datasets, each enclosed in angle brackets and separated by whitespace
+'''
+DELETE_DATASETS_BY_URIS_SPARQL_QUERY = u"""DELETE { ?s ?p ?o }
+            WHERE {
+              VALUES ?uri { %(uris)s }
+              ?uri (<>|!<>)* ?s .
+              ?s ?p ?o
+                  MINUS { ?uri <http://purl.org/dc/terms/publisher> ?s .
+                    ?s ?p ?o
+                    FILTER (!isBlank(?s)) }
+            }"""
+
 '''
 When formatting this query:
 Format %(uri)s with the URI of the dataset
@@ -34,6 +51,21 @@ DELETE_VALIDATION_REPORT_BY_URI_SPARQL_QUERY = u"""PREFIX dqv: <{dqv}>
               ?s ?p ?o
             }}""".format(dqv=DQV, mqa=GOVDATA_MQA)
 
+'''
+When formatting this query:
+Format %(uris)s with the URIs of the datasets, each enclosed in angle brackets and separated by whitespace
+'''
+DELETE_VALIDATION_REPORTS_BY_URIS_SPARQL_QUERY = u"""PREFIX dqv: <{dqv}>
+            PREFIX govdata: <{mqa}>
+            DELETE {{ ?s ?p ?o }}
+            WHERE {{
+              VALUES ?uri {{ %(uris)s }}
+              ?report dqv:computedOn ?uri .
+              ?report (<>|!<>)* ?s .
+              ?s (<>|!<>)* ?o .
+              ?s ?p ?o
+            }}""".format(dqv=DQV, mqa=GOVDATA_MQA)
+
 '''
 When formatting this query:
 Format %(uri)s with the URI
@@ -44,6 +76,41 @@ DELETE_DATASET_FROM_HARVEST_INFO_QUERY = u"""DELETE { ?s ?p ?o }
               FILTER ( ?s = <%(uri)s> )
             }"""
 
+'''
+When formatting this query:
+Format %(uris)s with the URIs, each enclosed in angle brackets and separated by whitespace
+'''
+DELETE_DATASETS_FROM_HARVEST_INFO_QUERY = u"""DELETE { ?s ?p ?o }
+            WHERE {
+              VALUES ?s { %(uris)s }
+              ?s ?p ?o
+            }"""
+
+'''
+When formatting this query:
+Format %(triples)s with the triples to insert in N-Triples syntax
+'''
+INSERT_DATA_SPARQL_QUERY = u"""INSERT DATA {
+%(triples)s
+            }"""
+
+'''
+When formatting this query:
+Format %(uri)s with the URI of the named graph
+'''
+DROP_GRAPH_SPARQL_QUERY = u"""DROP SILENT GRAPH <%(uri)s>"""
+
+'''
+When formatting this query:
+Format %(uri)s with the URI of the named graph
+Format %(triples)s with the triples to insert in N-Triples syntax
+'''
+INSERT_DATA_INTO_GRAPH_SPARQL_QUERY = u"""INSERT DATA {
+              GRAPH <%(uri)s> {
+%(triples)s
+              }
+            }"""
+
 '''
 When formatting this query:
 Format %(uri)s with the URI of the dataset
@@ -61,3 +128,151 @@ GET_URIS_FROM_HARVEST_INFO_QUERY = u"""SELECT ?s ?p ?o
                                     WHERE {
                                         ?s ?p '%(owner_org_or_source_id)s'
                                     }"""
+
+'''
+When formatting this query:
+Format %(owner_org_or_source_id)s with the organization id of the dataset
+'''
+GET_URIS_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY = u"""SELECT ?s ?p ?o
+                                    WHERE {
+                                        GRAPH ?g { ?s ?p '%(owner_org_or_source_id)s' }
+                                    }"""
+
+'''
+Selects one page of the dataset URIs, ordered by the URI. The next page starts after the last URI of the
+previous page, so the triplestore doesn't have to skip the previous pages like with OFFSET.
+When formatting this query:
+Format %(owner_org_or_source_id)s with the organization id or the harvest source id of the dataset
+Format %(after)s with the last URI of the previous page as string literal, or "" for the first page
+Format %(limit)s with the page size
+'''
+GET_URIS_FROM_HARVEST_INFO_PAGED_QUERY = u"""SELECT DISTINCT ?s
+                                    WHERE {{
+                                        ?s <{knows}> '%(owner_org_or_source_id)s'
+                                        FILTER ( STR(?s) > %(after)s )
+                                    }}
+                                    ORDER BY STR(?s)
+                                    LIMIT %(limit)s""".format(knows=FOAF.knows)
+
+'''
+When formatting this query:
+Format %(owner_org_or_source_id)s with the organization id or the harvest source id of the dataset
+Format %(after)s with the last URI of the previous page as string literal, or "" for the first page
+Format %(limit)s with the page size
+'''
+GET_URIS_FROM_HARVEST_INFO_NAMED_GRAPHS_PAGED_QUERY = u"""SELECT DISTINCT ?s
+                                    WHERE {{
+                                        GRAPH ?g {{ ?s <{knows}> '%(owner_org_or_source_id)s' }}
+                                        FILTER ( STR(?s) > %(after)s )
+                                    }}
+                                    ORDER BY STR(?s)
+                                    LIMIT %(limit)s""".format(knows=FOAF.knows)
+
+'''
+When formatting this query:
+Format %(owner_org_or_source_id)s with the harvest source id of the dataset
+'''
+GET_CONTENT_HASHES_FROM_HARVEST_INFO_QUERY = u"""SELECT ?s ?hash
+                                    WHERE {{
+                                        ?s ?p '%(owner_org_or_source_id)s' .
+                                        ?s <{content_hash}> ?hash
+                                    }}""".format(content_hash=GOVDATA_HARVEST_INFO.contentHash)
+
+'''
+When formatting this query:
+Format %(owner_org_or_source_id)s with the harvest source id of the dataset
+'''
+GET_CONTENT_HASHES_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY = u"""SELECT ?s ?hash
+                                    WHERE {{
+                                        GRAPH ?g {{
+                                            ?s ?p '%(owner_org_or_source_id)s' .
+                                            ?s <{content_hash}> ?hash
+                                        }}
+                                    }}""".format(content_hash=GOVDATA_HARVEST_INFO.contentHash)
+
+'''
+When formatting this query:
+Format %(owner_org_or_source_id)s with the harvest source id of the datasets
+Format %(uris)s with the URIs of the datasets, e.g. "<uri1> <uri2>"
+'''
+GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_QUERY = u"""SELECT ?s ?hash
+                                    WHERE {{
+                                        VALUES ?s {{ %(uris)s }}
+                                        ?s ?p '%(owner_org_or_source_id)s' .
+                                        ?s <{content_hash}> ?hash
+                                    }}""".format(content_hash=GOVDATA_HARVEST_INFO.contentHash)
+
+'''
+When formatting this query:
+Format %(owner_org_or_source_id)s with the harvest source id of the datasets
+Format %(uris)s with the URIs of the datasets, e.g. "<uri1> <uri2>"
+'''
+GET_CONTENT_HASHES_OF_DATASETS_FROM_HARVEST_INFO_NAMED_GRAPHS_QUERY = u"""SELECT ?s ?hash
+                                    WHERE {{
+                                        VALUES ?s {{ %(uris)s }}
+                                        GRAPH ?g {{
+                                            ?s ?p '%(owner_org_or_source_id)s' .
+                                            ?s <{content_hash}> ?hash
+                                        }}
+                                    }}""".format(content_hash=GOVDATA_HARVEST_INFO.contentHash)
+
+COUNT_TRIPLES_IN_DEFAULT_GRAPH_QUERY = u"""SELECT (COUNT(*) AS ?count)
+                                    WHERE {
+                                        ?s ?p ?o
+                                    }"""
+
+'''
+Lists some subjects with their types left in the default graph, e.g. after migrating to named graphs.
+When formatting this query:
+Format %(limit)s with the maximum number of subjects to list
+'''
+GET_SUBJECTS_IN_DEFAULT_GRAPH_QUERY = u"""SELECT DISTINCT ?s ?type
+                                    WHERE {
+                                        ?s ?p ?o
+                                        OPTIONAL { ?s a ?type }
+                                    }
+                                    LIMIT %(limit)s"""
+
+CLEAR_DEFAULT_GRAPH_QUERY = u"""CLEAR DEFAULT"""
+
+'''
+Moves every dataset from the default graph into its own named graph. Datasets already stored in a named
+graph are not touched. Only the copied triples are deleted from the default graph.
+'''
+MIGRATE_DATASETS_TO_NAMED_GRAPHS_QUERY = u"""PREFIX dcat: <{dcat}>
+            DELETE {{ ?s ?p ?o }}
+            INSERT {{ GRAPH ?dataset {{ ?s ?p ?o }} }}
+            WHERE {{
+              ?dataset a dcat:Dataset .
+              FILTER NOT EXISTS {{ GRAPH ?dataset {{ ?gs ?gp ?go }} }}
+              ?dataset (<>|!<>)* ?s .
+              ?s ?p ?o
+            }}""".format(dcat=DCAT)
+
+'''
+Moves every validation report from the default graph into the named graph of the validated dataset.
+Reports already stored in a named graph are not touched. Only the copied triples are deleted from the
+default graph.
+'''
+MIGRATE_VALIDATION_REPORTS_TO_NAMED_GRAPHS_QUERY = u"""PREFIX dqv: <{dqv}>
+            DELETE {{ ?s ?p ?o }}
+            INSERT {{ GRAPH ?dataset {{ ?s ?p ?o }} }}
+            WHERE {{
+              ?report dqv:computedOn ?dataset .
+              FILTER NOT EXISTS {{ GRAPH ?dataset {{ ?gs ?gp ?go }} }}
+              ?report (<>|!<>)* ?s .
+              ?s ?p ?o
+            }}""".format(dqv=DQV)
+
+'''
+Moves the harvest info of every dataset from the default graph into the named graph of the dataset.
+Harvest info already stored in a named graph is not touched. Only the copied triples are deleted from the
+default graph.
+'''
+MIGRATE_HARVEST_INFO_TO_NAMED_GRAPHS_QUERY = u"""DELETE { ?s ?p ?o }
+            INSERT { GRAPH ?s { ?s ?p ?o } }
+            WHERE {
+              ?s ?p ?o
+              FILTER ( isIRI(?s) )
+              FILTER NOT EXISTS { GRAPH ?s { ?gs ?gp ?go } }
+            }"""
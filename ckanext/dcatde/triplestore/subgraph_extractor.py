@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Extraction of the dataset subgraphs from a parsed catalog graph
+"""
+from rdflib import Graph, URIRef
+
+
+class DatasetSubgraphExtractor(object):
+    """
+    Extracts the subgraph of a dataset from a catalog graph. The subgraph consists of all triples whose
+    subject is reachable from the dataset URI, which is the same result as the query
+    GET_DATASET_BY_URI_SPARQL_QUERY returns, but without using the SPARQL engine.
+
+    The catalog graph is indexed once. The reachable subjects are computed with Tarjan's algorithm for
+    strongly connected components and memoized per node, so shared nodes like publishers or license
+    documents are only traversed once for all datasets of the catalog.
+    """
+
+    def __init__(self, graph):
+        self._index = {}
+        for s, p, o in graph.triples((None, None, None)):
+            self._index.setdefault(s, []).append((p, o))
+        self._successors = {}
+        self._reachable = {}
+
+    def get_subgraph(self, uri):
+        """
+        Returns the subgraph of the dataset with the given URI as new graph
+        :param uri: the uri of the dataset
+        """
+        graph = Graph()
+        for subject in self._get_reachable_subjects(URIRef(uri)):
+            for p, o in self._index.get(subject, ()):
+                graph.add((subject, p, o))
+        return graph
+
+    def get_subgraphs(self, uris):
+        """
+        Generator that returns the tuple (uri, subgraph) for every given dataset URI
+        :param uris: the uris of the datasets
+        """
+        for uri in uris:
+            yield uri, self.get_subgraph(uri)
+
+    def _get_successors(self, node):
+        """ Returns the objects of the node which are subjects itself, i.e. which have outgoing edges """
+        successors = self._successors.get(node)
+        if successors is None:
+            successors = list({o for _, o in self._index.get(node, ()) if o in self._index})
+            self._successors[node] = successors
+        return successors
+
+    def _get_reachable_subjects(self, root):
+        """
+        Returns the set of all subjects reachable from the root node, including the root node. The
+        strongly connected components are computed iteratively to avoid hitting the recursion limit on deep
+        graphs. When a component is completed, all components reachable from it are already completed, so
+        its reachable set is the union of its own nodes and the reachable sets of its successors.
+        """
+        if root in self._reachable:
+            return self._reachable[root]
+
+        counter = 0
+        index = {root: counter}
+        lowlink = {root: counter}
+        component_stack = [root]
+        on_stack = {root}
+        call_stack = [(root, iter(self._get_successors(root)))]
+        while call_stack:
+            node, successors = call_stack[-1]
+            for successor in successors:
+                if successor in self._reachable:
+                    continue
+                if successor not in index:
+                    counter += 1
+                    index[successor] = lowlink[successor] = counter
+                    component_stack.append(successor)
+                    on_stack.add(successor)
+                    call_stack.append((successor, iter(self._get_successors(successor))))
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                call_stack.pop()
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    self._complete_component(node, component_stack, on_stack)
+
+        return self._reachable[root]
+
+    def _complete_component(self, node, component_stack, on_stack):
+        """ Pops the component with the given root node from the stack and memoizes its reachable set """
+        members = []
+        while True:
+            member = component_stack.pop()
+            on_stack.discard(member)
+            members.append(member)
+            if member == node:
+                break
+        reachable = set(members)
+        for member in members:
+            for successor in self._get_successors(member):
+                if successor not in reachable:
+                    reachable.update(self._reachable[successor])
+        reachable = frozenset(reachable)
+        for member in members:
+            self._reachable[member] = reachable
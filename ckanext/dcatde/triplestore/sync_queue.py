@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Persistent queue of the harvested datasets to update in the triple store
+"""
+import datetime
+import logging
+
+from ckan import model
+from sqlalchemy import Column, Index, MetaData, Table, and_, exists, func, or_, select, types
+
+LOGGER = logging.getLogger(__name__)
+
+QUEUE_TABLE_NAME = 'dcatde_triplestore_queue'
+# Seconds a worker may hold the claimed items before they are passed to another worker
+QUEUE_LEASE_SECONDS = 600
+# Seconds until the items which could not be updated in the triple store are processed again
+QUEUE_RETRY_DELAY_SECONDS = 60
+
+metadata = MetaData()
+
+queue_table = Table(
+    QUEUE_TABLE_NAME, metadata,
+    Column('id', types.Integer, primary_key=True, autoincrement=True),
+    Column('uri', types.UnicodeText, nullable=False),
+    # Serialized dataset graph in turtle format. If None, the dataset is only deleted.
+    Column('rdf_graph', types.UnicodeText),
+    Column('owner_org', types.UnicodeText),
+    Column('contributor_id', types.UnicodeText),
+    Column('harvest_source_id', types.UnicodeText),
+    Column('content_hash', types.UnicodeText),
+    Column('created', types.DateTime, default=datetime.datetime.utcnow, nullable=False),
+    # The item is claimed by a worker or waits for a retry until this date
+    Column('claimed_until', types.DateTime),
+    Index('idx_dcatde_triplestore_queue_uri', 'uri'),
+)
+
+
+class TriplestoreSyncQueue(object):
+    """
+    Stores the datasets to update in the triple store in a database table, so the harvester does not
+    have to wait for the triple store. The queue is drained by the command 'triplestore worker'.
+    """
+
+    def __init__(self, engine=None, lease_seconds=QUEUE_LEASE_SECONDS,
+                 retry_delay_seconds=QUEUE_RETRY_DELAY_SECONDS):
+        self._engine = engine
+        self.lease_seconds = lease_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self._table_created = False
+
+    @property
+    def engine(self):
+        """ The database engine. Defaults to the engine of the CKAN database. """
+        return self._engine if self._engine is not None else model.meta.engine
+
+    def setup(self):
+        """ Creates the queue table if it doesn't exist yet """
+        if not self._table_created:
+            queue_table.create(bind=self.engine, checkfirst=True)
+            self._table_created = True
+
+    def enqueue(self, items):
+        """
+        Adds the given items to the queue within one transaction.
+        :param items: list of dicts with the keys uri, rdf_graph, owner_org, contributor_id,
+        harvest_source_id and content_hash
+        """
+        if not items:
+            return
+        self.setup()
+        with self.engine.begin() as connection:
+            connection.execute(queue_table.insert(), items)
+        LOGGER.debug(u'Added %s datasets to the triplestore queue.', len(items))
+
+    def process_next_batch(self, batch_size, callback):
+        """
+        Passes the oldest unclaimed items of the queue to the callback and removes them from the queue
+        afterwards. The items are claimed for the configured lease time in a short transaction before the
+        callback is called, so no database lock is held while the triple store is updated and other workers
+        skip the claimed items. The callback returns the URIs of the items which could not be updated. These
+        items and all items of a callback raising an exception stay in the queue and are processed again
+        after the retry delay. Returns the number of processed items.
+        Only the newest item of a dataset URI is claimed, and only if no other item of the URI is claimed,
+        so an older graph can never be written after a newer one. The older items of a processed URI are
+        removed from the queue as well.
+        """
+        self.setup()
+        now = datetime.datetime.utcnow()
+        newer = queue_table.alias('newer')
+        claimed = queue_table.alias('claimed')
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                queue_table.select()
+                .where(or_(queue_table.c.claimed_until.is_(None), queue_table.c.claimed_until < now))
+                .where(~exists().where(and_(newer.c.uri == queue_table.c.uri, newer.c.id > queue_table.c.id)))
+                .where(~exists().where(and_(claimed.c.uri == queue_table.c.uri,
+                                            claimed.c.claimed_until >= now)))
+                .order_by(queue_table.c.id).limit(batch_size)
+                .with_for_update(skip_locked=True)).fetchall()
+            if rows:
+                connection.execute(
+                    queue_table.update().where(queue_table.c.id.in_([row.id for row in rows]))
+                    .values(claimed_until=now + datetime.timedelta(seconds=self.lease_seconds)))
+        if not rows:
+            return 0
+
+        try:
+            failed_uris = set(callback(rows) or [])
+        except Exception:
+            self._retry_later([row.id for row in rows])
+            raise
+        failed_ids = [row.id for row in rows if row.uri in failed_uris]
+        processed_rows = [row for row in rows if row.uri not in failed_uris]
+        if processed_rows:
+            # removes the processed items and the older items of the same URIs, which they superseded
+            with self.engine.begin() as connection:
+                connection.execute(queue_table.delete().where(or_(*[
+                    and_(queue_table.c.uri == row.uri, queue_table.c.id <= row.id)
+                    for row in processed_rows])))
+        if failed_ids:
+            LOGGER.warning(u'Could not update %s datasets in the triplestore. Retrying in %s seconds.',
+                           len(failed_ids), self.retry_delay_seconds)
+            self._retry_later(failed_ids)
+        return len(processed_rows)
+
+    def _retry_later(self, row_ids):
+        """ Claims the items with the given IDs until the retry delay has passed """
+        retry_date = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.retry_delay_seconds)
+        with self.engine.begin() as connection:
+            connection.execute(
+                queue_table.update().where(queue_table.c.id.in_(row_ids)).values(claimed_until=retry_date))
+
+    def get_status(self):
+        """
+        Returns the number of items in the queue and the creation date of the oldest item, or None if the
+        queue is empty.
+        """
+        self.setup()
+        with self.engine.connect() as connection:
+            depth, oldest = connection.execute(
+                select(func.count(queue_table.c.id), func.min(queue_table.c.created))).first()
+        return depth, oldest
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+In-process SHACL validation with pyshacl as alternative to the remote SHACL validator service
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from ckan.plugins import toolkit as tk
+from rdflib import Graph
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_PARAM_SHAPES_FILE = 'ckanext.dcatde.shacl_validator.shapes_file'
+CONFIG_PARAM_WORKERS = 'ckanext.dcatde.shacl_validator.local_workers'
+REPORT_FORMAT = 'xml'
+
+# The parsed shapes graphs of the process by file path
+_shapes_graphs = {}
+_shapes_lock = threading.Lock()
+
+
+def _get_shapes_graph(shapes_file):
+    """ Returns the parsed shapes graph of the given file. The file is parsed once per process. """
+    shapes_graph = _shapes_graphs.get(shapes_file)
+    if shapes_graph is None:
+        with _shapes_lock:
+            shapes_graph = _shapes_graphs.get(shapes_file)
+            if shapes_graph is None:
+                shapes_graph = Graph()
+                shapes_graph.parse(shapes_file)
+                LOGGER.info(u'Loaded %s triples of SHACL shapes from %s.', len(shapes_graph), shapes_file)
+                _shapes_graphs[shapes_file] = shapes_graph
+    return shapes_graph
+
+
+def validate_graph(shapes_file, rdf_graph, rdf_format, report_query):
+    """
+    Validates the serialized graph against the shapes of the given file and applies the report query to
+    the validation report. Returns the result of the report query serialized as RDF/XML, like the SHACL
+    validator service. The function is executed in the worker processes of the LocalShaclEngine.
+    """
+    # pyshacl is an optional dependency, which is only required for the local validation engine
+    import pyshacl  # pylint: disable=import-outside-toplevel
+
+    data_graph = Graph()
+    data_graph.parse(data=rdf_graph, format=rdf_format)
+    _, report_graph, _ = pyshacl.validate(data_graph, shacl_graph=_get_shapes_graph(shapes_file),
+                                          inference='none', allow_warnings=True)
+    result = report_graph.query(report_query).graph
+    return result.serialize(format=REPORT_FORMAT)
+
+
+class LocalShaclEngine(object):
+    """
+    Validates RDF graphs with pyshacl against the SHACL shapes of a local file. With more than one worker
+    the graphs are validated in a process pool, otherwise in the calling thread.
+    """
+
+    def __init__(self, shapes_file, workers=1):
+        self.shapes_file = shapes_file
+        self.workers = max(workers, 1)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """
+        Returns the engine for the configured shapes file, or None if the shapes file isn't configured or
+        pyshacl isn't installed.
+        """
+        shapes_file = tk.config.get(CONFIG_PARAM_SHAPES_FILE)
+        if not shapes_file:
+            LOGGER.warning(u'Invalid configuration of the local SHACL validation engine. The shapes ' \
+                           u'file is missing! SHACL validation support is deactivated.')
+            return None
+        try:
+            import pyshacl  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError:
+            LOGGER.warning(u'The local SHACL validation engine requires the package pyshacl, which is not ' \
+                           u'installed! SHACL validation support is deactivated.')
+            return None
+        return cls(shapes_file, tk.asint(tk.config.get(CONFIG_PARAM_WORKERS, 1)))
+
+    def validate(self, rdf_graph, rdf_format, report_query):
+        """ Validates the serialized graph and returns the result of the report query as RDF/XML """
+        if self.workers <= 1:
+            return validate_graph(self.shapes_file, rdf_graph, rdf_format, report_query)
+        return self._get_executor().submit(validate_graph, self.shapes_file, rdf_graph, rdf_format,
+                                           report_query).result()
+
+    def _get_executor(self):
+        """ Returns the process pool. It's created on first use and loads the shapes in each process. """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         initializer=_get_shapes_graph,
+                                                         initargs=(self.shapes_file,))
+        return self._executor
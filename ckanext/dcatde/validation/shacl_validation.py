@@ -2,15 +2,28 @@
 # -*- coding: utf8 -*-
 """SHACL validation utility"""
 
+import json
 import logging
 from urllib.parse import urljoin
 from ckan.plugins import toolkit as tk
+from rdflib import Graph
 from rdflib.namespace import Namespace
 import requests
+from ckanext.dcatde.http_session import get_session, get_timeout, prepare_body
+from ckanext.dcatde.rdf_wire_format import get_wire_format, serialize_graph
+from ckanext.dcatde.service_health import ServiceHealthMonitor, ServiceUnavailableError
+from ckanext.dcatde.validation.local_shacl_engine import LocalShaclEngine
+from ckanext.dcatde.validation.validation_cache import ShaclValidationCache, get_content_hash
 
 LOGGER = logging.getLogger(__name__)
 
 VALIDATE_ENDPOINT = 'validate'
+CONFIG_PARAM_READ_TIMEOUT = 'ckanext.dcatde.shacl_validator.read_timeout'
+DEFAULT_READ_TIMEOUT = 60
+CONFIG_PARAM_CACHE_MAX_ENTRIES = 'ckanext.dcatde.shacl_validator.cache.max_entries'
+CONFIG_PARAM_ENGINE = 'ckanext.dcatde.shacl_validator.engine'
+ENGINE_REMOTE = 'remote'
+ENGINE_LOCAL = 'local'
 
 SHACL = Namespace("http://www.w3.org/ns/shacl#")
 DQV = Namespace("http://www.w3.org/ns/dqv#")
@@ -22,35 +35,116 @@ class ShaclValidator(object):
     """Validates RDF graphs using the DCAT-AP.de SHACL validator service"""
 
     def __init__(self):
-        self.validator_url, self.validator_profile = self._get_validator_config()
-
-    def validate(self, rdf_graph, dataset_uri, dataset_org, contributor_id=None, rdf_format='text/turtle'):
-        """Validates given RDF graph using the DCAT-AP.de SHACL validator service"""
+        self.local_engine = None
+        if tk.config.get(CONFIG_PARAM_ENGINE, ENGINE_REMOTE) == ENGINE_LOCAL:
+            self.validator_url = None
+            self.validator_profile = tk.config.get('ckanext.dcatde.shacl.validator.profile.type')
+            self.local_engine = LocalShaclEngine.from_config()
+            if self.local_engine is None:
+                self.validator_profile = None
+        else:
+            self.validator_url, self.validator_profile = self._get_validator_config()
+        self.health = ServiceHealthMonitor.from_config(u'SHACL validator')
+        self.session = get_session()
+        self.timeout = get_timeout(float(tk.config.get(CONFIG_PARAM_READ_TIMEOUT, DEFAULT_READ_TIMEOUT)))
+        self.wire_format = get_wire_format()
+        self.cache = None
+        cache_max_entries = tk.asint(tk.config.get(CONFIG_PARAM_CACHE_MAX_ENTRIES, 0))
+        if cache_max_entries > 0 and self.validator_profile is not None:
+            self.cache = ShaclValidationCache(self.validator_profile, cache_max_entries)
+
+    def validate(self, rdf_graph, dataset_uri, dataset_org, contributor_id=None, rdf_format='text/turtle',
+                 content_hash=None):
+        """
+        Validates given RDF graph using the DCAT-AP.de SHACL validator service or the local validation
+        engine. The graph is given serialized with the content type rdf_format or as rdflib graph, which
+        is serialized in the configured wire format. If the cache is activated, the report is read from the
+        cache with the content_hash computed by get_content_hash() as key. The hash is computed for rdflib
+        graphs if it isn't given.
+        """
 
         result = None
-        if self.validator_url is not None and self.validator_profile is not None:
-            body = {
-                u'contentToValidate': rdf_graph,
-                u'embeddingMethod': u'STRING',
-                u'contentSyntax': rdf_format,
-                u'validationType': self.validator_profile,
-                u'reportQuery': self._get_report_query(dataset_uri, dataset_org, contributor_id)
-            }
-
-            try:
-                req = requests.post(urljoin(self.validator_url, VALIDATE_ENDPOINT), json=body)
-
-                if req.status_code == requests.codes.ok:
-                    result = req.text
-            except requests.exceptions.RequestException as ex:
-                LOGGER.warning(u'Exception occurred while connecting to SHACL validator. Skip validating ' \
-                               u'data with the SHACL validator, because validator is not available! ' \
-                               u'Details: %s', ex)
+        if self.is_enabled():
+            cache_key = None
+            if self.cache is not None:
+                if content_hash is None and isinstance(rdf_graph, Graph):
+                    content_hash = get_content_hash(rdf_graph, dataset_org, contributor_id,
+                                                    self.validator_profile)
+                if content_hash:
+                    cache_key = content_hash
+                    result = self._get_cached_report(cache_key)
+                    if result is not None:
+                        LOGGER.debug(u'Found cached validation report for dataset with URI %s.', dataset_uri)
+                        return result
+            if isinstance(rdf_graph, Graph):
+                rdf_graph = serialize_graph(rdf_graph, self.wire_format)
+                rdf_format = self.wire_format.content_type
+            report_query = self._get_report_query(dataset_uri, dataset_org, contributor_id)
+            if self.local_engine is not None:
+                result = self._validate_locally(rdf_graph, rdf_format, report_query, dataset_uri)
+            else:
+                result = self._validate_remote(rdf_graph, rdf_format, report_query)
+            if result is not None and cache_key is not None:
+                self._cache_report(cache_key, result)
         else:
             LOGGER.debug('Skip validating data with the SHACL validator, because validator is not available!')
 
         return result
 
+    def is_enabled(self):
+        """Checks if the SHACL validator service or the local validation engine is configured"""
+        return self.validator_profile is not None and \
+            (self.validator_url is not None or self.local_engine is not None)
+
+    def _validate_remote(self, rdf_graph, rdf_format, report_query):
+        """Validates the serialized graph with the SHACL validator service. Returns None on errors."""
+        body = {
+            u'contentToValidate': rdf_graph,
+            u'embeddingMethod': u'STRING',
+            u'contentSyntax': rdf_format,
+            u'validationType': self.validator_profile,
+            u'reportQuery': report_query
+        }
+
+        try:
+            data, headers = prepare_body(json.dumps(body), {'Content-Type': 'application/json'})
+            req = self.health.call(self.session.post, urljoin(self.validator_url, VALIDATE_ENDPOINT),
+                                   data=data, headers=headers, timeout=self.timeout)
+
+            if req.status_code == requests.codes.ok:
+                return req.text
+        except requests.exceptions.RequestException as ex:
+            LOGGER.warning(u'Exception occurred while connecting to SHACL validator. Skip validating ' \
+                           u'data with the SHACL validator, because validator is not available! ' \
+                           u'Details: %s', ex)
+        except ServiceUnavailableError as ex:
+            LOGGER.debug(u'Skip validating data with the SHACL validator: %s', ex)
+        return None
+
+    def _validate_locally(self, rdf_graph, rdf_format, report_query, dataset_uri):
+        """Validates the serialized graph with the local validation engine. Returns None on errors."""
+        try:
+            return self.local_engine.validate(rdf_graph, rdf_format, report_query)
+        except Exception as ex:
+            LOGGER.warning(u'Error while validating dataset with URI %s with the local SHACL validation ' \
+                           u'engine: %s', dataset_uri, ex)
+        return None
+
+    def _get_cached_report(self, cache_key):
+        """Reads the validation report with the given key from the cache. Returns None on errors."""
+        try:
+            return self.cache.get(cache_key)
+        except Exception as ex:
+            LOGGER.warning(u'Error while reading the validation report from the cache: %s', ex)
+        return None
+
+    def _cache_report(self, cache_key, report):
+        """Stores the validation report with the given key in the cache"""
+        try:
+            self.cache.put(cache_key, report)
+        except Exception as ex:
+            LOGGER.warning(u'Error while storing the validation report in the cache: %s', ex)
+
     @staticmethod
     def _get_report_query(dataset_uri, owner_org, contributor_id):
         """Gets the report query for the SHACL validation request"""
@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+Persistent cache of the reports of the SHACL validator
+"""
+import datetime
+import hashlib
+import logging
+import threading
+
+from ckan import model
+from rdflib.compare import to_canonical_graph
+from sqlalchemy import Column, Index, MetaData, Table, select, types
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_TABLE_NAME = 'dcatde_shacl_validation_cache'
+# Number of stored reports after which the least recently used reports are removed
+EVICTION_INTERVAL = 100
+# Maximum number of reports removed at once
+EVICTION_BATCH_SIZE = 1000
+# Number of seconds after which the time of the last use of a cached report is updated on a hit
+LAST_USED_UPDATE_INTERVAL = 3600
+
+metadata = MetaData()
+
+cache_table = Table(
+    CACHE_TABLE_NAME, metadata,
+    # Hash over the dataset graph, the organization, the contributor and the validator profile
+    Column('cache_key', types.UnicodeText, primary_key=True),
+    Column('validator_profile', types.UnicodeText, nullable=False),
+    Column('report', types.UnicodeText, nullable=False),
+    Column('last_used', types.DateTime, default=datetime.datetime.utcnow, nullable=False),
+    Index('idx_%s_last_used' % CACHE_TABLE_NAME, 'last_used'),
+)
+
+
+def get_content_hash(graph, owner_org, contributor_id, validator_profile):
+    """
+    Computes a hash over the canonical form of the given dataset graph. The blank nodes are relabeled
+    deterministically, so the hash does not change for an equal graph. The organization, the contributor and
+    the SHACL profile are included, because they are part of the validation report. The hash is used as key
+    of the validation cache and as content hash of the harvested datasets in the triple store.
+    """
+    canonical_graph = to_canonical_graph(graph)
+    lines = sorted(u'%s %s %s .' % (s.n3(), p.n3(), o.n3()) for s, p, o in canonical_graph)
+    lines.extend([str(owner_org), str(contributor_id), str(validator_profile)])
+    return hashlib.sha256(u'\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+class ShaclValidationCache(object):
+    """
+    Stores the validation reports of the SHACL validator in a database table, so an unchanged dataset graph
+    is not sent to the validator again. Every eviction_interval stored reports, the least recently used
+    reports exceeding max_entries are removed, so the cache can temporarily contain some more reports. The
+    time of the last use is tracked with the precision of last_used_interval seconds.
+    Reports of other validator profiles are removed on first use.
+    """
+
+    def __init__(self, validator_profile, max_entries, engine=None, eviction_interval=EVICTION_INTERVAL,
+                 last_used_interval=LAST_USED_UPDATE_INTERVAL):
+        self.validator_profile = str(validator_profile)
+        self.max_entries = max_entries
+        self.eviction_interval = max(eviction_interval, 1)
+        self.last_used_interval = last_used_interval
+        self._engine = engine
+        self._table_created = False
+        self._puts_since_eviction = 0
+        # The cache is used by the validation worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        """ The database engine. Defaults to the engine of the CKAN database. """
+        return self._engine if self._engine is not None else model.meta.engine
+
+    def setup(self):
+        """ Creates the cache table if it doesn't exist yet and removes the reports of other profiles """
+        if self._table_created:
+            return
+        with self._lock:
+            if self._table_created:
+                return
+            cache_table.create(bind=self.engine, checkfirst=True)
+            with self.engine.begin() as connection:
+                result = connection.execute(cache_table.delete().where(
+                    cache_table.c.validator_profile != self.validator_profile))
+            if result.rowcount:
+                LOGGER.info(u'Removed %s cached validation reports of other validator profiles.',
+                            result.rowcount)
+            self._table_created = True
+
+    def get(self, cache_key):
+        """
+        Returns the cached validation report with the given key computed by get_content_hash(), or None if it
+        isn't cached. The time of the last use is updated only if it is older than last_used_interval
+        seconds, so not every hit writes to the database.
+        """
+        self.setup()
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(cache_table.c.report, cache_table.c.last_used)
+                .where(cache_table.c.cache_key == cache_key)
+                .where(cache_table.c.validator_profile == self.validator_profile)).first()
+        if row is None:
+            return None
+        now = datetime.datetime.utcnow()
+        if row.last_used < now - datetime.timedelta(seconds=self.last_used_interval):
+            with self.engine.begin() as connection:
+                connection.execute(cache_table.update().where(cache_table.c.cache_key == cache_key)
+                                   .values(last_used=now))
+        return row.report
+
+    def put(self, cache_key, report):
+        """
+        Stores the validation report with the given key. Every eviction_interval calls, the least recently
+        used reports are removed.
+        """
+        self.setup()
+        with self.engine.begin() as connection:
+            connection.execute(cache_table.delete().where(cache_table.c.cache_key == cache_key))
+            connection.execute(cache_table.insert(), {'cache_key': cache_key,
+                                                      'validator_profile': self.validator_profile,
+                                                      'report': report})
+        with self._lock:
+            self._puts_since_eviction += 1
+            evict = self._puts_since_eviction >= self.eviction_interval
+            if evict:
+                self._puts_since_eviction = 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used reports exceeding max_entries, at most EVICTION_BATCH_SIZE reports at
+        once. The reports are found with the index on the column last_used, without counting the table.
+        """
+        evicted_keys = select(cache_table.c.cache_key).order_by(cache_table.c.last_used.desc()) \
+            .offset(self.max_entries).limit(EVICTION_BATCH_SIZE)
+        with self.engine.begin() as connection:
+            result = connection.execute(cache_table.delete().where(cache_table.c.cache_key.in_(evicted_keys)))
+        LOGGER.debug(u'Removed %s least recently used validation reports from the cache.', result.rowcount)